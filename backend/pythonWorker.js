@@ -0,0 +1,153 @@
+const { spawn } = require('child_process');
+const readline = require('readline');
+
+// Persistent Python worker speaking JSON lines over stdin/stdout.
+// Restarts itself when the process dies; callers fall back to the
+// one-shot scripts whenever call() rejects, except with an error marked
+// invalid (a bad request, e.g. an unparsable filter). A timed-out call only rejects
+// itself: the process is restarted when it then fails a ping as well.
+class PythonWorker {
+  constructor({ pythonPath, scriptPath, cwd, env, timeout = 60000, maxRestartDelay = 30000, healthTimeout = 30000 }) {
+    this.pythonPath = pythonPath;
+    this.scriptPath = scriptPath;
+    this.cwd = cwd;
+    this.env = env;
+    this.timeout = timeout;
+    this.maxRestartDelay = maxRestartDelay;
+    this.healthTimeout = healthTimeout;
+    this.healthCheck = null;
+    this.proc = null;
+    this.nextId = 1;
+    this.pending = new Map();
+    this.restartDelay = 1000;
+    this.restartTimer = null;
+    this.stopped = false;
+  }
+
+  start() {
+    if (this.proc || this.stopped) return;
+
+    const proc = spawn(this.pythonPath, [this.scriptPath], {
+      cwd: this.cwd,
+      env: this.env,
+      stdio: ['pipe', 'pipe', 'pipe']
+    });
+    this.proc = proc;
+
+    readline.createInterface({ input: proc.stdout }).on('line', (line) => this.onLine(line));
+    proc.stderr.on('data', (data) => console.error('Worker stderr:', data.toString().trimEnd()));
+    proc.stdin.on('error', (error) => console.error('Worker stdin error:', error.message));
+
+    proc.on('error', (error) => {
+      console.error('Worker failed to start:', error.message);
+    });
+    proc.on('exit', (code, signal) => {
+      console.error(`Worker exited (code ${code}, signal ${signal})`);
+      if (this.proc === proc) this.proc = null;
+      this.rejectAll(new Error('Worker exited'));
+      this.scheduleRestart();
+    });
+  }
+
+  scheduleRestart() {
+    if (this.stopped || this.restartTimer) return;
+    const delay = this.restartDelay;
+    this.restartDelay = Math.min(this.restartDelay * 2, this.maxRestartDelay);
+    this.restartTimer = setTimeout(() => {
+      this.restartTimer = null;
+      this.start();
+    }, delay);
+  }
+
+  onLine(line) {
+    let message;
+    try {
+      message = JSON.parse(line);
+    } catch (error) {
+      console.error('Worker sent invalid JSON:', line.slice(0, 200));
+      return;
+    }
+    // A healthy response resets the crash backoff
+    this.restartDelay = 1000;
+
+    const entry = this.pending.get(message.id);
+    if (!entry) return;
+    if ('stream' in message) {
+      // Partial result of a streamed call, the final response follows
+      entry.armTimer();
+      if (entry.onStream) entry.onStream(message.stream);
+      return;
+    }
+    this.pending.delete(message.id);
+    clearTimeout(entry.timer);
+    if (message.error) {
+      const error = new Error(message.error);
+      // The request itself was bad, retrying it elsewhere would not help
+      if (message.invalid) error.invalid = true;
+      entry.reject(error);
+    } else {
+      entry.resolve(message.result);
+    }
+  }
+
+  rejectAll(error) {
+    for (const entry of this.pending.values()) {
+      clearTimeout(entry.timer);
+      entry.reject(error);
+    }
+    this.pending.clear();
+  }
+
+  // onStream makes this a streamed call: it receives each partial item and
+  // the timeout then applies to the gap between items, not the whole call
+  call(method, params = {}, { timeout = this.timeout, onStream = null } = {}) {
+    if (!this.proc) {
+      this.start();
+      if (!this.proc) return Promise.reject(new Error('Worker not running'));
+    }
+
+    const id = this.nextId++;
+    return new Promise((resolve, reject) => {
+      const entry = { resolve, reject, onStream, timer: null };
+      entry.armTimer = () => {
+        clearTimeout(entry.timer);
+        entry.timer = setTimeout(() => {
+          this.pending.delete(id);
+          reject(new Error(`Worker timed out after ${timeout}ms on ${method}`));
+          // One slow request is not a hung worker; its caches and the other
+          // requests in flight survive unless it stops answering pings too
+          this.checkHealth();
+        }, timeout);
+      };
+      entry.armTimer();
+      this.pending.set(id, entry);
+      const request = { id, method, params };
+      if (onStream) request.stream = true;
+      this.proc.stdin.write(JSON.stringify(request) + '\n');
+    });
+  }
+
+  // Ping the worker; a hung one (e.g. every pool thread stuck) is killed
+  // and restarted by the exit handler. At most one check runs at a time.
+  checkHealth() {
+    if (this.healthCheck || !this.proc) return;
+    const proc = this.proc;
+    this.healthCheck = this.call('ping', {}, { timeout: this.healthTimeout })
+      .catch((error) => {
+        console.error('Worker failed its health check, restarting:', error.message);
+        if (this.proc === proc) proc.kill();
+      })
+      .finally(() => {
+        this.healthCheck = null;
+      });
+  }
+
+  stop() {
+    this.stopped = true;
+    clearTimeout(this.restartTimer);
+    this.rejectAll(new Error('Worker stopped'));
+    if (this.proc) this.proc.kill();
+  }
+}
+
+module.exports = PythonWorker;
@@ -1,9 +1,11 @@
 const express = require('express');
 const cors = require('cors');
-const { exec } = require('child_process');
+const { execFile, spawn } = require('child_process');
+const readline = require('readline');
 const util = require('util');
 const path = require('path');
-const execPromise = util.promisify(exec);
+const execFilePromise = util.promisify(execFile);
+const PythonWorker = require('./pythonWorker');
 require('dotenv').config({ path: path.join(__dirname, '..', '.env') });
 
 // Cache for API responses
@@ -13,40 +15,163 @@ const cache = {
 };
 const CACHE_DURATION = 5 * 60 * 1000; // 5 minutes
 
+// Incremental run sync keeps a local store and only fetches changed runs.
+// Set WANDB_INCREMENTAL=0 to relist every run on each request.
+const WANDB_INCREMENTAL = process.env.WANDB_INCREMENTAL !== '0';
+// Finished runs are kept in a permanent on-disk cache and never reprocessed.
+// Set WANDB_CACHE_FINISHED=0 to process every run on each request.
+const WANDB_CACHE_FINISHED = process.env.WANDB_CACHE_FINISHED !== '0';
+// GPU names come from each run's metadata file, cached per run. Set
+// WANDB_METADATA=0 to skip those requests entirely.
+const WANDB_METADATA = process.env.WANDB_METADATA !== '0';
+// Seconds a run listing may take. Projects still fetching then are answered
+// from their last known records, marked "partial": true, and keep fetching
+// in the worker for the next poll. ?deadline= overrides it, 0 waits for all.
+const WANDB_DEADLINE = parseFloat(process.env.WANDB_DEADLINE || '15');
+// One-shot scripts are killed after this many milliseconds
+const SCRIPT_TIMEOUT = parseInt(process.env.PYTHON_SCRIPT_TIMEOUT || '60000', 10);
+
 const app = express();
 const PORT = process.env.PORT || 5000;
 
 app.use(cors());
 app.use(express.json());
 
-async function getWandbRuns(projectFilter = null) {
+// Long-lived Python worker keeps wandb/huggingface_hub warm between requests.
+// Set PYTHON_WORKER=0 to always spawn the one-shot scripts instead.
+const worker = process.env.PYTHON_WORKER === '0' ? null : new PythonWorker({
+  pythonPath: path.join(__dirname, '..', 'venv', 'bin', 'python3'),
+  scriptPath: path.join(__dirname, '..', 'scripts', 'worker.py'),
+  cwd: path.join(__dirname, '..'),
+  env: process.env,
+  timeout: parseInt(process.env.PYTHON_WORKER_TIMEOUT || '120000', 10),
+  healthTimeout: parseInt(process.env.PYTHON_WORKER_PING_TIMEOUT || '30000', 10)
+});
+if (worker) worker.start();
+
+// Ask the worker first; fall back to the one-shot script if it is unavailable.
+// A bad request (error.invalid) is rethrown: the script would reject it too.
+async function callWorker(method, params, fallback) {
+  if (worker) {
+    try {
+      return await worker.call(method, params);
+    } catch (error) {
+      if (error.invalid) throw error;
+      console.error(`Worker ${method} failed, falling back to script:`, error.message);
+    }
+  }
+  return fallback();
+}
+
+function wandbRunsParams(projectFilter, options = {}) {
+  return {
+    project: projectFilter || '',
+    incremental: WANDB_INCREMENTAL,
+    cache_finished: WANDB_CACHE_FINISHED,
+    metadata: WANDB_METADATA,
+    deadline: WANDB_DEADLINE,
+    ...options
+  };
+}
+
+// Run listing options from the query string:
+//   ?fields=id,name,eta*&metrics=loss,train/* - comma-separated globs picking
+//     record fields and summary keys. Absent means everything, empty means none.
+//   ?state=running&tag=a,b&user=me&created_after=2024-05-01&created_before=...&name=^sweep-
+//     - filters pushed down into the wandb query (scripts/run_filters.py)
+//   ?limit=50&offset=100&per_page=200 - a window of the newest-first list and the API page size
+//   ?deadline=5 - seconds before late projects are filled in from their last known records
+const RUN_FILTERS = ['state', 'tag', 'user', 'created_after', 'created_before', 'name'];
+const RUN_PAGING = ['limit', 'offset', 'per_page'];
+
+function runsOptionsFromQuery(query) {
+  const options = {};
+  for (const key of ['fields', 'metrics', ...RUN_FILTERS]) {
+    const value = query[key];
+    if (value !== undefined) options[key] = Array.isArray(value) ? value.join(',') : String(value);
+  }
+  for (const key of RUN_PAGING) {
+    const value = parseInt(query[key], 10);
+    if (Number.isInteger(value) && value >= 0) options[key] = value;
+  }
+  const deadline = parseFloat(query.deadline);
+  if (Number.isFinite(deadline) && deadline >= 0) options.deadline = deadline;
+  return options;
+}
+
+// get_wandb_runs.py exits with status 2 and the reason on stderr's last line
+// when the request is invalid (an unparsable filter)
+function invalidRunsError(stderr) {
+  const lines = String(stderr || '').trim().split('\n');
+  const error = new Error(lines[lines.length - 1].replace(/^Error: /, ''));
+  error.invalid = true;
+  return error;
+}
+
+function scriptRunArgs(projectFilter, options = {}) {
+  const args = [];
+  if (WANDB_INCREMENTAL) args.push('--incremental');
+  if (WANDB_CACHE_FINISHED) args.push('--cache-finished');
+  args.push(WANDB_METADATA ? '--cache-metadata' : '--no-metadata');
+  args.push('--gpu-samples', '--eta-history');
+  args.push(`--deadline=${options.deadline !== undefined ? options.deadline : WANDB_DEADLINE}`);
+  if (options.fields !== undefined) args.push(`--fields=${options.fields}`);
+  if (options.metrics !== undefined) args.push(`--metric-keys=${options.metrics}`);
+  for (const key of [...RUN_FILTERS, ...RUN_PAGING]) {
+    if (options[key] !== undefined && options[key] !== '') args.push(`--${key.replace('_', '-')}=${options[key]}`);
+  }
+  // After '--' a project filter starting with '-' cannot pass for a flag
+  if (projectFilter) args.push('--', String(projectFilter));
+  return args;
+}
+
+async function getWandbRuns(projectFilter = null, options = {}) {
+  return callWorker('wandb_runs', wandbRunsParams(projectFilter, options),
+    () => getWandbRunsFromScript(projectFilter, options));
+}
+
+async function getWandbRunsFromScript(projectFilter, options = {}) {
   try {
-    const wandbApiKey = process.env.WANDB_API_KEY;
     const scriptPath = path.join(__dirname, '..', 'scripts', 'get_wandb_runs.py');
-    const projectArg = projectFilter ? `"${projectFilter}"` : '';
     const workingDir = path.join(__dirname, '..');
     const pythonPath = path.join(__dirname, '..', 'venv', 'bin', 'python3');
     
     console.log('Wandb: Executing with project filter:', projectFilter);
-    const { stdout, stderr } = await execPromise(`WANDB_API_KEY="${wandbApiKey}" ${pythonPath} "${scriptPath}" ${projectArg}`, { cwd: workingDir });
+    // execFile: the project filter and globs come from the query string
+    const { stdout, stderr } = await execFilePromise(pythonPath, [scriptPath, ...scriptRunArgs(projectFilter, options)], {
+      cwd: workingDir,
+      env: process.env,
+      maxBuffer: 256 * 1024 * 1024,
+      timeout: SCRIPT_TIMEOUT
+    });
     if (stderr) console.error('Wandb stderr:', stderr);
     console.log('Wandb stdout length:', stdout.length);
     return JSON.parse(stdout);
   } catch (error) {
+    if (error.code === 2) throw invalidRunsError(error.stderr);
     console.error('Error fetching Wandb runs:', error.message);
     return [];
   }
 }
 
 async function getWandbProjects() {
+  return callWorker('wandb_projects', {}, () => getWandbProjectsFromScript());
+}
+
+async function getWandbProjectsFromScript() {
   try {
-    const wandbApiKey = process.env.WANDB_API_KEY;
     const scriptPath = path.join(__dirname, '..', 'scripts', 'get_wandb_projects.py');
     const workingDir = path.join(__dirname, '..');
     const pythonPath = path.join(__dirname, '..', 'venv', 'bin', 'python3');
-    
-    console.log('Fetching Wandb projects with command:', `WANDB_API_KEY="${wandbApiKey}" ${pythonPath} "${scriptPath}"`);
-    const { stdout, stderr } = await execPromise(`WANDB_API_KEY="${wandbApiKey}" ${pythonPath} "${scriptPath}"`, { cwd: workingDir });
+
+    console.log('Fetching Wandb projects with:', pythonPath, scriptPath);
+    // WANDB_API_KEY reaches the script through the environment; a hung
+    // listing is killed instead of holding the request forever
+    const { stdout, stderr } = await execFilePromise(pythonPath, [scriptPath], {
+      cwd: workingDir,
+      env: process.env,
+      timeout: SCRIPT_TIMEOUT
+    });
     if (stderr) console.error('Wandb projects stderr:', stderr);
     console.log('Wandb projects stdout:', stdout);
     return JSON.parse(stdout);
@@ -59,23 +184,24 @@ async function getWandbProjects() {
 
 async function getHuggingFaceModels() {
   try {
-    // Check cache first
+    // The worker answers from its persisted catalog and refreshes it in the
+    // background, the in-memory copy only spares repeated script runs
     const now = Date.now();
-    if (cache.hf_models.data && (now - cache.hf_models.timestamp) < CACHE_DURATION) {
+    if (!worker && cache.hf_models.data && (now - cache.hf_models.timestamp) < CACHE_DURATION) {
       console.log('Returning cached HF models');
       return cache.hf_models.data;
     }
 
-    const hfToken = process.env.HUGGINGFACE_TOKEN;
-    const scriptPath = path.join(__dirname, '..', 'scripts', 'get_hf_models.py');
-    const workingDir = path.join(__dirname, '..');
-    const pythonPath = path.join(__dirname, '..', 'venv', 'bin', 'python3');
-    console.log('Executing HF models fetch with token');
-    const { stdout, stderr } = await execPromise(`HUGGINGFACE_TOKEN="${hfToken}" ${pythonPath} "${scriptPath}"`, { cwd: workingDir });
-    if (stderr) console.error('HF Models stderr:', stderr);
-    console.log('HF Models stdout length:', stdout.length);
-    
-    const data = JSON.parse(stdout);
+    const data = await callWorker('hf_models', {}, async () => {
+      const scriptPath = path.join(__dirname, '..', 'scripts', 'get_hf_models.py');
+      const workingDir = path.join(__dirname, '..');
+      const pythonPath = path.join(__dirname, '..', 'venv', 'bin', 'python3');
+      console.log('Executing HF models fetch with token');
+      const { stdout, stderr } = await execFilePromise(pythonPath, [scriptPath], { cwd: workingDir, env: process.env, timeout: SCRIPT_TIMEOUT });
+      if (stderr) console.error('HF Models stderr:', stderr);
+      console.log('HF Models stdout length:', stdout.length);
+      return JSON.parse(stdout);
+    });
     // Update cache
     cache.hf_models = { data, timestamp: now };
     return data;
@@ -88,23 +214,24 @@ async function getHuggingFaceModels() {
 
 async function getHuggingFaceDatasets() {
   try {
-    // Check cache first
+    // The worker answers from its persisted catalog and refreshes it in the
+    // background, the in-memory copy only spares repeated script runs
     const now = Date.now();
-    if (cache.hf_datasets.data && (now - cache.hf_datasets.timestamp) < CACHE_DURATION) {
+    if (!worker && cache.hf_datasets.data && (now - cache.hf_datasets.timestamp) < CACHE_DURATION) {
       console.log('Returning cached HF datasets');
       return cache.hf_datasets.data;
     }
 
-    const hfToken = process.env.HUGGINGFACE_TOKEN;
-    const scriptPath = path.join(__dirname, '..', 'scripts', 'get_hf_datasets.py');
-    const workingDir = path.join(__dirname, '..');
-    const pythonPath = path.join(__dirname, '..', 'venv', 'bin', 'python3');
-    console.log('Executing HF datasets fetch with token');
-    const { stdout, stderr } = await execPromise(`HUGGINGFACE_TOKEN="${hfToken}" ${pythonPath} "${scriptPath}"`, { cwd: workingDir });
-    if (stderr) console.error('HF Datasets stderr:', stderr);
-    console.log('HF Datasets stdout length:', stdout.length);
-    
-    const data = JSON.parse(stdout);
+    const data = await callWorker('hf_datasets', {}, async () => {
+      const scriptPath = path.join(__dirname, '..', 'scripts', 'get_hf_datasets.py');
+      const workingDir = path.join(__dirname, '..');
+      const pythonPath = path.join(__dirname, '..', 'venv', 'bin', 'python3');
+      console.log('Executing HF datasets fetch with token');
+      const { stdout, stderr } = await execFilePromise(pythonPath, [scriptPath], { cwd: workingDir, env: process.env, timeout: SCRIPT_TIMEOUT });
+      if (stderr) console.error('HF Datasets stderr:', stderr);
+      console.log('HF Datasets stdout length:', stdout.length);
+      return JSON.parse(stdout);
+    });
     // Update cache
     cache.hf_datasets = { data, timestamp: now };
     return data;
@@ -115,16 +242,213 @@ async function getHuggingFaceDatasets() {
   }
 }
 
+// ?since=<version> answers with the changes since that version instead of
+// the whole list (see scripts/run_delta.py); an empty or unknown version
+// gets {"version", "full": true, "runs"}. The ETag is the current version,
+// so a client that is already up to date gets a 304.
+async function getWandbRunsDelta(projectFilter, options, since) {
+  if (worker) {
+    try {
+      return await worker.call('wandb_runs_delta', { ...wandbRunsParams(projectFilter, options), since });
+    } catch (error) {
+      if (error.invalid) throw error;
+      console.error('Worker wandb_runs_delta failed, sending the full list:', error.message);
+    }
+  }
+  // The one-shot script keeps no snapshot, so there is no version to diff against
+  const runs = await getWandbRunsFromScript(projectFilter, options);
+  const delta = { version: null, full: true, runs };
+  if (runs.some((run) => run.partial)) delta.partial = true;
+  return delta;
+}
+
 app.get('/api/wandb/runs', async (req, res) => {
   try {
     const projectFilter = req.query.project;
-    const runs = await getWandbRuns(projectFilter);
+    const options = runsOptionsFromQuery(req.query);
+    if (req.query.since !== undefined) {
+      const delta = await getWandbRunsDelta(projectFilter, options, String(req.query.since));
+      res.setHeader('Cache-Control', 'no-cache');
+      // Seconds until the worker's scheduler refreshes these runs, also sent with a 304
+      if (typeof delta.refreshIn === 'number') res.setHeader('X-Refresh-In', String(Math.ceil(delta.refreshIn)));
+      if (delta.version) {
+        const etag = `"${delta.version}"`;
+        res.setHeader('ETag', etag);
+        if (req.headers['if-none-match'] === etag) return res.status(304).end();
+      }
+      return res.json(delta);
+    }
+    const runs = await getWandbRuns(projectFilter, options);
+    // Runs filled in from their last known records after the deadline
+    const partial = Array.isArray(runs) ? runs.filter((run) => run.partial).length : 0;
+    if (partial) res.setHeader('X-Partial-Runs', String(partial));
     res.json(runs);
   } catch (error) {
+    if (error.invalid) return res.status(400).json({ error: error.message });
     res.status(500).json({ error: 'Failed to fetch Wandb runs' });
   }
 });
 
+// Runs as NDJSON, one record per line, relayed as soon as each run is
+// processed. Records arrive unsorted; clients sort by createdAt.
+async function streamWandbRuns(projectFilter, onRun, options = {}) {
+  let sent = 0;
+  const relay = (run) => {
+    sent += 1;
+    onRun(run);
+  };
+  if (worker) {
+    try {
+      await worker.call('wandb_runs', wandbRunsParams(projectFilter, options), { onStream: relay });
+      return;
+    } catch (error) {
+      if (error.invalid) throw error;
+      console.error('Worker wandb_runs stream failed:', error.message);
+      // Falling back after rows went out would send duplicates
+      if (sent > 0) return;
+    }
+  }
+  await streamWandbRunsFromScript(projectFilter, relay, options);
+}
+
+function streamWandbRunsFromScript(projectFilter, onRun, options = {}) {
+  return new Promise((resolve, reject) => {
+    const args = [path.join(__dirname, '..', 'scripts', 'get_wandb_runs.py'), '--stream',
+      ...scriptRunArgs(projectFilter, options)];
+    const proc = spawn(path.join(__dirname, '..', 'venv', 'bin', 'python3'), args, {
+      cwd: path.join(__dirname, '..'),
+      env: process.env
+    });
+    readline.createInterface({ input: proc.stdout }).on('line', (line) => {
+      if (!line.trim()) return;
+      try {
+        onRun(JSON.parse(line));
+      } catch (error) {
+        console.error('Invalid NDJSON line from get_wandb_runs.py:', line.slice(0, 200));
+      }
+    });
+    let stderr = '';
+    proc.stderr.on('data', (data) => {
+      stderr = (stderr + data.toString()).slice(-4096);
+      console.error('Wandb stderr:', data.toString().trimEnd());
+    });
+    proc.on('error', (error) => {
+      console.error('Error streaming Wandb runs:', error.message);
+      resolve();
+    });
+    proc.on('close', (code) => (code === 2 ? reject(invalidRunsError(stderr)) : resolve()));
+  });
+}
+
+app.get('/api/wandb/runs/stream', async (req, res) => {
+  // Headers go out with the first run, so an invalid filter can still get a 400
+  res.setHeader('Content-Type', 'application/x-ndjson');
+  res.setHeader('Cache-Control', 'no-cache');
+  try {
+    await streamWandbRuns(req.query.project, (run) => res.write(JSON.stringify(run) + '\n'),
+      runsOptionsFromQuery(req.query));
+  } catch (error) {
+    if (error.invalid && !res.headersSent) return res.status(400).type('json').json({ error: error.message });
+    console.error('Error streaming Wandb runs:', error.message);
+  }
+  res.end();
+});
+
+// Drop cached finished runs: all of them, or one entity/project/run
+async function invalidateFinishedCache({ entity, project, runId }) {
+  return callWorker('invalidate_cache', { entity, project, run_id: runId }, async () => {
+    const scriptPath = path.join(__dirname, '..', 'scripts', 'run_store.py');
+    const pythonPath = path.join(__dirname, '..', 'venv', 'bin', 'python3');
+    const target = [entity, project, runId].filter(Boolean).join('/');
+    const { stdout } = await execFilePromise(pythonPath, [scriptPath, 'invalidate', target], {
+      cwd: path.join(__dirname, '..')
+    });
+    return JSON.parse(stdout);
+  });
+}
+
+app.post('/api/wandb/cache/invalidate', async (req, res) => {
+  try {
+    const result = await invalidateFinishedCache(req.body || {});
+    res.json(result);
+  } catch (error) {
+    res.status(500).json({ error: 'Failed to invalidate cache' });
+  }
+});
+
+// Buffered GPU utilization samples of one run, collected by the worker's sampler
+app.get('/api/wandb/runs/:entity/:project/:runId/gpu', async (req, res) => {
+  if (!worker) return res.json([]);
+  try {
+    const { entity, project, runId } = req.params;
+    res.json(await worker.call('gpu_history', { entity, project, run_id: runId }));
+  } catch (error) {
+    res.status(500).json({ error: 'Failed to fetch GPU samples' });
+  }
+});
+
+// Downsampled history of one metric for sparklines: ?key=loss&points=200&method=lttb|minmax
+app.get('/api/wandb/runs/:entity/:project/:runId/history', async (req, res) => {
+  const { entity, project, runId } = req.params;
+  const { key, points = 200, method = 'lttb' } = req.query;
+  if (!key) return res.status(400).json({ error: 'Missing key' });
+  try {
+    const params = { entity, project, run_id: runId, key, points: parseInt(points, 10), method };
+    const series = await callWorker('metric_history', params, async () => {
+      const scriptPath = path.join(__dirname, '..', 'scripts', 'metric_history.py');
+      const pythonPath = path.join(__dirname, '..', 'venv', 'bin', 'python3');
+      const { stdout } = await execFilePromise(pythonPath, [
+        scriptPath, `${entity}/${project}/${runId}`, key, '--points', String(params.points), '--method', method
+      ], { cwd: path.join(__dirname, '..') });
+      return JSON.parse(stdout);
+    });
+    res.json(series);
+  } catch (error) {
+    res.status(500).json({ error: 'Failed to fetch metric history' });
+  }
+});
+
+// Time travel over the worker's run timeline (scripts/run_timeline.py):
+// the runs as listed at ?at=<ISO date/time or epoch seconds>
+app.get('/api/wandb/runs/at', async (req, res) => {
+  const params = { at: req.query.at ? String(req.query.at) : undefined, project: req.query.project || undefined };
+  try {
+    const result = await callWorker('runs_at', params, async () => {
+      const args = [path.join(__dirname, '..', 'scripts', 'run_timeline.py'), 'at', params.at || String(Date.now() / 1000)];
+      if (params.project) args.push('--project', params.project);
+      const { stdout } = await execFilePromise(path.join(__dirname, '..', 'venv', 'bin', 'python3'), args,
+        { cwd: path.join(__dirname, '..'), env: process.env, maxBuffer: 16 * 1024 * 1024 });
+      return JSON.parse(stdout);
+    });
+    res.json(result);
+  } catch (error) {
+    if (error.code === 2) return res.status(400).json({ error: String(error.stderr || '').trim() });
+    res.status(500).json({ error: 'Failed to reconstruct runs' });
+  }
+});
+
+// State and progress of one run over time: ?since=&until=&points=200
+app.get('/api/wandb/runs/:entity/:project/:runId/timeline', async (req, res) => {
+  const { entity, project, runId } = req.params;
+  const { since, until, points = 200 } = req.query;
+  try {
+    const params = { entity, project, run_id: runId, since, until, points: parseInt(points, 10) || 200 };
+    const timeline = await callWorker('run_timeline', params, async () => {
+      const args = [path.join(__dirname, '..', 'scripts', 'run_timeline.py'), 'run', `${entity}/${project}/${runId}`,
+        '--points', String(params.points)];
+      if (since) args.push('--since', String(since));
+      if (until) args.push('--until', String(until));
+      const { stdout } = await execFilePromise(path.join(__dirname, '..', 'venv', 'bin', 'python3'), args,
+        { cwd: path.join(__dirname, '..'), env: process.env });
+      return JSON.parse(stdout);
+    });
+    res.json(timeline);
+  } catch (error) {
+    if (error.code === 2) return res.status(400).json({ error: String(error.stderr || '').trim() });
+    res.status(500).json({ error: 'Failed to fetch run timeline' });
+  }
+});
+
 app.get('/api/wandb/projects', async (req, res) => {
   try {
     const projects = await getWandbProjects();
@@ -152,10 +476,172 @@ app.get('/api/huggingface/datasets', async (req, res) => {
   }
 });
 
+// Per-repo details (parameters, sizes, file count, gated/private) of a
+// listing as NDJSON, {"name", ...details} per line: cached repos at once,
+// the rest as their info requests complete (see scripts/hf_details.py)
+async function streamHfDetails(kind, onDetails) {
+  let sent = 0;
+  const relay = (details) => {
+    sent += 1;
+    onDetails(details);
+  };
+  if (worker) {
+    try {
+      await worker.call(kind === 'models' ? 'hf_models' : 'hf_datasets', { details: true }, { onStream: relay });
+      return;
+    } catch (error) {
+      console.error(`Worker hf ${kind} details stream failed:`, error.message);
+      // Falling back after lines went out would send duplicates
+      if (sent > 0) return;
+    }
+  }
+  await new Promise((resolve) => {
+    const proc = spawn(path.join(__dirname, '..', 'venv', 'bin', 'python3'),
+      [path.join(__dirname, '..', 'scripts', 'hf_details.py'), kind, '--stream'], {
+        cwd: path.join(__dirname, '..'),
+        env: process.env
+      });
+    readline.createInterface({ input: proc.stdout }).on('line', (line) => {
+      if (!line.trim()) return;
+      try {
+        onDetails(JSON.parse(line));
+      } catch (error) {
+        console.error('Invalid NDJSON line from hf_details.py:', line.slice(0, 200));
+      }
+    });
+    proc.stderr.on('data', (data) => console.error('HF details stderr:', data.toString().trimEnd()));
+    proc.on('error', (error) => {
+      console.error('Error streaming HF details:', error.message);
+      resolve();
+    });
+    proc.on('close', () => resolve());
+  });
+}
+
+app.get('/api/huggingface/:kind(models|datasets)/details', async (req, res) => {
+  res.setHeader('Content-Type', 'application/x-ndjson');
+  res.setHeader('Cache-Control', 'no-cache');
+  res.flushHeaders();
+  try {
+    await streamHfDetails(req.params.kind, (details) => res.write(JSON.stringify(details) + '\n'));
+  } catch (error) {
+    console.error('Error streaming HF details:', error.message);
+  }
+  res.end();
+});
+
+// Models and datasets in the local HuggingFace hub cache, works offline. ?rescan=1 ignores the index
+app.get('/api/huggingface/cache', async (req, res) => {
+  const rescan = req.query.rescan === '1';
+  try {
+    const listing = await callWorker('hf_cache', { rescan }, async () => {
+      const scriptPath = path.join(__dirname, '..', 'scripts', 'hf_cache.py');
+      const pythonPath = path.join(__dirname, '..', 'venv', 'bin', 'python3');
+      const args = rescan ? [scriptPath, '--rescan'] : [scriptPath];
+      const { stdout } = await execFilePromise(pythonPath, args, { cwd: path.join(__dirname, '..') });
+      return JSON.parse(stdout);
+    });
+    res.json(listing);
+  } catch (error) {
+    res.status(500).json({ error: 'Failed to scan the HuggingFace cache' });
+  }
+});
+
+// Phase timings and counters of the Python worker, Prometheus text format
+// (?format=json for the raw snapshot). One-shot scripts print theirs with --metrics.
+app.get('/metrics', async (req, res) => {
+  if (!worker) {
+    return res.status(503).type('text/plain').send('# Python worker disabled, no metrics\n');
+  }
+  try {
+    const format = req.query.format === 'json' ? 'json' : 'prometheus';
+    const metrics = await worker.call('metrics', { format });
+    if (format === 'json') return res.json(metrics);
+    res.type('text/plain; version=0.0.4').send(metrics);
+  } catch (error) {
+    res.status(503).type('text/plain').send(`# Worker unavailable: ${error.message}\n`);
+  }
+});
+
+// Ranked search over the stored runs, models and datasets (scripts/search_index.py).
+// ?q=<text>&types=run,model,dataset&limit=20&offset=0
+app.get('/api/search', async (req, res) => {
+  const params = {
+    q: String(req.query.q || ''),
+    types: req.query.types ? String(req.query.types) : undefined,
+    limit: Math.min(parseInt(req.query.limit || '20', 10) || 20, 200),
+    offset: parseInt(req.query.offset || '0', 10) || 0
+  };
+  try {
+    const results = await callWorker('search', params, async () => {
+      const args = [path.join(__dirname, '..', 'scripts', 'search_index.py'), params.q,
+        '--limit', String(params.limit), '--offset', String(params.offset)];
+      if (params.types) args.push('--types', params.types);
+      const { stdout } = await execFilePromise(path.join(__dirname, '..', 'venv', 'bin', 'python3'), args,
+        { cwd: path.join(__dirname, '..'), env: process.env, maxBuffer: 16 * 1024 * 1024 });
+      return JSON.parse(stdout);
+    });
+    res.json(results);
+  } catch (error) {
+    res.status(500).json({ error: 'Search failed' });
+  }
+});
+
+// Grouped aggregates and leaderboards over the stored runs (see
+// scripts/run_aggregates.py), e.g. best eval loss per project:
+//   /api/wandb/aggregate?metric=eval/loss&group=project&aggs=min&top=1
+// Results are cached until the run set changes; the ETag is that version.
+app.get('/api/wandb/aggregate', async (req, res) => {
+  const params = {};
+  for (const key of ['metric', 'group', 'aggs', 'order', 'state', 'project']) {
+    if (req.query[key]) params[key] = String(req.query[key]);
+  }
+  params.top = parseInt(req.query.top || '0', 10) || 0;
+  try {
+    const result = await callWorker('run_aggregates', params, async () => {
+      const args = [path.join(__dirname, '..', 'scripts', 'run_aggregates.py'), '--top', String(params.top)];
+      const flags = { metric: '--metric', group: '--group', aggs: '--agg', order: '--order', state: '--state',
+        project: '--project' };
+      for (const [key, flag] of Object.entries(flags)) {
+        if (params[key]) args.push(flag, params[key]);
+      }
+      const { stdout } = await execFilePromise(path.join(__dirname, '..', 'venv', 'bin', 'python3'), args,
+        { cwd: path.join(__dirname, '..'), env: process.env, maxBuffer: 16 * 1024 * 1024 });
+      return JSON.parse(stdout);
+    });
+    if (result.version) {
+      const etag = `"${result.version}"`;
+      res.setHeader('ETag', etag);
+      if (req.headers['if-none-match'] === etag) return res.status(304).end();
+    }
+    res.json(result);
+  } catch (error) {
+    // The script exits with status 2 on an invalid query
+    if (error.code === 2) return res.status(400).json({ error: String(error.stderr || '').trim() });
+    res.status(500).json({ error: 'Failed to aggregate runs' });
+  }
+});
+
+// Background refresh queue of the Python worker: when each project and
+// HF listing is refreshed next, backoff holds and the request budget
+app.get('/api/scheduler', async (req, res) => {
+  if (!worker) return res.status(503).json({ error: 'Python worker disabled' });
+  try {
+    res.json(await worker.call('scheduler', {}));
+  } catch (error) {
+    res.status(503).json({ error: `Worker unavailable: ${error.message}` });
+  }
+});
+
 app.get('/api/health', (req, res) => {
   res.json({ status: 'OK' });
 });
 
 app.listen(PORT, () => {
   console.log(`Server running on port ${PORT}`);
+});
+
+process.on('SIGTERM', () => {
+  if (worker) worker.stop();
+  process.exit(0);
 });
\ No newline at end of file
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""Time the local HuggingFace cache scanner on a synthetic hub cache.
+
+Builds a cache of --repos repos, each with a few revisions sharing blobs,
+then times:
+  cold       first scan, no index
+  warm       repeat scan, every repo unchanged
+  one-change repeat scan after adding a blob to one repo
+
+    python benchmarks/bench_hf_cache.py --repos 500
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'scripts'))
+
+from hf_cache import HfCacheScanner  # noqa: E402
+
+
+def build_cache(root, repos, blobs_per_repo, revisions):
+    """Fake hub cache; revision r links the first blobs_per_repo - revisions + r + 1 blobs"""
+    expected = {}
+    for i in range(repos):
+        kind = "datasets" if i % 4 == 0 else "models"
+        repo = os.path.join(root, f"{kind}--org{i % 10}--repo{i}")
+        os.makedirs(os.path.join(repo, "blobs"))
+        os.makedirs(os.path.join(repo, "refs"))
+        blobs = []
+        for b in range(blobs_per_repo):
+            name = f"{i:08x}{b:032x}"
+            with open(os.path.join(repo, "blobs", name), "wb") as f:
+                f.write(b"\0" * (100 * (b + 1)))
+            blobs.append(name)
+        for r in range(revisions):
+            snapshot = os.path.join(repo, "snapshots", f"{i:08x}{r:032x}")
+            os.makedirs(snapshot)
+            for b, name in enumerate(blobs[:blobs_per_repo - revisions + r + 1]):
+                os.symlink(os.path.join("..", "..", "blobs", name), os.path.join(snapshot, f"file{b}"))
+        with open(os.path.join(repo, "refs", "main"), "w") as f:
+            f.write(f"{i:08x}{revisions - 1:032x}")
+        expected[f"org{i % 10}/repo{i}"] = sum(100 * (b + 1) for b in range(blobs_per_repo))
+    return expected
+
+
+def measure(label, scanner, rescan=False):
+    start = time.perf_counter()
+    listing = scanner.scan(rescan=rescan)
+    elapsed = time.perf_counter() - start
+    count = sum(len(records) for records in listing.values())
+    print(f"{label:10s} {elapsed * 1000:8.1f}ms  {count} repos")
+    return listing
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repos", type=int, default=500)
+    parser.add_argument("--blobs", type=int, default=8, help="blobs per repo")
+    parser.add_argument("--revisions", type=int, default=3, help="revisions per repo")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        hub = os.path.join(tmp, "hub")
+        expected = build_cache(hub, args.repos, args.blobs, args.revisions)
+        scanner = HfCacheScanner(hub, index_path=os.path.join(tmp, "index.json"))
+
+        listing = measure("cold", scanner)
+        measure("warm", scanner)
+
+        repo = next(entry.path for entry in os.scandir(hub))
+        with open(os.path.join(repo, "blobs", "new"), "wb") as f:
+            f.write(b"\0" * 10)
+        measure("one-change", scanner)
+
+        sizes = {r["name"]: r["sizeOnDisk"] for records in listing.values() for r in records}
+        assert sizes == expected, "shared blobs were not counted exactly once"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""Benchmark the metric history store and downsamplers on synthetic histories.
+
+For each history length, writes a random-walk series to a HistoryStore and
+reports on-disk size, peak RSS and the latency of serving it downsampled
+with LTTB and min/max bucketing. Also times the row-by-row append path
+used when syncing from scan_history.
+
+    python benchmarks/bench_history.py --steps 1000000 5000000 --points 200 1000
+"""
+
+import os
+import sys
+import time
+import argparse
+import resource
+import tempfile
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'scripts'))
+
+from metric_history import HistoryStore, downsample, STEP_DTYPE, VALUE_DTYPE  # noqa: E402
+
+
+def peak_rss_mb():
+    # ru_maxrss is KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def write_series(store, run_key, key, steps):
+    """Write a synthetic loss curve straight to the store's array files"""
+    run_dir = store.run_dir(run_key)
+    os.makedirs(run_dir, exist_ok=True)
+    rng = np.random.default_rng(0)
+    x = np.arange(steps, dtype=STEP_DTYPE)
+    y = (np.exp(-x / (steps / 5)) + np.cumsum(rng.normal(0, 1e-3, steps))).astype(VALUE_DTYPE)
+    x.tofile(os.path.join(run_dir, key + ".steps"))
+    y.tofile(os.path.join(run_dir, key + ".values"))
+    return os.path.getsize(os.path.join(run_dir, key + ".steps")) + os.path.getsize(os.path.join(run_dir, key + ".values"))
+
+
+def time_call(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--steps", type=int, nargs="+", default=[100000, 1000000, 5000000])
+    parser.add_argument("--points", type=int, nargs="+", default=[200, 1000])
+    parser.add_argument("--append-rows", type=int, default=200000, help="rows for the append benchmark")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = HistoryStore(tmp)
+
+        print(f"{'steps':>10} {'disk MB':>8} {'points':>7} {'lttb ms':>9} {'minmax ms':>10} {'peak RSS MB':>12}")
+        for steps in args.steps:
+            run_key = f"bench/history/run-{steps}"
+            size = write_series(store, run_key, "loss", steps)
+            for points in args.points:
+                def serve(method):
+                    x, y = store.load(run_key, "loss")
+                    return downsample(x, y, points, method)
+                lttb_s = time_call(lambda: serve("lttb"), args.repeat)
+                minmax_s = time_call(lambda: serve("minmax"), args.repeat)
+                print(f"{steps:>10} {size / 2**20:>8.1f} {points:>7} {lttb_s * 1000:>9.1f} "
+                      f"{minmax_s * 1000:>10.1f} {peak_rss_mb():>12.1f}")
+
+        rows = ({"_step": i, "loss": 1.0 / (i + 1), "lr": 1e-4, "_timestamp": i} for i in range(args.append_rows))
+        start = time.perf_counter()
+        store.append("bench/history/append", rows)
+        elapsed = time.perf_counter() - start
+        print(f"append: {args.append_rows} rows in {elapsed:.2f}s ({args.append_rows / elapsed:,.0f} rows/s)")
+
+
+if __name__ == "__main__":
+    main()
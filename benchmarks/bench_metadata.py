@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""Count run.metadata requests with and without the hardware prefetcher.
+
+Compares, on the same fake workload:
+  serial     every run reads run.metadata while it is processed (old path)
+  prefetch   concurrent prefetch, empty HardwareCache
+  cached     second refresh, HardwareCache already filled
+  skipped    fetch_metadata=False
+
+    python benchmarks/bench_metadata.py --runs 500 --latency 0.01
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'scripts'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_wandb import FakeApi  # noqa: E402
+import get_wandb_runs  # noqa: E402
+from run_store import HardwareCache  # noqa: E402
+
+
+def serial_baseline(api, project_path):
+    """Process runs one by one, letting each read its own metadata"""
+    return [get_wandb_runs.process_run(run) for run in api.runs(project_path, order=get_wandb_runs.RUN_ORDER)]
+
+
+def measure(label, api, fn):
+    start = time.perf_counter()
+    records = fn()
+    elapsed = time.perf_counter() - start
+    metadata = api.requests.counts.get("metadata_file", 0) + api.requests.counts.get("metadata_download", 0)
+    print(f"{label:10s} {elapsed:7.2f}s  {api.requests.total:6d} requests  "
+          f"{metadata:6d} metadata  {len(records)} runs")
+    return records
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=500)
+    parser.add_argument("--latency", type=float, default=0.01, help="seconds per simulated request")
+    parser.add_argument("--concurrency", type=int, default=get_wandb_runs.METADATA_CONCURRENCY)
+    args = parser.parse_args()
+
+    get_wandb_runs.METADATA_CONCURRENCY = args.concurrency
+    project_path = "bench/project-0"
+
+    def make_api():
+        return FakeApi(projects=1, runs_per_project=args.runs, latency=args.latency)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = HardwareCache(os.path.join(tmp, "runs.sqlite3"))
+
+        api = make_api()
+        baseline = measure("serial", api, lambda: serial_baseline(api, project_path))
+
+        api = make_api()
+        collector = get_wandb_runs.RunCollector(api, hardware_cache=cache)
+        prefetched = measure("prefetch", api, lambda: collector.get_project_runs(project_path))
+
+        api = make_api()
+        collector = get_wandb_runs.RunCollector(api, hardware_cache=cache)
+        cached = measure("cached", api, lambda: collector.get_project_runs(project_path))
+
+        api = make_api()
+        collector = get_wandb_runs.RunCollector(api, fetch_metadata=False)
+        measure("skipped", api, lambda: collector.get_project_runs(project_path))
+
+        assert baseline == prefetched == cached, "prefetched records differ from the serial path"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""Benchmark the all-projects fan-out of get_wandb_runs.get_runs.
+
+Runs the same fake workload sequentially (concurrency=1) and in parallel,
+including one slow and one failing project, and prints the speedup.
+
+    python benchmarks/bench_project_fanout.py --projects 32 --latency 0.05
+"""
+
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'scripts'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_wandb import FakeApi  # noqa: E402
+import get_wandb_runs  # noqa: E402
+
+
+def timed_run(api, concurrency, timeout):
+    start = time.perf_counter()
+    runs = get_wandb_runs.get_runs(api, concurrency=concurrency, project_timeout=timeout)
+    return time.perf_counter() - start, len(runs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--projects", type=int, default=16)
+    parser.add_argument("--runs", type=int, default=20, help="runs per project")
+    parser.add_argument("--latency", type=float, default=0.02, help="seconds per simulated request")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--timeout", type=float, default=1.5, help="per-project timeout")
+    args = parser.parse_args()
+
+    # project-0 hangs past the timeout, project-1 errors out
+    project_latency = {"project-0": args.timeout * 2, "project-1": None}
+
+    def make_api():
+        return FakeApi(projects=args.projects, runs_per_project=args.runs,
+                       latency=args.latency, project_latency=project_latency)
+
+    print(f"{args.projects} projects x {args.runs} runs, {args.latency * 1000:.0f}ms per request, "
+          f"timeout {args.timeout}s", file=sys.stderr)
+
+    sequential, seq_count = timed_run(make_api(), 1, args.timeout)
+    parallel, par_count = timed_run(make_api(), args.concurrency, args.timeout)
+
+    print(f"sequential:              {sequential:7.2f}s  {seq_count} runs")
+    print(f"parallel (concurrency {args.concurrency}): {parallel:7.2f}s  {par_count} runs")
+    print(f"speedup:                 {sequential / parallel:7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""Cold-start time of the scripts/ entry points, from python -X importtime.
+
+Runs every script on its cheap path: no API keys, an empty .env and a
+HuggingFace catalog that is already fresh. None of them should import an
+SDK there. For each script it reports the best wall time over --repeat
+runs, the total import time, whether wandb or huggingface_hub got
+imported and the slowest top-level imports. The SDK imports themselves
+are measured as reference rows when they are installed.
+
+    python benchmarks/bench_startup.py --repeat 5
+    python benchmarks/bench_startup.py --json startup.json
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPTS = os.path.join(ROOT, 'scripts')
+sys.path.insert(0, SCRIPTS)
+
+# name -> command line after the interpreter
+TARGETS = {
+    "get_wandb_runs": [os.path.join(SCRIPTS, "get_wandb_runs.py")],
+    "get_wandb_projects": [os.path.join(SCRIPTS, "get_wandb_projects.py")],
+    "get_hf_models": [os.path.join(SCRIPTS, "get_hf_models.py")],
+    "get_hf_datasets": [os.path.join(SCRIPTS, "get_hf_datasets.py")],
+    "hf_catalog": [os.path.join(SCRIPTS, "hf_catalog.py")],
+    "hf_cache": [os.path.join(SCRIPTS, "hf_cache.py")],
+    "import wandb": ["-c", "import wandb"],
+    "import huggingface_hub": ["-c", "import huggingface_hub"],
+}
+
+SDKS = ("wandb", "huggingface_hub")
+
+
+def parse_importtime(stderr):
+    """Return ({top-level module: cumulative us}, set of every imported module)"""
+    top, modules = {}, set()
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|", 2)
+        modules.add(name.strip())
+        # Nested imports are indented below their parent
+        if not name[1:].startswith(" "):
+            top[name.strip()] = top.get(name.strip(), 0) + int(cumulative)
+    return top, modules
+
+
+def run_once(args, env):
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-X", "importtime"] + args, env=env, cwd=ROOT,
+                          capture_output=True, text=True)
+    return time.perf_counter() - start, proc
+
+
+def seed_catalog(cache_dir):
+    """A fresh, empty public HF listing so the catalog answers from the store"""
+    env = dict(os.environ, TRAINING_MONITOR_CACHE=cache_dir)
+    code = ("from hf_catalog import HfCatalogStore, KINDS\n"
+            "store = HfCatalogStore()\n"
+            "for kind in KINDS: store.save('public', kind, [], full_sync=True)\n")
+    subprocess.run([sys.executable, "-c", code], env=env, cwd=SCRIPTS, check=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=3, help="runs per script, the fastest is kept")
+    parser.add_argument("--top", type=int, default=3, help="slowest top-level imports to show")
+    parser.add_argument("--json", help="also write the results to this file")
+    parser.add_argument("targets", nargs="*", help=f"subset of: {', '.join(TARGETS)}")
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        env_file = os.path.join(tmp, ".env")
+        open(env_file, "w").close()
+        seed_catalog(tmp)
+        env = {key: value for key, value in os.environ.items()
+               if key not in ("WANDB_API_KEY", "HF_TOKEN", "HUGGINGFACE_TOKEN")}
+        env.update(TRAINING_MONITOR_ENV=env_file, TRAINING_MONITOR_CACHE=tmp,
+                   HF_HUB_CACHE=os.path.join(tmp, "hub"))
+
+        print(f"{'target':24s} {'wall':>8s} {'imports':>8s}  sdk  slowest imports")
+        for name in args.targets or TARGETS:
+            best = None
+            for _ in range(args.repeat):
+                wall, proc = run_once(TARGETS[name], env)
+                if best is None or wall < best[0]:
+                    best = (wall, proc)
+            wall, proc = best
+            top, modules = parse_importtime(proc.stderr)
+            if name.startswith("import ") and proc.returncode != 0:
+                print(f"{name:24s} not installed")
+                continue
+            slowest = sorted(top.items(), key=lambda item: item[1], reverse=True)[:args.top]
+            sdk = [module for module in SDKS if module in modules]
+            results[name] = {
+                "wallMs": round(wall * 1000, 1),
+                "importMs": round(sum(top.values()) / 1000, 1),
+                "sdk": sdk,
+                "slowest": {module: round(us / 1000, 1) for module, us in slowest},
+            }
+            print(f"{name:24s} {wall * 1000:7.1f}ms {sum(top.values()) / 1000:7.1f}ms  "
+                  f"{'yes' if sdk else 'no ':3s}  "
+                  + ", ".join(f"{module} {us / 1000:.1f}ms" for module, us in slowest))
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
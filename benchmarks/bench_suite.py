@@ -0,0 +1,401 @@
+#!/usr/bin/env python3
+"""Offline benchmark suite for the run and HuggingFace pipelines.
+
+Each workload runs in its own process against the fakes in fake_wandb.py
+and fake_hf.py, with a throwaway cache directory. It reports wall time,
+throughput, peak RSS and simulated request counts by kind. Results can be
+saved as a baseline; later runs are compared against it and any workload
+that got slower, bigger or chattier than --tolerance allows is flagged
+(exit status 1).
+
+    python benchmarks/bench_suite.py                      # default workloads
+    python benchmarks/bench_suite.py --save               # record a baseline
+    python benchmarks/bench_suite.py runs-huge            # 50 projects x 2,000 runs x 5,000 keys
+    python benchmarks/bench_suite.py runs-basic --set projects=50 --set latency=0.01
+
+Workloads:
+  runs-*   get_wandb_runs.RunCollector.get_runs over all projects, then
+           json.dumps of the result as the script does. "cached" mode
+           uses the worker's stores and measures a second, incremental
+           call after the running runs advanced. "fields"/"metrics" set
+           the same projection as the endpoint's query parameters, and so
+           do the run filters ("state", "tag", "name", ...) and the paging
+           options ("limit", "offset", "per_page", "batch_size"). Each
+           phase reports the most fake run objects alive at once.
+  hf-*     "direct" lists models and datasets with get_hf_models /
+           get_hf_datasets, "catalog" fills the HfCatalog, then refreshes
+           it after a few repos changed. "details" enriches both listings
+           with hf_details cold, again unchanged, and after a few repos
+           changed.
+  search   builds the search_index over fake runs and both HF listings,
+           resyncs it after runs advanced (only changed documents are
+           reindexed) and times a mix of exact, prefix and misspelled
+           queries.
+  aggregate  lays the fake runs out in run_aggregates columns and times
+           grouped percentile/top-k queries cold, cached, and after the
+           run set changed.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+import tempfile
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'scripts'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+WORKLOADS = {
+    "runs-basic": {"kind": "wandb", "mode": "plain", "projects": 10, "runs": 200, "summary_keys": 50},
+    "runs-wide-summary": {"kind": "wandb", "mode": "plain", "projects": 2, "runs": 200, "summary_keys": 5000},
+    "runs-projected": {"kind": "wandb", "mode": "plain", "projects": 2, "runs": 200, "summary_keys": 5000,
+                       "fields": "id,name,state,progress,eta*,gpu*,metrics", "metrics": "metric/1?"},
+    "runs-latency": {"kind": "wandb", "mode": "plain", "projects": 16, "runs": 50, "summary_keys": 50,
+                     "latency": 0.005},
+    "runs-running-only": {"kind": "wandb", "mode": "cached", "projects": 10, "runs": 500, "summary_keys": 50,
+                          "state": "running"},
+    "runs-large-project": {"kind": "wandb", "mode": "plain", "projects": 1, "runs": 10000, "summary_keys": 500,
+                           "batch_size": 200},
+    "runs-first-page": {"kind": "wandb", "mode": "plain", "projects": 1, "runs": 10000, "summary_keys": 500,
+                        "limit": 50},
+    "runs-incremental": {"kind": "wandb", "mode": "cached", "projects": 10, "runs": 500, "summary_keys": 50},
+    "hf-direct": {"kind": "hf", "mode": "direct", "repos": 2000},
+    "hf-catalog": {"kind": "hf", "mode": "catalog", "repos": 2000, "touched": 5},
+    "hf-details": {"kind": "hf", "mode": "details", "repos": 200, "touched": 5, "latency": 0.005},
+    "search": {"kind": "search", "projects": 10, "runs": 2000, "repos": 2000, "queries": 200},
+    "aggregate": {"kind": "aggregate", "projects": 10, "runs": 2000, "summary_keys": 50},
+    # Opt-in only, needs several GB of memory
+    "runs-huge": {"kind": "wandb", "mode": "cached", "projects": 50, "runs": 2000, "summary_keys": 5000,
+                  "latency": 0.01, "default": False},
+}
+
+# Parameters --set may override, by workload kind
+PARAMETERS = {
+    "wandb": ("mode", "projects", "runs", "summary_keys", "latency", "fields", "metrics", "state", "tag", "user",
+              "created_after", "created_before", "name", "limit", "offset", "per_page", "batch_size"),
+    "hf": ("mode", "repos", "latency", "touched"),
+    "search": ("projects", "runs", "repos", "queries"),
+    "aggregate": ("projects", "runs", "summary_keys"),
+}
+
+# Queries timed by the search workload: exact, prefix, multi-term and misspelled
+SEARCH_QUERIES = ("run", "project-3", "ru", "finished", "model 12", "dataset-1", "lr 0.001", "modl", "datset 7")
+
+# Metrics compared against the baseline, all "lower is better"
+COMPARED = ("wallS", "peakRssMb", "requests")
+
+
+def peak_rss_mb():
+    # ru_maxrss is KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def bench_wandb(params):
+    from fake_wandb import FakeApi, LIVE_RUNS
+    import get_wandb_runs
+    from run_store import RunStore, FinishedRunCache, HardwareCache, GpuSampleStore
+    from eta_estimator import EtaEstimator
+    from projection import projection
+    from run_filters import RunFilter
+
+    api = FakeApi(projects=params["projects"], runs_per_project=params["runs"],
+                  summary_keys=params["summary_keys"], latency=params.get("latency", 0.0))
+    options = {}
+    if params["mode"] == "cached":
+        options = dict(store=RunStore(), cache=FinishedRunCache(), hardware_cache=HardwareCache(),
+                       gpu_samples=GpuSampleStore(), eta_estimator=EtaEstimator())
+    options["projection"] = projection(params.get("fields"), params.get("metrics"))
+    options["run_filter"] = RunFilter.from_params(params)
+    for key in ("limit", "offset", "per_page", "batch_size"):
+        if key in params:
+            options[key] = params[key]
+    collector = get_wandb_runs.RunCollector(api, **options)
+
+    phases = {}
+    LIVE_RUNS.reset_peak()
+    runs, elapsed = timed(collector.get_runs)
+    output, serialize = timed(lambda: json.dumps(runs))
+    phases["cold"] = {"records": len(runs), "wallS": elapsed, "serializeS": serialize, "bytes": len(output),
+                      "peakRuns": LIVE_RUNS.peak}
+
+    if params["mode"] == "cached":
+        api.advance(steps=100, seconds=60, finish_every=2)
+        before = dict(api.requests.counts)
+        LIVE_RUNS.reset_peak()
+        runs, elapsed = timed(collector.get_runs)
+        output, serialize = timed(lambda: json.dumps(runs))
+        requests = {kind: count - before.get(kind, 0) for kind, count in api.requests.counts.items()}
+        phases["incremental"] = {"records": len(runs), "wallS": elapsed, "serializeS": serialize,
+                                 "bytes": len(output), "requests": sum(requests.values()),
+                                 "peakRuns": LIVE_RUNS.peak}
+    return phases, api.requests.counts
+
+
+def bench_hf(params):
+    from fake_hf import FakeHfApi, install
+
+    api = FakeHfApi(token="bench-token", repos=params["repos"], latency=params.get("latency", 0.0))
+    install(api)
+    phases = {}
+    if params["mode"] == "direct":
+        import get_hf_models
+        import get_hf_datasets
+        (models, datasets), elapsed = timed(lambda: (get_hf_models.get_models(api, api.token),
+                                                     get_hf_datasets.get_datasets(api, api.token)))
+        phases["list"] = {"records": len(models) + len(datasets), "wallS": elapsed}
+    elif params["mode"] == "details":
+        from hf_catalog import HfCatalog
+        from hf_details import HfDetails
+        catalog = HfCatalog(api, api.token)
+        details = HfDetails(api, api.token)
+        listings = {kind: catalog.get(kind, background=False) for kind in ("models", "datasets")}
+
+        def enrich():
+            before = api.requests.total
+            enriched = [details.enrich(kind, records) for kind, records in listings.items()]
+            return sum(1 for records in enriched for record in records if "fileCount" in record), \
+                api.requests.total - before
+
+        for phase in ("cold", "warm"):
+            (records, requests), elapsed = timed(enrich)
+            phases[phase] = {"records": records, "wallS": elapsed, "requests": requests}
+        for kind in ("models", "datasets"):
+            api.touch(kind, params.get("touched", 5))
+        catalog.refresh_all()
+        listings = {kind: catalog.get(kind) for kind in ("models", "datasets")}
+        (records, requests), elapsed = timed(enrich)
+        phases["changed"] = {"records": records, "wallS": elapsed, "requests": requests}
+    else:
+        from hf_catalog import HfCatalog
+        catalog = HfCatalog(api, api.token)
+        _, elapsed = timed(lambda: [catalog.get(kind, background=False) for kind in ("models", "datasets")])
+        phases["fill"] = {"records": 2 * params["repos"], "wallS": elapsed}
+        for kind in ("models", "datasets"):
+            api.touch(kind, params.get("touched", 5))
+        before = api.requests.total
+        _, elapsed = timed(catalog.refresh_all)
+        records = [catalog.get(kind) for kind in ("models", "datasets")]
+        phases["refresh"] = {"records": sum(map(len, records)), "wallS": elapsed,
+                             "requests": api.requests.total - before}
+        _, elapsed = timed(lambda: [catalog.get(kind) for kind in ("models", "datasets")])
+        phases["serve"] = {"records": sum(map(len, records)), "wallS": elapsed}
+    return phases, api.requests.counts
+
+
+def bench_search(params):
+    from fake_wandb import FakeApi
+    from fake_hf import FakeHfApi, install
+    import get_wandb_runs
+    from hf_catalog import HfCatalog, KINDS
+    from search_index import SearchIndex, run_document, repo_document
+
+    wandb_api = FakeApi(projects=params["projects"], runs_per_project=params["runs"], summary_keys=20)
+    hf_api = FakeHfApi(token="bench-token", repos=params["repos"])
+    install(hf_api)
+    collector = get_wandb_runs.RunCollector(wandb_api)
+    catalog = HfCatalog(hf_api, hf_api.token)
+    listings = {kind: catalog.get(kind, background=False) for kind in KINDS}
+
+    def sync(runs):
+        by_project = {}
+        for record in runs:
+            by_project.setdefault(f"{record['entity']}/{record['project']}", []).append(record)
+        totals = [0, 0, 0]
+        for path, records in by_project.items():
+            for i, count in enumerate(index.sync(f"runs:{path}", map(run_document, records))):
+                totals[i] += count
+        for kind, records in listings.items():
+            for i, count in enumerate(index.sync(f"hf:{kind}", (repo_document(kind, r) for r in records))):
+                totals[i] += count
+        return totals
+
+    phases = {}
+    index = SearchIndex()
+    runs = collector.get_runs()
+    (added, _, _), elapsed = timed(lambda: sync(runs))
+    phases["build"] = {"records": len(index), "wallS": elapsed, "added": added, "terms": len(index.postings)}
+
+    wandb_api.advance(steps=100, seconds=60, finish_every=2)
+    runs = collector.get_runs()
+    (added, changed, removed), elapsed = timed(lambda: sync(runs))
+    phases["resync"] = {"records": len(index), "wallS": elapsed, "reindexed": added + changed + removed}
+
+    latencies = []
+    for i in range(params["queries"]):
+        _, elapsed = timed(lambda: index.search(SEARCH_QUERIES[i % len(SEARCH_QUERIES)], limit=20))
+        latencies.append(elapsed)
+    latencies.sort()
+    phases["query"] = {"records": len(latencies), "wallS": sum(latencies),
+                       "p50Ms": latencies[len(latencies) // 2] * 1000,
+                       "p99Ms": latencies[int(len(latencies) * 0.99)] * 1000}
+    counts = dict(wandb_api.requests.counts)
+    for kind, count in hf_api.requests.counts.items():
+        counts[kind] = counts.get(kind, 0) + count
+    return phases, counts
+
+
+def bench_aggregate(params):
+    from fake_wandb import FakeApi
+    import get_wandb_runs
+    from run_aggregates import RunAggregates
+
+    api = FakeApi(projects=params["projects"], runs_per_project=params["runs"], summary_keys=params["summary_keys"])
+    collector = get_wandb_runs.RunCollector(api)
+    aggregates = RunAggregates()
+    queries = [dict(metric="metric/0", group_by=["project"], aggregates=["min", "p50", "p95"], top=3),
+               dict(metric="gpuUtilization", aggregates=["p50", "p95"], where={"state": ["running"]}),
+               dict(group_by=["state", "gpu"])]
+
+    def sync(runs):
+        by_project = {}
+        for record in runs:
+            by_project.setdefault(f"{record['entity']}/{record['project']}", []).append(record)
+        return sum(aggregates.sync(path, records) for path, records in by_project.items())
+
+    def run_queries():
+        return sum(len(aggregates.query(**query)["groups"]) for query in queries)
+
+    phases = {}
+    runs = collector.get_runs()
+    sync(runs)
+    for phase in ("cold", "cached"):
+        groups, elapsed = timed(run_queries)
+        phases[phase] = {"records": len(runs), "wallS": elapsed, "groups": groups}
+    api.advance(steps=100, seconds=60, finish_every=2)
+    runs = collector.get_runs()
+    changed, elapsed = timed(lambda: sync(runs))
+    groups, query = timed(run_queries)
+    phases["changed"] = {"records": len(runs), "wallS": elapsed + query, "syncS": elapsed,
+                         "projectsChanged": changed, "groups": groups}
+    return phases, api.requests.counts
+
+
+BENCHES = {"wandb": bench_wandb, "hf": bench_hf, "search": bench_search, "aggregate": bench_aggregate}
+
+
+def run_child(name, params):
+    """Run one workload in this process and return its result dict"""
+    bench = BENCHES[params["kind"]]
+    (phases, counts), elapsed = timed(lambda: bench(params))
+    records = sum(phase["records"] for phase in phases.values())
+    return {
+        "workload": name,
+        "params": params,
+        "wallS": round(elapsed, 4),
+        "recordsPerS": round(records / elapsed, 1) if elapsed else None,
+        "peakRssMb": round(peak_rss_mb(), 1),
+        "requests": sum(counts.values()),
+        "requestsByKind": dict(sorted(counts.items())),
+        "phases": {key: {k: round(v, 4) if isinstance(v, float) else v for k, v in phase.items()}
+                   for key, phase in phases.items()},
+    }
+
+
+def run_workload(name, params):
+    """Run a workload in a fresh process so peak RSS is its own"""
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, TRAINING_MONITOR_CACHE=tmp, TRAINING_MONITOR_ENV=os.devnull,
+                   GPU_SAMPLER="0")
+        proc = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", name,
+                               "--params", json.dumps(params)], env=env, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"{name} failed:\n{proc.stderr[-2000:]}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def compare(result, baseline, tolerance):
+    """Regression messages for metrics that grew beyond the tolerance"""
+    problems = []
+    if baseline.get("params") != result["params"]:
+        return ["params differ from the baseline, not compared"]
+    for metric in COMPARED:
+        old, new = baseline.get(metric), result.get(metric)
+        if not old or new is None:
+            continue
+        # Request counts are deterministic, any increase is a regression
+        limit = old if metric == "requests" else old * (1 + tolerance)
+        if new > limit:
+            problems.append(f"{metric} {old} -> {new} ({(new - old) / old:+.0%})")
+    return problems
+
+
+def parse_value(text):
+    try:
+        return json.loads(text)
+    except ValueError:
+        return text
+
+
+def main():
+    from run_store import default_cache_dir
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("workloads", nargs="*", help=f"any of: {', '.join(WORKLOADS)}")
+    parser.add_argument("--set", action="append", default=[], metavar="KEY=VALUE",
+                        help="override a workload parameter, e.g. projects=50")
+    parser.add_argument("--baseline", default=os.path.join(default_cache_dir(), "bench_baseline.json"))
+    parser.add_argument("--save", action="store_true", help="store these results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed relative growth of wall time and peak RSS")
+    parser.add_argument("--json", help="also write the results to this file")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--params", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_child(args.child, json.loads(args.params))))
+        return
+
+    names = args.workloads or [name for name, spec in WORKLOADS.items() if spec.get("default", True)]
+    overrides = dict(item.split("=", 1) for item in args.set)
+    try:
+        with open(args.baseline) as f:
+            baselines = json.load(f)
+    except (OSError, ValueError):
+        baselines = {}
+
+    results, regressions = {}, 0
+    print(f"{'workload':20s} {'wall':>9s} {'records/s':>11s} {'peak RSS':>10s} {'requests':>9s}")
+    for name in names:
+        params = {key: value for key, value in WORKLOADS[name].items() if key != "default"}
+        params.update((key, parse_value(value)) for key, value in overrides.items()
+                      if key in PARAMETERS[params["kind"]])
+        result = run_workload(name, params)
+        results[name] = result
+        print(f"{name:20s} {result['wallS']:8.3f}s {result['recordsPerS'] or 0:11.1f} "
+              f"{result['peakRssMb']:8.1f}MB {result['requests']:9d}")
+        for phase, values in result["phases"].items():
+            extra = "  ".join(f"{key}={value}" for key, value in values.items())
+            print(f"  {phase:18s} {extra}")
+        if name in baselines and not args.save:
+            problems = compare(result, baselines[name], args.tolerance)
+            for problem in problems:
+                print(f"  REGRESSION {problem}" if "->" in problem else f"  {problem}")
+            regressions += sum("->" in problem for problem in problems)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.save:
+        baselines.update(results)
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w") as f:
+            json.dump(baselines, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+    if regressions:
+        print(f"{regressions} regression(s) against {args.baseline}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
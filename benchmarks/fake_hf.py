@@ -0,0 +1,139 @@
+"""Offline stand-in for huggingface_hub used by the benchmarks.
+
+FakeHfApi covers whoami, list_models and list_datasets (author, sort,
+direction, limit) with per-page latency, model_info and dataset_info with
+per-call latency, and counts every simulated request. install() registers a fake `huggingface_hub` module whose
+HfApi/list_models/list_datasets are backed by one FakeHfApi, so code that
+imports from huggingface_hub runs against it unchanged.
+"""
+
+import sys
+import time
+import types
+import random
+import hashlib
+import datetime
+
+from fake_wandb import RequestCounter
+
+EPOCH = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+class FakeRepo:
+    def __init__(self, kind, author, index):
+        rng = random.Random(f"{kind}/{author}/{index}")
+        self.id = f"{author}/{kind[:-1]}-{index}"
+        if kind == "models":
+            self.modelId = self.id
+        self.author = author
+        self.downloads = rng.randint(0, 100000)
+        self.last_modified = EPOCH + datetime.timedelta(hours=index)
+        self.lastModified = self.last_modified
+        self.tags = ["pytorch", f"license:{rng.choice(['mit', 'apache-2.0'])}"]
+        self.files = rng.randint(3, 20)
+        self.parameters = rng.randint(1, 2000) * 10 ** 6 if kind == "models" else None
+
+    @property
+    def sha(self):
+        # A new commit per modification
+        return hashlib.sha1(f"{self.id}@{self.last_modified.isoformat()}".encode()).hexdigest()
+
+
+class FakeSibling:
+    def __init__(self, rfilename, size):
+        self.rfilename = rfilename
+        self.size = size
+
+
+class FakeSafeTensors:
+    def __init__(self, total):
+        self.total = total
+        self.parameters = {"F32": total}
+
+
+class FakeRepoInfo:
+    """What model_info/dataset_info return with files_metadata=True"""
+
+    def __init__(self, repo):
+        self.id = repo.id
+        self.sha = repo.sha
+        self.private = False
+        self.gated = False
+        self.siblings = [FakeSibling("README.md", 2000)] + [
+            FakeSibling(f"model-{i:05d}.safetensors" if repo.parameters else f"data-{i:05d}.parquet", 10 ** 8)
+            for i in range(repo.files - 1)]
+        self.safetensors = FakeSafeTensors(repo.parameters) if repo.parameters else None
+
+
+class FakeHfApi:
+    """Fake of huggingface_hub.HfApi with `repos` models and datasets per author"""
+
+    def __init__(self, token=None, repos=200, latency=0.0, page_size=1000, username="bench"):
+        self.token = token
+        self.repos = repos
+        self.latency = latency
+        self.page_size = page_size
+        self.username = username
+        self.requests = RequestCounter()
+        self._touched = {"models": 0, "datasets": 0}
+
+    def call(self, kind):
+        self.requests.hit(kind)
+        if self.latency:
+            time.sleep(self.latency)
+
+    def touch(self, kind, count=1):
+        """Mark the `count` oldest repos of a kind as just modified"""
+        self._touched[kind] += count
+
+    def whoami(self, token=None):
+        self.call("whoami")
+        return {"name": self.username, "type": "user"}
+
+    def _list(self, kind, author=None, sort=None, direction=None, limit=None, **kwargs):
+        author = author or "public"
+        repos = [FakeRepo(kind, author, i) for i in range(self.repos)]
+        for i in range(min(self._touched[kind], len(repos))):
+            repos[i].last_modified = repos[i].lastModified = EPOCH + datetime.timedelta(days=3650, hours=i)
+        if sort in ("lastModified", "last_modified", "downloads"):
+            attr = "last_modified" if sort != "downloads" else "downloads"
+            repos.sort(key=lambda repo: getattr(repo, attr), reverse=direction == -1)
+        if limit:
+            repos = repos[:limit]
+        # Paginated and lazy, like the real generator
+        for start in range(0, max(len(repos), 1), self.page_size):
+            self.call(kind)
+            for repo in repos[start:start + self.page_size]:
+                yield repo
+
+    def list_models(self, **kwargs):
+        return self._list("models", **kwargs)
+
+    def list_datasets(self, **kwargs):
+        return self._list("datasets", **kwargs)
+
+    def _info(self, kind, repo_id, files_metadata=False, **kwargs):
+        self.call(f"{kind[:-1]}_info")
+        author, _, name = repo_id.partition("/")
+        index = int(name.rsplit("-", 1)[1])
+        repo = FakeRepo(kind, author, index)
+        if index < self._touched[kind]:
+            repo.last_modified = repo.lastModified = EPOCH + datetime.timedelta(days=3650, hours=index)
+        return FakeRepoInfo(repo)
+
+    def model_info(self, repo_id, **kwargs):
+        return self._info("models", repo_id, **kwargs)
+
+    def dataset_info(self, repo_id, **kwargs):
+        return self._info("datasets", repo_id, **kwargs)
+
+
+def install(api):
+    """Make `import huggingface_hub` return a fake module backed by `api`"""
+    module = types.ModuleType("huggingface_hub")
+    module.HfApi = lambda token=None, **kwargs: api
+    module.list_models = lambda token=None, **kwargs: api.list_models(**kwargs)
+    module.list_datasets = lambda token=None, **kwargs: api.list_datasets(**kwargs)
+    module.__version__ = "fake"
+    sys.modules["huggingface_hub"] = module
+    return module
@@ -0,0 +1,328 @@
+"""Offline stand-in for wandb.Api used by the benchmarks.
+
+Mimics the parts of the public API the scripts touch (projects, runs with
+filters and order, summary, config, metadata, state, scan_history) and can
+inject per-call latency. Every simulated network round-trip is counted in
+FakeApi.requests.
+
+Runs are generated deterministically from their project and index, page
+by page as a listing is iterated, and summaries are only built on first
+access, so large workloads (many projects, thousands of runs, thousands
+of summary keys) cost nothing until the code under test touches them.
+Like wandb's paginator, a listing keeps every run it loaded in
+`.objects`. LIVE_RUNS tracks how many FakeRun objects are alive and the
+peak. FakeApi.advance() moves the running runs forward to exercise
+incremental syncs.
+"""
+
+import re
+import time
+import itertools
+import random
+import datetime
+import threading
+
+EPOCH = datetime.datetime(2024, 1, 1)
+
+
+class RequestCounter:
+    """Thread-safe counter of simulated API calls, by kind"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts = {}
+
+    def hit(self, kind):
+        with self.lock:
+            self.counts[kind] = self.counts.get(kind, 0) + 1
+
+    @property
+    def total(self):
+        return sum(self.counts.values())
+
+
+class LiveCounter:
+    """FakeRun objects currently alive and the most at any one time"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.now = 0
+        self.peak = 0
+
+    def add(self, n):
+        with self.lock:
+            self.now += n
+            self.peak = max(self.peak, self.now)
+
+    def reset_peak(self):
+        with self.lock:
+            self.peak = self.now
+
+
+LIVE_RUNS = LiveCounter()
+
+
+class FakeRun:
+    def __init__(self, api, entity, project, index, state, summary_keys, progress=0, heartbeat_offset=0):
+        LIVE_RUNS.add(1)
+        self._api = api
+        self._index = index
+        self._summary_keys = summary_keys
+        self._progress = progress
+        rng = random.Random(f"{project}/{index}")
+        self.id = f"{project}-{index:06d}"
+        self.name = f"run-{index}"
+        self.entity = entity
+        self.project = project
+        self.state = state
+        self.user = f"user-{index % 5}"
+        self.tags = ["baseline"] if index % 3 == 0 else ["sweep", f"lr-{index % 4}"]
+        created = EPOCH + datetime.timedelta(minutes=index)
+        self.created_at = created.strftime("%Y-%m-%dT%H:%M:%S")
+        self.heartbeat_at = (created + datetime.timedelta(hours=1, seconds=heartbeat_offset)).strftime(
+            "%Y-%m-%dT%H:%M:%S")
+        self._step = min(rng.randint(1, 10000) + progress, 10000)
+        self.config = {"steps": 10000, "lr": 1e-4, "batch_size": 32, "seed": index}
+        self._summary = None
+        self._metadata_doc = {"gpu": "NVIDIA A100-SXM4-80GB", "gpu_count": 8}
+        self._metadata = None
+
+    def __del__(self):
+        LIVE_RUNS.add(-1)
+
+    @property
+    def summary(self):
+        # Built on first access, a 5,000-key summary is not free
+        if self._summary is None:
+            rng = random.Random(f"{self.id}/summary")
+            summary = {"_step": self._step, "_runtime": self._step * 0.5,
+                       "_timestamp": 1704067200 + self._index * 60 + self._step * 0.5,
+                       "system.gpu.0.gpu": rng.uniform(0, 100)}
+            for k in range(self._summary_keys):
+                if k % 500 == 1:
+                    # Media and table entries arrive as nested dicts
+                    summary[f"media/{k}"] = {"_type": "image-file", "path": f"media/{k}.png", "size": k}
+                elif k % 500 == 2:
+                    summary[f"text/{k}"] = f"value-{k}"
+                elif k % 500 == 3:
+                    # Not JSON serializable, like the odd object wandb hands back
+                    summary[f"time/{k}"] = EPOCH
+                else:
+                    summary[f"metric/{k}"] = rng.random()
+            self._summary = summary
+        return self._summary
+
+    @property
+    def metadata(self):
+        # Real runs look up wandb-metadata.json and download it on first access
+        if self._metadata is None:
+            self._api.call("metadata_file")
+            self._api.call("metadata_download")
+            self._metadata = self._metadata_doc
+        return self._metadata
+
+    def scan_history(self, keys=None, page_size=1000, min_step=None, max_step=None):
+        """System metric rows up to the current step, one request per page"""
+        first = min_step or 0
+        last = self._step if max_step is None else min(max_step, self._step)
+        rng = random.Random(f"{self.id}/history")
+        rows = []
+        for step in range(first, last + 1):
+            row = {"_step": step, "_runtime": step * 0.5, "loss": 1.0 / (step + 1),
+                   "system.gpu.0.gpu": rng.uniform(0, 100)}
+            if keys:
+                if not all(key in row for key in keys):
+                    continue
+                row = {key: row[key] for key in ["_step"] + list(keys)}
+            rows.append(row)
+        for _ in range(max(1, -(-len(rows) // page_size))):
+            self._api.call("history")
+        return iter(rows)
+
+
+class FakeRuns:
+    """Lazy listing like wandb's Runs paginator: one request per page,
+    loaded runs are appended to .objects and stay there"""
+
+    def __init__(self, api, source, page_size, latency):
+        self.api = api
+        self.source = iter(source)
+        self.page_size = page_size
+        self.latency = latency
+        self.objects = []
+        self.loaded = False
+        self.more = True
+
+    def load_page(self):
+        page = list(itertools.islice(self.source, self.page_size + 1))
+        if page or not self.loaded:
+            self.api.call("runs", self.latency)
+        self.loaded = True
+        # One run of lookahead, the real API reports hasNextPage
+        if len(page) > self.page_size:
+            self.source = itertools.chain(page[self.page_size:], self.source)
+            page = page[:self.page_size]
+        else:
+            self.more = False
+        self.objects.extend(page)
+
+    def __iter__(self):
+        index = 0
+        while True:
+            if index >= len(self.objects):
+                if not self.more:
+                    return
+                self.load_page()
+                if index >= len(self.objects):
+                    return
+            yield self.objects[index]
+            index += 1
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+
+class FakeProject:
+    def __init__(self, entity, name):
+        self.entity = entity
+        self.name = name
+
+
+def run_field(run, field):
+    """Value of a filter field for a run, None if it has none"""
+    if field == "name":
+        return run.id
+    if field == "display_name":
+        return run.name
+    if field in ("state", "tags"):
+        return getattr(run, field)
+    if field in ("username", "user"):
+        return run.user
+    if field in ("createdAt", "created_at"):
+        return run.created_at
+    if field in ("heartbeatAt", "heartbeat_at"):
+        return run.heartbeat_at
+    for prefix, source in (("config.", run.config), ("summary_metrics.", None)):
+        if field.startswith(prefix):
+            source = run.summary if source is None else source
+            return source.get(field[len(prefix):])
+    return None
+
+
+def matches(run, filters):
+    """Evaluate a wandb/MongoDB-style filter dict against a run"""
+    for key, condition in filters.items():
+        if key == "$or":
+            if not any(matches(run, sub) for sub in condition):
+                return False
+        elif key == "$and":
+            if not all(matches(run, sub) for sub in condition):
+                return False
+        elif not field_matches(run_field(run, key), condition):
+            return False
+    return True
+
+
+def field_matches(value, condition):
+    if not isinstance(condition, dict):
+        return condition in value if isinstance(value, list) else value == condition
+    for op, operand in condition.items():
+        values = value if isinstance(value, list) else [value]
+        if op == "$eq":
+            ok = operand in values
+        elif op == "$ne":
+            ok = operand not in values
+        elif op == "$in":
+            ok = any(v in operand for v in values)
+        elif op == "$nin":
+            ok = not any(v in operand for v in values)
+        elif op == "$regex":
+            ok = value is not None and re.search(operand, str(value)) is not None
+        elif op in ("$gt", "$gte", "$lt", "$lte"):
+            if value is None:
+                return False
+            ok = {"$gt": value > operand, "$gte": value >= operand,
+                  "$lt": value < operand, "$lte": value <= operand}[op]
+        else:
+            raise ValueError(f"unsupported filter operator {op}")
+        if not ok:
+            return False
+    return True
+
+
+class FakeApi:
+    """Configurable fake of wandb.Api.
+
+    `latency` is slept per simulated request, `project_latency` can override
+    it for individual projects to model a slow or failing project (a value
+    of None makes that project raise). Every `running_every`-th run is
+    running, the rest finished.
+    """
+
+    def __init__(self, projects=5, runs_per_project=100, summary_keys=20, latency=0.0,
+                 page_size=50, running_every=50, project_latency=None, entity="bench"):
+        self.entity = entity
+        self.project_names = [f"project-{i}" for i in range(projects)]
+        self.runs_per_project = runs_per_project
+        self.summary_keys = summary_keys
+        self.latency = latency
+        self.page_size = page_size
+        self.running_every = running_every
+        self.project_latency = project_latency or {}
+        self.requests = RequestCounter()
+        # (project, index) -> [state, progress, heartbeat offset] changed by advance()
+        self._changes = {}
+        self._lock = threading.Lock()
+
+    def call(self, kind, latency=None):
+        self.requests.hit(kind)
+        delay = self.latency if latency is None else latency
+        if delay:
+            time.sleep(delay)
+
+    def flush(self):
+        # Runs are built per listing, there is nothing to drop
+        pass
+
+    def projects(self, entity=None, per_page=200):
+        self.call("projects")
+        return [FakeProject(self.entity, name) for name in self.project_names]
+
+    def _initial_state(self, index):
+        return "running" if self.running_every and index % self.running_every == 0 else "finished"
+
+    def _project_runs(self, name, indices):
+        for i in indices:
+            with self._lock:
+                state, progress, offset = self._changes.get((name, i), (self._initial_state(i), 0, 0))
+            yield FakeRun(self, self.entity, name, i, state, self.summary_keys, progress, offset)
+
+    def advance(self, steps=100, seconds=60, finish_every=0):
+        """Move every running run forward; every finish_every-th of them finishes"""
+        with self._lock:
+            for name in self.project_names:
+                running = [i for i in range(self.runs_per_project)
+                           if self._changes.get((name, i), (self._initial_state(i),))[0] == "running"]
+                for n, i in enumerate(running):
+                    _, progress, offset = self._changes.get((name, i), ("running", 0, 0))
+                    state = "finished" if finish_every and n % finish_every == 0 else "running"
+                    self._changes[(name, i)] = [state, progress + steps, offset + seconds]
+
+    def runs(self, path, filters=None, order="+created_at", per_page=None):
+        name = path.split("/")[-1]
+        latency = self.project_latency.get(name, self.latency)
+        if latency is None:
+            self.call("runs")
+            raise RuntimeError(f"project {name} is unavailable")
+        field = (order or "+created_at").lstrip("+-")
+        descending = bool(order) and order.startswith("-")
+        if field in ("created_at", "createdAt"):
+            # Creation time grows with the index, no need to build every run to sort
+            indices = range(self.runs_per_project)
+            runs = self._project_runs(name, reversed(indices) if descending else indices)
+        else:
+            runs = sorted(self._project_runs(name, range(self.runs_per_project)),
+                          key=lambda run: run_field(run, field) or "", reverse=descending)
+        if filters:
+            runs = (run for run in runs if matches(run, filters))
+        return FakeRuns(self, runs, per_page or self.page_size, latency)
@@ -5,19 +5,17 @@ import json
 import sys
 import os
 
-# Load .env file manually from same directory
-env_path = os.path.join(os.path.dirname(__file__), '.env')
-print(f"Looking for .env at: {env_path}")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'scripts'))
+from entrypoint import env_path, load_env  # noqa: E402
 
-if os.path.exists(env_path):
+# Load .env file from the project root
+print(f"Looking for .env at: {env_path()}")
+
+if os.path.exists(env_path()):
     print("✅ .env file found")
-    with open(env_path, 'r') as f:
-        for line in f:
-            if '=' in line and not line.strip().startswith('#'):
-                key, value = line.strip().split('=', 1)
-                os.environ[key] = value
-                if 'TOKEN' in key:
-                    print(f"✅ Found token: {key}={value[:10]}...")
+    for key, value in load_env().items():
+        if 'TOKEN' in key:
+            print(f"✅ Found token: {key}={value[:10]}...")
 else:
     print("❌ .env file not found")
 
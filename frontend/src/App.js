@@ -1,6 +1,137 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import './App.css';
 
+// The run fields the table shows; leaving out the summary keeps the payload small
+const RUN_FIELDS = 'id,name,state,progress,totalSteps,createdAt,eta,etaRange,throughput,gpu,gpuUtilization,partial';
+
+const sortRuns = (runs) => [...runs].sort((a, b) => (a.createdAt < b.createdAt ? 1 : a.createdAt > b.createdAt ? -1 : 0));
+
+const runKey = (run) => `${run.entity}/${run.project}/${run.id}`;
+
+// Results asked from /api/search per filter, and the typing pause before asking
+const SEARCH_LIMIT = 200;
+const SEARCH_DEBOUNCE_MS = 150;
+
+// Poll delay bounds; within them the server's X-Refresh-In hint decides
+const MIN_POLL_MS = 5000;
+const MAX_POLL_MS = 5 * 60 * 1000;
+const DEFAULT_POLL_MS = 30000;
+
+const pollDelay = (refreshIn) => (
+  refreshIn == null ? DEFAULT_POLL_MS : Math.min(MAX_POLL_MS, Math.max(MIN_POLL_MS, refreshIn * 1000))
+);
+
+// Apply a {added, changed, removed} runs delta, null if it does not fit our copy
+function applyRunsDelta(runs, delta) {
+  const byKey = new Map(runs.map((run) => [runKey(run), run]));
+  for (const key of delta.removed) byKey.delete(key);
+  for (const run of delta.added) byKey.set(runKey(run), run);
+  for (const change of delta.changed) {
+    const run = byKey.get(change.key);
+    if (!run) return null;
+    const next = { ...run, ...change.set };
+    for (const field of change.unset) delete next[field];
+    if (change.metrics) {
+      next.metrics = { ...run.metrics, ...change.metrics.set };
+      for (const key of change.metrics.unset) delete next.metrics[key];
+    }
+    byKey.set(change.key, next);
+  }
+  return sortRuns([...byKey.values()]);
+}
+
+// Poll /api/wandb/runs for the changes since the version we hold.
+// `current` is {query, version, runs}; returns the next one.
+async function fetchRunsDelta(query, current) {
+  const version = current.query === query ? current.version : null;
+  const response = await fetch(`/api/wandb/runs${query}&since=${encodeURIComponent(version || '')}`, {
+    headers: version ? { 'If-None-Match': `"${version}"` } : {}
+  });
+  const hint = response.headers.get('X-Refresh-In');
+  const refreshIn = hint === null ? null : Number(hint);
+  if (response.status === 304) return { ...current, refreshIn };
+  if (!response.ok) throw new Error(`HTTP ${response.status}`);
+  const delta = await response.json();
+  if (delta.full) return { query, version: delta.version, runs: sortRuns(delta.runs), refreshIn };
+  const runs = applyRunsDelta(current.runs, delta);
+  // Out of step with the server, start over with the full list
+  return runs
+    ? { query, version: delta.version, runs, refreshIn }
+    : fetchRunsDelta(query, { query, version: null, runs: [] });
+}
+
+// Read an NDJSON stream, calling onItems with the items of each chunk as it arrives
+async function readNdjson(url, onItems) {
+  const response = await fetch(url);
+  if (!response.ok || !response.body) throw new Error(`HTTP ${response.status}`);
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+  for (;;) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    const lines = buffer.split('\n');
+    buffer = lines.pop();
+    onItems(lines.filter((line) => line.trim()).map((line) => JSON.parse(line)));
+  }
+  if (buffer.trim()) onItems([JSON.parse(buffer)]);
+}
+
+// Read the NDJSON runs stream, calling onProgress with the rows received so far
+async function fetchRunsStream(url, onProgress) {
+  const runs = [];
+  await readNdjson(url, (items) => {
+    runs.push(...items);
+    onProgress(sortRuns(runs));
+  });
+  return sortRuns(runs);
+}
+
+// Merge streamed HF repo details into listing records; details read at an
+// older lastModified are left out until they are streamed again
+const withDetails = (records, details) => records.map((record) => {
+  const entry = details[record.name];
+  return entry && entry.lastModified === record.lastModified ? { ...record, ...entry.details } : record;
+});
+
+const formatCount = (count) => {
+  if (count >= 1e9) return `${(count / 1e9).toFixed(1)}B`;
+  if (count >= 1e6) return `${(count / 1e6).toFixed(1)}M`;
+  if (count >= 1e3) return `${(count / 1e3).toFixed(1)}K`;
+  return String(count);
+};
+
+// Ranked names matching `text` from /api/search, null while unknown
+function useSearch(text, type) {
+  const [matches, setMatches] = useState(null);
+  useEffect(() => {
+    setMatches(null);
+    if (!text.trim()) return undefined;
+    let cancelled = false;
+    const timer = setTimeout(() => {
+      fetch(`/api/search?q=${encodeURIComponent(text)}&types=${type}&limit=${SEARCH_LIMIT}`)
+        .then((r) => (r.ok ? r.json() : Promise.reject(new Error(`HTTP ${r.status}`))))
+        .then((data) => { if (!cancelled) setMatches(data.results.map((result) => result.name)); })
+        .catch(() => {});
+    }, SEARCH_DEBOUNCE_MS);
+    return () => {
+      cancelled = true;
+      clearTimeout(timer);
+    };
+  }, [text, type]);
+  return matches;
+}
+
+// Records in search rank order, or by substring while there is no ranking
+// (or the index has nothing, e.g. before the worker stored any listing)
+function filterByMatches(records, text, matches) {
+  if (!text.trim()) return records;
+  if (!matches || matches.length === 0) return records.filter((record) => record.name.toLowerCase().includes(text.toLowerCase()));
+  const byName = new Map(records.map((record) => [record.name, record]));
+  return matches.filter((name) => byName.has(name)).map((name) => byName.get(name));
+}
+
 function App() {
   const [wandbRuns, setWandbRuns] = useState([]);
   const [wandbProjects, setWandbProjects] = useState([]);
@@ -12,31 +143,58 @@ function App() {
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
   const [activeTab, setActiveTab] = useState('models');
+  const runsLoaded = useRef(false);
+  const runsState = useRef({ query: null, version: null, runs: [] });
+  // Streamed HF details by kind and repo name: {lastModified, details}
+  const hfDetails = useRef({ models: {}, datasets: {} });
+  const hfDetailsStreaming = useRef({ models: false, datasets: false });
 
+  // Poll again when the server expects the runs to have changed: seconds
+  // while runs are active, minutes when everything is finished
   useEffect(() => {
-    fetchData();
-    const interval = setInterval(fetchData, 30000);
-    return () => clearInterval(interval);
+    let timer = null;
+    let stopped = false;
+    const poll = async () => {
+      const refreshIn = await fetchData();
+      if (!stopped) timer = setTimeout(poll, pollDelay(refreshIn));
+    };
+    poll();
+    return () => {
+      stopped = true;
+      clearTimeout(timer);
+    };
   }, []);
 
   const fetchData = async () => {
     try {
       setLoading(true);
       
-      const projectParam = selectedProject ? `?project=${encodeURIComponent(selectedProject)}` : '';
+      const projectParam = selectedProject ? `&project=${encodeURIComponent(selectedProject)}` : '';
+      const runsQuery = `?fields=${RUN_FIELDS}${projectParam}`;
       
+      // Show rows as they stream in on first load; later refreshes only
+      // fetch what changed and swap the list at once so the table does not flicker
+      const runsPromise = runsLoaded.current
+        ? fetchRunsDelta(runsQuery, runsState.current).catch(() => runsState.current)
+        : fetchRunsStream(`/api/wandb/runs/stream${runsQuery}`, (partial) => setWandbRuns(partial))
+          .catch(() => fetch(`/api/wandb/runs${runsQuery}`).then(r => r.json()).catch(() => []))
+          .then((runs) => ({ query: runsQuery, version: null, runs }));
+
       const [runsRes, projectsRes, modelsRes, datasetsRes] = await Promise.all([
-        fetch(`/api/wandb/runs${projectParam}`).then(r => r.json()).catch(() => []),
+        runsPromise,
         fetch('/api/wandb/projects').then(r => r.json()).catch(() => []),
         fetch('/api/huggingface/models').then(r => r.json()).catch(() => []),
         fetch('/api/huggingface/datasets').then(r => r.json()).catch(() => [])
       ]);
 
-      setWandbRuns(runsRes);
+      runsState.current = runsRes;
+      setWandbRuns(runsRes.runs);
+      runsLoaded.current = true;
       setWandbProjects(projectsRes);
-      setModels(modelsRes);
-      setDatasets(datasetsRes);
+      loadHfDetails('models', modelsRes, setModels);
+      loadHfDetails('datasets', datasetsRes, setDatasets);
       setError(null);
+      return runsRes.refreshIn;
     } catch (err) {
       setError('Failed to fetch data');
       console.error(err);
@@ -45,25 +203,49 @@ function App() {
     }
   };
 
+  // Show the listing with the details we have, and stream in those of new or changed repos
+  const loadHfDetails = (kind, records, setRecords) => {
+    const known = hfDetails.current[kind];
+    setRecords(withDetails(records, known));
+    const complete = records.every((record) => known[record.name] && known[record.name].lastModified === record.lastModified);
+    if (complete || hfDetailsStreaming.current[kind]) return;
+    hfDetailsStreaming.current[kind] = true;
+    const listed = new Map(records.map((record) => [record.name, record.lastModified]));
+    readNdjson(`/api/huggingface/${kind}/details`, (items) => {
+      for (const { name, ...details } of items) {
+        known[name] = { lastModified: listed.get(name), details };
+      }
+      setRecords((current) => withDetails(current, known));
+    })
+      .catch((err) => console.error(`Failed to stream ${kind} details`, err))
+      .finally(() => { hfDetailsStreaming.current[kind] = false; });
+  };
+
   useEffect(() => {
     if (selectedProject !== undefined) {
       fetchData();
     }
   }, [selectedProject]);
 
-  const filteredModels = models.filter(model => 
-    model.name.toLowerCase().includes(modelFilter.toLowerCase())
-  );
+  // Filter text goes to the backend search index; the local substring
+  // filter only applies until its ranked answer arrives (or if it fails)
+  const modelMatches = useSearch(modelFilter, 'model');
+  const datasetMatches = useSearch(datasetFilter, 'dataset');
 
-  const filteredDatasets = datasets.filter(dataset => 
-    dataset.name.toLowerCase().includes(datasetFilter.toLowerCase())
-  );
+  const filteredModels = filterByMatches(models, modelFilter, modelMatches);
+  const filteredDatasets = filterByMatches(datasets, datasetFilter, datasetMatches);
 
   const calculateProgress = (run) => {
     if (!run.totalSteps || run.totalSteps === 0) return 0;
     return Math.min(100, (run.progress / run.totalSteps) * 100);
   };
 
+  const formatEtaRange = (run) => {
+    if (!run.etaRange) return undefined;
+    const minutes = (seconds) => `${Math.round(seconds / 60)}m`;
+    return `${minutes(run.etaRange[0])} – ${minutes(run.etaRange[1])}`;
+  };
+
   return (
     <div className="App">
       <header className="App-header">
@@ -105,7 +287,8 @@ function App() {
                   <div className="col-gpu-util">GPU %</div>
                 </div>
                 {wandbRuns.map(run => (
-                  <div key={run.id} className="table-row">
+                  <div key={run.id} className={`table-row${run.partial ? ' partial' : ''}`}
+                    title={run.partial ? 'Not refreshed in time, showing the last known values' : undefined}>
                     <div className="col-name">
                       <div className="run-name">{run.name || run.id}</div>
                     </div>
@@ -132,7 +315,10 @@ function App() {
                       </div>
                     </div>
                     <div className="col-eta">
-                      <div className="eta-text">{run.eta || 'N/A'}</div>
+                      <div className="eta-text" title={formatEtaRange(run)}>{run.eta || 'N/A'}</div>
+                      {run.throughput ? (
+                        <div className="eta-rate">{run.throughput.toFixed(2)} steps/s</div>
+                      ) : null}
                     </div>
                     <div className="col-gpu">
                       <div className="gpu-text">{run.gpu || 'N/A'}</div>
@@ -179,7 +365,15 @@ function App() {
                   filteredModels.map((model, idx) => (
                     <div key={idx} className="item-card">
                       <div className="item-name">{model.name}</div>
-                      <div className="item-meta">Size: {model.size}</div>
+                      <div className="item-meta">Size: {model.size || '…'}</div>
+                      {model.parameters != null && (
+                        <div className="item-meta">Parameters: {formatCount(model.parameters)}</div>
+                      )}
+                      {model.fileCount != null && (
+                        <div className="item-meta">
+                          Files: {model.fileCount}{model.gated ? ` · gated (${model.gated})` : ''}{model.private ? ' · private' : ''}
+                        </div>
+                      )}
                     </div>
                   ))
                 )}
@@ -203,7 +397,15 @@ function App() {
                   filteredDatasets.map((dataset, idx) => (
                     <div key={idx} className="item-card">
                       <div className="item-name">{dataset.name}</div>
-                      <div className="item-meta">Size: {dataset.size}</div>
+                      <div className="item-meta">Size: {dataset.size || '…'}</div>
+                      {dataset.parameters != null && (
+                        <div className="item-meta">Parameters: {formatCount(dataset.parameters)}</div>
+                      )}
+                      {dataset.fileCount != null && (
+                        <div className="item-meta">
+                          Files: {dataset.fileCount}{dataset.gated ? ` · gated (${dataset.gated})` : ''}{dataset.private ? ' · private' : ''}
+                        </div>
+                      )}
                     </div>
                   ))
                 )}
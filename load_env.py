@@ -2,15 +2,11 @@
 """Load environment variables from .env file"""
 
 import os
+import sys
 
-def load_env():
-    """Load .env file manually"""
-    if os.path.exists('.env'):
-        with open('.env', 'r') as f:
-            for line in f:
-                if '=' in line and not line.strip().startswith('#'):
-                    key, value = line.strip().split('=', 1)
-                    os.environ[key] = value
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'scripts'))
+
+from entrypoint import load_env  # noqa: E402,F401
 
 if __name__ == "__main__":
     load_env()
@@ -0,0 +1,76 @@
+"""Shared start-up helpers for the scripts.
+
+Importing wandb or huggingface_hub takes seconds on a Raspberry Pi, so this
+module imports neither. Scripts load their config through load_env() and
+only import an SDK, through wandb_api() / hf_api(), once they know they
+will call it. Paths that can answer without the SDK (no API key, a fresh
+local cache) then return without paying for the import.
+"""
+
+import os
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# .env files already read, by path
+_loaded = {}
+
+
+def env_path():
+    """The .env file to read, override with TRAINING_MONITOR_ENV"""
+    return os.environ.get("TRAINING_MONITOR_ENV") or os.path.join(PROJECT_ROOT, '.env')
+
+
+def parse_env(text):
+    """KEY=value pairs of a .env file as a dict.
+
+    Blank lines and comments are skipped, an `export ` prefix is allowed
+    and matching quotes around the value are stripped.
+    """
+    values = {}
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line.startswith('#') or '=' not in line:
+            continue
+        key, value = line.split('=', 1)
+        key = key.strip()
+        if key.startswith('export '):
+            key = key[len('export '):].strip()
+        value = value.strip()
+        if len(value) >= 2 and value[0] == value[-1] and value[0] in '"\'':
+            value = value[1:-1]
+        values[key] = value
+    return values
+
+
+def load_env(path=None, override=True):
+    """Load a .env file (the project's by default) into os.environ, once.
+
+    Returns the parsed values, empty if the file does not exist.
+    """
+    path = path or env_path()
+    if path not in _loaded:
+        try:
+            with open(path) as f:
+                _loaded[path] = parse_env(f.read())
+        except FileNotFoundError:
+            _loaded[path] = {}
+        for key, value in _loaded[path].items():
+            if override or key not in os.environ:
+                os.environ[key] = value
+    return _loaded[path]
+
+
+def hf_token():
+    return os.getenv('HF_TOKEN') or os.getenv('HUGGINGFACE_TOKEN')
+
+
+def wandb_api():
+    """A new wandb.Api, wandb is imported on the first call"""
+    import wandb
+    return wandb.Api()
+
+
+def hf_api(token=None):
+    """A new HfApi, huggingface_hub is imported on the first call"""
+    from huggingface_hub import HfApi
+    return HfApi(token=token)
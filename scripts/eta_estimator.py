@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""Throughput-based ETA for running wandb runs.
+
+Every time a running run is listed, its (_runtime, _step) pair is added to
+a small rolling window kept per run in the local SQLite store, so the
+estimate carries over between polls and worker restarts. The rate is the
+Theil-Sen slope of steps over runtime (median of all pairwise slopes),
+which ignores the odd eval pause or warmup interval that skews a plain
+_step / _runtime ratio. The interquartile range of the pairwise slopes
+gives the confidence band of the ETA.
+
+    python scripts/eta_estimator.py entity/project/run_id
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+
+import numpy as np
+
+from run_store import connect, default_store_path
+
+# (runtime, step) samples kept per run, state stays O(1) per run
+ETA_WINDOW = int(os.environ.get("ETA_WINDOW", "16"))
+
+# Minimum runtime (seconds) between two samples of the same run
+ETA_MIN_INTERVAL = float(os.environ.get("ETA_MIN_INTERVAL", "10"))
+
+# Windows of runs not seen running for this long are dropped (seconds)
+ETA_STATE_TTL = 7 * 24 * 3600
+
+
+def add_sample(window, runtime, step, size=ETA_WINDOW, min_interval=ETA_MIN_INTERVAL):
+    """Return the window with (runtime, step) appended, oldest samples dropped.
+
+    A step or runtime that goes backwards means the run was rewound or
+    restarted from scratch, the old samples no longer apply.
+    """
+    if window:
+        last_runtime, last_step = window[-1]
+        if step < last_step or runtime < last_runtime:
+            window = []
+        elif runtime - last_runtime < min_interval:
+            return window
+    return (window + [[runtime, step]])[-size:]
+
+
+def estimate_rate(window):
+    """Return (rate, low, high) in steps/sec, or None without enough samples.
+
+    With a single sample the rate is the run's average so far and there is
+    no band; low/high are the quartiles of the pairwise slopes otherwise.
+    """
+    if not window:
+        return None
+    samples = np.asarray(window, dtype=np.float64)
+    runtime, step = samples[:, 0], samples[:, 1]
+    if len(samples) == 1:
+        if runtime[0] <= 0 or step[0] <= 0:
+            return None
+        return float(step[0] / runtime[0]), None, None
+
+    i, j = np.triu_indices(len(samples), k=1)
+    dt = runtime[j] - runtime[i]
+    valid = dt > 0
+    if not valid.any():
+        return None
+    slopes = (step[j] - step[i])[valid] / dt[valid]
+    low, rate, high = np.percentile(slopes, [25, 50, 75])
+    if rate <= 0:
+        return None
+    return float(rate), float(max(low, 0.0)), float(high)
+
+
+class EtaEstimator:
+    """Per-run rolling (runtime, step) windows in SQLite.
+
+    Keyed by "entity/project/run_id". observe_many() is called once per
+    project listing with every running run, so a poll costs one read and
+    one write transaction. The keys with a stored window are also kept in
+    memory, so forgetting the finished runs of a listing only deletes the
+    ones that were actually tracked.
+    """
+
+    def __init__(self, path=None, size=ETA_WINDOW, min_interval=ETA_MIN_INTERVAL):
+        self.path = path or default_store_path()
+        self.size = size
+        self.min_interval = min_interval
+        self.lock = threading.Lock()
+        self.conn = connect(self.path)
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS eta_windows (
+                run_key TEXT PRIMARY KEY,
+                samples TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            );
+        """)
+        self.conn.commit()
+        self.tracked = {row[0] for row in self.conn.execute("SELECT run_key FROM eta_windows")}
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    def get_windows(self, keys):
+        """Stored windows for the given run keys as {run_key: [[runtime, step], ...]}"""
+        found = {}
+        with self.lock:
+            for i in range(0, len(keys), 500):
+                chunk = keys[i:i + 500]
+                rows = self.conn.execute(
+                    f"SELECT run_key, samples FROM eta_windows "
+                    f"WHERE run_key IN ({','.join('?' * len(chunk))})", chunk).fetchall()
+                found.update((key, json.loads(samples)) for key, samples in rows)
+        return found
+
+    def observe_many(self, samples, forget=()):
+        """Add {run_key: (runtime, step)} samples and return {run_key: (rate, low, high)}.
+
+        Runs listed in `forget` stopped running, their windows are dropped.
+        """
+        windows = self.get_windows(list(samples))
+        rates = {}
+        changed = []
+        for key, (runtime, step) in samples.items():
+            window = windows.get(key, [])
+            updated = add_sample(window, runtime, step, self.size, self.min_interval)
+            if updated is not window:
+                changed.append((key, updated))
+            estimate = estimate_rate(updated)
+            if estimate is not None:
+                rates[key] = estimate
+
+        with self.lock:
+            forget = [key for key in forget if key in self.tracked]
+        if changed or forget:
+            now = time.time()
+            with self.lock, self.conn:
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO eta_windows (run_key, samples, updated_at) VALUES (?, ?, ?)",
+                    [(key, json.dumps(window), now) for key, window in changed])
+                self.conn.executemany("DELETE FROM eta_windows WHERE run_key = ?", [(key,) for key in forget])
+                expired = [row[0] for row in self.conn.execute(
+                    "SELECT run_key FROM eta_windows WHERE updated_at < ?", (now - ETA_STATE_TTL,))]
+                self.conn.execute("DELETE FROM eta_windows WHERE updated_at < ?", (now - ETA_STATE_TTL,))
+                self.tracked.update(key for key, _ in changed)
+                self.tracked.difference_update(forget)
+                self.tracked.difference_update(expired)
+        return rates
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Print the stored ETA window and rate of a run")
+    parser.add_argument("run", help="entity/project/run_id")
+    args = parser.parse_args()
+
+    estimator = EtaEstimator()
+    window = estimator.get_windows([args.run]).get(args.run, [])
+    estimate = estimate_rate(window)
+    if estimate is None:
+        print(f"No rate for {args.run} yet", file=sys.stderr)
+    rate, low, high = estimate or (None, None, None)
+    print(json.dumps({"samples": window, "rate": rate, "low": low, "high": high}))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,23 +1,28 @@
 import json
 import sys
-import os
-
-# Load .env file manually from parent directory
-env_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), '.env')
-if os.path.exists(env_path):
-    with open(env_path, 'r') as f:
-        for line in f:
-            if '=' in line and not line.strip().startswith('#'):
-                key, value = line.strip().split('=', 1)
-                os.environ[key] = value
-
-try:
-    from huggingface_hub import list_datasets, HfApi
-    
-    # Get HF token from environment or use default (public access)
-    token = os.getenv('HF_TOKEN') or os.getenv('HUGGINGFACE_TOKEN')
-    api = HfApi(token=token)
-    
+import argparse
+
+from entrypoint import load_env, hf_token, hf_api
+
+
+def dataset_record(dataset):
+    """Dashboard record for one listed dataset"""
+    # Newer huggingface_hub versions renamed lastModified to last_modified
+    modified = getattr(dataset, 'last_modified', None) or getattr(dataset, 'lastModified', None)
+    return {
+        "name": dataset.id,
+        "downloads": getattr(dataset, 'downloads', 0),
+        "lastModified": modified.isoformat() if modified else None,
+        "tags": getattr(dataset, 'tags', []),
+        # Only set when the listing was asked for it; hf_details keys its cache on it
+        "sha": getattr(dataset, 'sha', None)
+    }
+
+
+def get_datasets(api, token=None):
+    """List the user's datasets, or popular public datasets without a token"""
+    from huggingface_hub import list_datasets
+
     # Get current user's datasets if token is available
     if token:
         try:
@@ -30,22 +35,36 @@ try:
     else:
         # No token - list popular public datasets
         datasets_iter = list_datasets(limit=50, sort="downloads", direction=-1)
-    
-    datasets = []
-    for dataset in datasets_iter:
-        datasets.append({
-            "name": dataset.id,
-            "downloads": getattr(dataset, 'downloads', 0),
-            "lastModified": dataset.lastModified.isoformat() if dataset.lastModified else None,
-            "tags": getattr(dataset, 'tags', [])
-        })
-    
-    print(json.dumps(datasets))
-except ImportError as e:
-    print("[]", file=sys.stderr)
-    print("ImportError:", e, file=sys.stderr)
-    print("[]")
-except Exception as e:
-    print("[]", file=sys.stderr)
-    print("Exception:", e, file=sys.stderr)
-    print("[]")
+
+    return [dataset_record(dataset) for dataset in datasets_iter]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Print HuggingFace datasets as JSON")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="list directly instead of going through the persisted catalog")
+    args = parser.parse_args()
+
+    load_env()
+    try:
+        # Get HF token from environment or use default (public access)
+        token = hf_token()
+
+        if args.no_cache:
+            print(json.dumps(get_datasets(hf_api(token), token)))
+        else:
+            # huggingface_hub is only imported if the catalog needs a refresh
+            from hf_catalog import HfCatalog
+            print(json.dumps(HfCatalog(None, token).get("datasets", background=False)))
+    except ImportError as e:
+        print("[]", file=sys.stderr)
+        print("ImportError:", e, file=sys.stderr)
+        print("[]")
+    except Exception as e:
+        print("[]", file=sys.stderr)
+        print("Exception:", e, file=sys.stderr)
+        print("[]")
+
+
+if __name__ == "__main__":
+    main()
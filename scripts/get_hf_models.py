@@ -1,23 +1,28 @@
 import json
 import sys
-import os
-
-# Load .env file manually from parent directory
-env_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), '.env')
-if os.path.exists(env_path):
-    with open(env_path, 'r') as f:
-        for line in f:
-            if '=' in line and not line.strip().startswith('#'):
-                key, value = line.strip().split('=', 1)
-                os.environ[key] = value
-
-try:
-    from huggingface_hub import list_models, HfApi
-    
-    # Get HF token from environment or use default (public access)
-    token = os.getenv('HF_TOKEN') or os.getenv('HUGGINGFACE_TOKEN')
-    api = HfApi(token=token)
-    
+import argparse
+
+from entrypoint import load_env, hf_token, hf_api
+
+
+def model_record(model):
+    """Dashboard record for one listed model"""
+    # Newer huggingface_hub versions renamed lastModified to last_modified
+    modified = getattr(model, 'last_modified', None) or getattr(model, 'lastModified', None)
+    return {
+        "name": model.modelId,
+        "downloads": getattr(model, 'downloads', 0),
+        "lastModified": modified.isoformat() if modified else None,
+        "tags": getattr(model, 'tags', []),
+        # Only set when the listing was asked for it; hf_details keys its cache on it
+        "sha": getattr(model, 'sha', None)
+    }
+
+
+def get_models(api, token=None):
+    """List the user's models, or popular public models without a token"""
+    from huggingface_hub import list_models
+
     # Get current user's models if token is available
     if token:
         try:
@@ -30,22 +35,36 @@ try:
     else:
         # No token - list popular public models
         models_iter = list_models(limit=50, sort="downloads", direction=-1)
-    
-    models = []
-    for model in models_iter:
-        models.append({
-            "name": model.modelId,
-            "downloads": getattr(model, 'downloads', 0),
-            "lastModified": model.lastModified.isoformat() if model.lastModified else None,
-            "tags": getattr(model, 'tags', [])
-        })
-    
-    print(json.dumps(models))
-except ImportError as e:
-    print("[]", file=sys.stderr)
-    print("ImportError:", e, file=sys.stderr)
-    print("[]")
-except Exception as e:
-    print("[]", file=sys.stderr)
-    print("Exception:", e, file=sys.stderr)
-    print("[]")
+
+    return [model_record(model) for model in models_iter]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Print HuggingFace models as JSON")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="list directly instead of going through the persisted catalog")
+    args = parser.parse_args()
+
+    load_env()
+    try:
+        # Get HF token from environment or use default (public access)
+        token = hf_token()
+
+        if args.no_cache:
+            print(json.dumps(get_models(hf_api(token), token)))
+        else:
+            # huggingface_hub is only imported if the catalog needs a refresh
+            from hf_catalog import HfCatalog
+            print(json.dumps(HfCatalog(None, token).get("models", background=False)))
+    except ImportError as e:
+        print("[]", file=sys.stderr)
+        print("ImportError:", e, file=sys.stderr)
+        print("[]")
+    except Exception as e:
+        print("[]", file=sys.stderr)
+        print("Exception:", e, file=sys.stderr)
+        print("[]")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,12 @@
 import os
 import json
-try:
-    import wandb
-    
-    # Get API key from environment
-    api_key = os.environ.get("WANDB_API_KEY")
-    
-    if not api_key:
-        print("[]")
-        exit(0)
-        
-    os.environ["WANDB_API_KEY"] = api_key
-    api = wandb.Api()
+
+from entrypoint import wandb_api
+
+
+def get_projects(api):
+    """List the projects visible to the API key"""
     projects = []
-    
     try:
         for project in api.projects():
             projects.append({
@@ -22,10 +15,23 @@ try:
             })
     except Exception:
         pass
-        
-    print(json.dumps(projects))
-    
-except ImportError:
-    print("[]")
-except Exception:
-    print("[]")
\ No newline at end of file
+    return projects
+
+
+def main():
+    # Without an API key there is nothing to list, skip importing wandb
+    if not os.environ.get("WANDB_API_KEY"):
+        print("[]")
+        return
+
+    try:
+        print(json.dumps(get_projects(wandb_api())))
+
+    except ImportError:
+        print("[]")
+    except Exception:
+        print("[]")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,282 +1,932 @@
 import os
 import sys
 import json
-try:
-    import wandb
-    
-    # Get API key from environment
-    api_key = os.environ.get("WANDB_API_KEY")
-    project_filter = sys.argv[1] if len(sys.argv) > 1 else ""
-    
-    if not api_key:
-        print("[]")
-        sys.exit(0)
-        
-    os.environ["WANDB_API_KEY"] = api_key
-    api = wandb.Api()
-    runs = []
-    
-    if project_filter:
-        # Get runs from specific project
+import math
+import time
+import heapq
+import logging
+import argparse
+import itertools
+import threading
+from collections import OrderedDict
+
+from entrypoint import wandb_api
+from local_runs import LocalRuns
+from parallel import fan_out, SharedJobs
+from projection import Projection, json_safe, projection
+from run_filters import InvalidFilter, RunFilter
+from run_store import FINISHED_STATES, RunStore, FinishedRunCache, HardwareCache, GpuSampleStore
+from telemetry import TELEMETRY, get_logger
+
+log = get_logger("wandb_runs")
+
+# Substrings that mark a summary/config key as hardware related
+HARDWARE_HINTS = ['gpu', 'cpu', 'cuda', 'device', 'hardware', 'memory', 'ram']
+
+# Summary keys that may hold GPU utilization, checked in order
+GPU_UTIL_KEYS = ['gpu.0.gpu', 'system.gpu.0.gpu', 'gpu_utilization', 'gpu_usage', 'system.gpu.0.utilization']
+
+# In incremental mode, relist a project completely at least this often (seconds)
+# so runs deleted in wandb also drop out of the local store
+FULL_SYNC_INTERVAL = int(os.environ.get("WANDB_FULL_SYNC_INTERVAL", "3600"))
+
+# All-projects mode fetches this many projects at once, giving up on any
+# single project after PROJECT_TIMEOUT seconds
+PROJECT_CONCURRENCY = int(os.environ.get("WANDB_PROJECT_CONCURRENCY", "4"))
+PROJECT_TIMEOUT = float(os.environ.get("WANDB_PROJECT_TIMEOUT", "60"))
+
+# run.metadata (GPU name) is one extra request per run; prefetch it this many
+# at a time and give up on a single download after METADATA_TIMEOUT seconds
+METADATA_CONCURRENCY = int(os.environ.get("WANDB_METADATA_CONCURRENCY", "8"))
+METADATA_TIMEOUT = float(os.environ.get("WANDB_METADATA_TIMEOUT", "10"))
+
+# Fields of a cloud record replaced by the local run directory's, which is
+# fresher while the run writes to it (see local_runs.py)
+LOCAL_LIVE_FIELDS = ("state", "progress", "eta", "etaRange", "throughput", "gpuUtilization")
+
+# Runs are listed newest first by the API and processed RUN_BATCH at a
+# time, so at most that many run objects (with their summaries) are held
+# per project. RUNS_PER_PAGE is the API page size, None for wandb's default.
+RUN_ORDER = "-created_at"
+RUN_BATCH = int(os.environ.get("WANDB_RUN_BATCH", "500"))
+RUNS_PER_PAGE = int(os.environ["WANDB_RUNS_PER_PAGE"]) if os.environ.get("WANDB_RUNS_PER_PAGE") else None
+
+# With a deadline (seconds for the whole listing), projects still fetching
+# when it passes are answered from their last known records, marked
+# "partial": true. Their fetch keeps running, and a later listing in the
+# same process waits for it instead of starting another one.
+RUN_DEADLINE = float(os.environ.get("WANDB_DEADLINE", "0")) or None
+PROJECT_FETCHES = SharedJobs()
+
+# Fetch key -> time.monotonic() a listing last got the project in time;
+# the next listing starts with the projects that have waited longest
+FRESH_AT = OrderedDict()
+FRESH_KEEP = 1024
+fresh_lock = threading.Lock()
+
+
+def mark_fresh(keys):
+    now = time.monotonic()
+    with fresh_lock:
+        for key in keys:
+            FRESH_AT[key] = now
+            FRESH_AT.move_to_end(key)
+        while len(FRESH_AT) > FRESH_KEEP:
+            FRESH_AT.popitem(last=False)
+
+
+def fresh_at(key):
+    """When a listing last returned the project in time, -inf if never"""
+    with fresh_lock:
+        return FRESH_AT.get(key, -math.inf)
+
+
+def get_metrics(run, keep=None):
+    """Summary as a dict of JSON-safe values, only the keys keep(key) accepts if given"""
+    summary = run.summary
+    if not summary:
+        return {}
+    if keep is None:
+        return {key: json_safe(value) for key, value in summary.items()}
+    return {key: json_safe(value) for key, value in summary.items() if keep(key)}
+
+
+def get_config(run):
+    """Run config as JSON-safe values, without wandb's internal "_" keys"""
+    config = run.config
+    if not config:
+        return {}
+    return {key: json_safe(value) for key, value in config.items() if not str(key).startswith("_")}
+
+
+def get_total_steps(run):
+    """Get total steps from various possible config keys"""
+    total_steps = 0
+    if run.config:
+        total_steps = (run.config.get("steps") or
+                       run.config.get("total_steps") or
+                       run.config.get("num_train_epochs") or
+                       run.config.get("training_steps") or 0)
+    return total_steps
+
+
+def get_hardware(metadata):
+    """Pick the hardware fields the dashboard uses out of run.metadata"""
+    gpu = None
+    if metadata:
+        # Check for direct GPU field
+        if 'gpu' in metadata and metadata['gpu']:
+            gpu = str(metadata['gpu'])
+        # Check for GPU nvidia array (more detailed info)
+        elif 'gpu_nvidia' in metadata and metadata['gpu_nvidia']:
+            gpu_data = metadata['gpu_nvidia'][0]  # Get first GPU
+            gpu = str(gpu_data.get('name', 'Unknown GPU'))
+    return {"gpu": gpu, "gpuCount": metadata.get('gpu_count') if metadata else None}
+
+
+def format_utilization(util_val):
+    """Format a GPU utilization value as a percentage string"""
+    if util_val <= 1.0:  # Assume decimal format
+        return f"{util_val * 100:.1f}%"
+    return f"{util_val:.1f}%"  # Assume percentage format
+
+
+def get_gpu_info(run, hardware=None, gpu_sample=None):
+    """Extract GPU name and utilization, returns (gpu_info, gpu_utilization).
+
+    `hardware` is the get_hardware() result if it was prefetched, otherwise
+    run.metadata is read here (one extra request per run). `gpu_sample` is
+    the latest value from the background GPU sampler, used when the summary
+    has no utilization.
+    """
+    gpu_info = "N/A"
+    gpu_utilization = "N/A"
+    try:
+        # Check metadata for GPU info - WandB stores hardware info here
+        if hardware is None:
+            hardware = get_hardware(run.metadata if hasattr(run, 'metadata') else None)
+        if hardware.get("gpu"):
+            gpu_info = hardware["gpu"]
+
+        # Try to get GPU utilization from summary (if available)
+        if run.summary:
+            for key in GPU_UTIL_KEYS:
+                if key in run.summary and run.summary[key] is not None:
+                    util_val = run.summary[key]
+                    # Convert to percentage if needed
+                    if isinstance(util_val, (int, float)):
+                        gpu_utilization = format_utilization(util_val)
+                    break
+
+        # Otherwise use what the background sampler read from the history
+        if gpu_utilization == "N/A" and gpu_sample is not None:
+            gpu_utilization = format_utilization(gpu_sample)
+
+        # Clean up GPU info (remove NVIDIA prefix to save space)
+        if gpu_info != "N/A":
+            gpu_info = gpu_info.replace("NVIDIA ", "").strip()
+            # Limit length for display
+            if len(gpu_info) > 25:
+                gpu_info = gpu_info[:22] + "..."
+
+    except Exception:
+        gpu_info = "N/A"
+        gpu_utilization = "N/A"
+    return gpu_info, gpu_utilization
+
+
+def run_key(run):
+    return f"{run.entity}/{run.project}/{run.id}"
+
+
+def prefetch_hardware(runs, cache=None, concurrency=METADATA_CONCURRENCY):
+    """Fetch hardware info for many runs at once, returns {run_key: hardware}.
+
+    Runs found in the HardwareCache cost no request; the rest have their
+    run.metadata downloaded on up to `concurrency` threads. Hardware never
+    changes once a run has started, so results go back into the cache.
+    """
+    keys = {run_key(run): run for run in runs}
+    hardware = cache.get_many(list(keys)) if cache is not None else {}
+
+    def fetch(run):
+        with TELEMETRY.timer("metadata_fetch"):
+            metadata = run.metadata if hasattr(run, 'metadata') else None
+        return get_hardware(metadata), bool(metadata)
+
+    missing = {key: (lambda run=run: fetch(run)) for key, run in keys.items() if key not in hardware}
+    TELEMETRY.count("metadata_cache_hits", len(keys) - len(missing))
+    fetched = fan_out(missing, concurrency=concurrency, timeout=METADATA_TIMEOUT) if missing else {}
+
+    to_cache = {}
+    for key, (info, complete) in fetched.items():
+        hardware[key] = info
+        # Metadata may not be uploaded yet for a fresh run, ask again later
+        if complete or keys[key].state in FINISHED_STATES:
+            to_cache[key] = info
+    if cache is not None and to_cache:
+        cache.put_many(to_cache)
+    return hardware
+
+
+def format_duration(seconds):
+    hours = int(seconds // 3600)
+    minutes = int((seconds % 3600) // 60)
+    if hours > 0:
+        return f"{hours}h {minutes}m"
+    return f"{minutes}m"
+
+
+def get_eta(run, total_steps, rate=None):
+    """Return (eta, eta_range) for a run - only running jobs get a time.
+
+    `rate` is a (steps/sec, low, high) estimate from the EtaEstimator; the
+    range is the remaining seconds at the high and low rate. Without one,
+    the ETA falls back to the average rate over the whole runtime.
+    """
+    eta = run.state.capitalize() if run.state else "N/A"
+    eta_range = None
+
+    if run.state == "running":
+        current_progress = run.summary.get("_step", 0) if run.summary else 0
+
         try:
-            print(f"Filtering by project: {project_filter}", file=sys.stderr)
-            project_runs = list(api.runs(project_filter))
-            print(f"Found {len(project_runs)} runs for project {project_filter}", file=sys.stderr)
-            for i, run in enumerate(project_runs):
-                try:
-                    print(f"Processing run {run.id}: summary keys: {list(run.summary.keys()) if run.summary else []}", file=sys.stderr)
-                    print(f"Config keys: {list(run.config.keys()) if run.config else []}", file=sys.stderr)
-                    
-                    # Look for hardware info in summary and config
-                    if run.summary:
-                        hw_keys = [k for k in run.summary.keys() if any(hw in k.lower() for hw in ['gpu', 'cpu', 'cuda', 'device', 'hardware', 'memory', 'ram'])]
-                        if hw_keys:
-                            print(f"Hardware summary keys: {hw_keys}", file=sys.stderr)
-                    
-                    if run.config:
-                        hw_config_keys = [k for k in run.config.keys() if any(hw in k.lower() for hw in ['gpu', 'cpu', 'cuda', 'device', 'hardware', 'memory', 'ram'])]
-                        if hw_config_keys:
-                            print(f"Hardware config keys: {hw_config_keys}", file=sys.stderr)
-                    
-                    # Safely convert summary to dict with only JSON-serializable values
-                    metrics = {}
-                    if run.summary:
-                        for key, value in run.summary.items():
-                            try:
-                                # Test if value is JSON serializable
-                                json.dumps(value)
-                                metrics[key] = value
-                            except (TypeError, ValueError):
-                                # Convert non-serializable values to string
-                                metrics[key] = str(value)
-                    
-                    # Get total steps from various possible config keys
-                    total_steps = 0
-                    if run.config:
-                        total_steps = (run.config.get("steps") or 
-                                     run.config.get("total_steps") or 
-                                     run.config.get("num_train_epochs") or 
-                                     run.config.get("training_steps") or 0)
-                    
-                    # Extract GPU information from metadata (fast and reliable)
-                    gpu_info = "N/A"
-                    gpu_utilization = "N/A"
-                    try:
-                        # Check metadata for GPU info - WandB stores hardware info here
-                        if hasattr(run, 'metadata') and run.metadata:
-                            # Check for direct GPU field
-                            if 'gpu' in run.metadata and run.metadata['gpu']:
-                                gpu_info = str(run.metadata['gpu'])
-                            # Check for GPU nvidia array (more detailed info)
-                            elif 'gpu_nvidia' in run.metadata and run.metadata['gpu_nvidia']:
-                                gpu_data = run.metadata['gpu_nvidia'][0]  # Get first GPU
-                                gpu_info = str(gpu_data.get('name', 'Unknown GPU'))
-                        
-                        # Try to get GPU utilization from summary (if available)
-                        if run.summary:
-                            # Look for GPU utilization metrics in summary
-                            gpu_util_keys = ['gpu.0.gpu', 'system.gpu.0.gpu', 'gpu_utilization', 'gpu_usage', 'system.gpu.0.utilization']
-                            for key in gpu_util_keys:
-                                if key in run.summary and run.summary[key] is not None:
-                                    util_val = run.summary[key]
-                                    # Convert to percentage if needed
-                                    if isinstance(util_val, (int, float)):
-                                        if util_val <= 1.0:  # Assume decimal format
-                                            gpu_utilization = f"{util_val * 100:.1f}%"
-                                        else:  # Assume percentage format
-                                            gpu_utilization = f"{util_val:.1f}%"
-                                    break
-                        
-                        # For now, skip history lookup to keep API fast
-                        # GPU utilization will show "N/A" until WandB logs it in summary
-                        # Future: Could implement background job to get GPU utilization
-                        
-                        # Clean up GPU info (remove NVIDIA prefix to save space)
-                        if gpu_info != "N/A":
-                            gpu_info = gpu_info.replace("NVIDIA ", "").strip()
-                            # Limit length for display
-                            if len(gpu_info) > 25:
-                                gpu_info = gpu_info[:22] + "..."
-                                
-                    except Exception:
-                        gpu_info = "N/A"
-                        gpu_utilization = "N/A"
-                    
-                    # Calculate ETA using Wandb's runtime value - only for running jobs
-                    eta = run.state.capitalize() if run.state else "N/A"
-                    
-                    if run.state == "running":
-                        current_progress = run.summary.get("_step", 0) if run.summary else 0
-                        
-                        try:
-                            if total_steps > 0 and current_progress > 0 and current_progress < total_steps:
-                                # Get runtime from summary (in seconds)
-                                runtime_seconds = run.summary.get("_runtime", 0) if run.summary else 0
-                                
-                                if runtime_seconds > 0:
-                                    progress_ratio = current_progress / total_steps
-                                    estimated_total_time = runtime_seconds / progress_ratio
-                                    remaining_seconds = estimated_total_time - runtime_seconds
-                                    
-                                    if remaining_seconds > 0:
-                                        # Format ETA
-                                        hours = int(remaining_seconds // 3600)
-                                        minutes = int((remaining_seconds % 3600) // 60)
-                                        if hours > 0:
-                                            eta = f"{hours}h {minutes}m"
-                                        else:
-                                            eta = f"{minutes}m"
-                        except Exception:
-                            eta = "Running"
-                    
-                    run_data = {
-                        "id": run.id,
-                        "name": run.name,
-                        "state": run.state,
-                        "progress": run.summary.get("_step", 0) if run.summary else 0,
-                        "totalSteps": total_steps,
-                        "createdAt": str(run.created_at),
-                        "eta": eta,
-                        "entity": run.entity,
-                        "project": run.project,
-                        "gpu": gpu_info,
-                        "gpuUtilization": gpu_utilization,
-                        "metrics": metrics
-                    }
-                    runs.append(run_data)
-                    print(f"Successfully processed run {i}", file=sys.stderr)
-                except Exception as e:
-                    print(f"Error processing run {i}: {type(e).__name__}: {e}", file=sys.stderr)
-                    continue
-            
-            print(f"Final runs count: {len(runs)}", file=sys.stderr)
+            if total_steps > 0 and current_progress > 0 and current_progress < total_steps:
+                if rate is None:
+                    # Get runtime from summary (in seconds)
+                    runtime_seconds = run.summary.get("_runtime", 0) if run.summary else 0
+                    if runtime_seconds > 0:
+                        rate = (current_progress / runtime_seconds, None, None)
+
+                if rate is not None:
+                    steps_per_sec, low, high = rate
+                    remaining_steps = total_steps - current_progress
+                    remaining_seconds = remaining_steps / steps_per_sec
+                    if remaining_seconds > 0:
+                        eta = format_duration(remaining_seconds)
+                        if low and high:
+                            eta_range = [round(remaining_steps / high), round(remaining_steps / low)]
+        except Exception:
+            eta = "Running"
+    return eta, eta_range
+
+
+def log_hardware_keys(run):
+    """Log summary/config keys that look hardware related, at debug level"""
+    log.debug("Processing run %s: summary keys: %s", run.id, list(run.summary.keys()) if run.summary else [])
+    log.debug("Config keys: %s", list(run.config.keys()) if run.config else [])
+
+    # Look for hardware info in summary and config
+    if run.summary:
+        hw_keys = [k for k in run.summary.keys() if any(hw in k.lower() for hw in HARDWARE_HINTS)]
+        if hw_keys:
+            log.debug("Hardware summary keys: %s", hw_keys)
+
+    if run.config:
+        hw_config_keys = [k for k in run.config.keys() if any(hw in k.lower() for hw in HARDWARE_HINTS)]
+        if hw_config_keys:
+            log.debug("Hardware config keys: %s", hw_config_keys)
+
+
+def process_run(run, hardware=None, gpu_sample=None, rate=None, keep_metric=None):
+    """Build the dashboard record for a single run"""
+    total_steps = get_total_steps(run)
+    gpu_info, gpu_utilization = get_gpu_info(run, hardware, gpu_sample)
+    eta, eta_range = get_eta(run, total_steps, rate)
+    with TELEMETRY.timer("json_safety"):
+        metrics = get_metrics(run, keep_metric)
+        config = get_config(run)
+    return {
+        "id": run.id,
+        "name": run.name,
+        "state": run.state,
+        "progress": run.summary.get("_step", 0) if run.summary else 0,
+        "totalSteps": total_steps,
+        "createdAt": str(run.created_at),
+        "eta": eta,
+        "etaRange": eta_range,
+        "throughput": round(rate[0], 4) if rate and run.state == "running" else None,
+        "entity": run.entity,
+        "project": run.project,
+        "gpu": gpu_info,
+        "gpuUtilization": gpu_utilization,
+        "tags": list(getattr(run, "tags", None) or ()),
+        "config": config,
+        "metrics": metrics
+    }
+
+
+def iter_released(runs):
+    """Iterate api.runs, dropping the paginator's reference to each run once
+    the next one is requested. wandb's paginator keeps every loaded run in
+    its `objects` list; without this a lazy listing still ends up resident."""
+    for i, run in enumerate(runs):
+        yield run
+        objects = getattr(runs, "objects", None)
+        if isinstance(objects, list) and i < len(objects):
+            objects[i] = None
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+        # Let the caller's batch go before the next one is listed
+        del batch
+
+
+def created_at_key(record):
+    return record["createdAt"]
+
+
+def placeholder_record(project_path):
+    """Stand-in for a project neither fetched in time nor known from before"""
+    entity, _, project = project_path.partition("/")
+    return {"id": f"pending:{project_path}", "entity": entity, "project": project, "name": project_path,
+            "state": "pending", "createdAt": "", "partial": True, "placeholder": True}
+
+
+def merge_local(record, local):
+    """A cloud record merged with (LocalRun, record) of the same run read from disk.
+
+    Local metrics win key by key. The live fields only do while the local
+    state is certain: the run is writing, or its exit record was read.
+    """
+    run, local_record = local
+    merged = dict(record)
+    merged["metrics"] = {**(record.get("metrics") or {}), **(local_record.get("metrics") or {})}
+    if run.definite:
+        for field in LOCAL_LIVE_FIELDS:
+            merged[field] = local_record[field]
+    if merged.get("gpu") in (None, "N/A"):
+        merged["gpu"] = local_record["gpu"]
+    return merged
+
+
+def get_heartbeat(run):
+    """Last time wandb heard from the run, as the ISO string the API returns"""
+    value = getattr(run, "heartbeat_at", None) or run.created_at
+    return str(value) if value else None
+
+
+class RunCollector:
+    """Turns the runs of one or all projects into dashboard records.
+
+    Optional helpers, all off unless passed in:
+      store           RunStore, sync projects incrementally instead of relisting
+      cache           FinishedRunCache, reuse records of finished runs
+      hardware_cache  HardwareCache, keep GPU metadata per run across calls
+      gpu_samples     GpuSampleStore, GPU utilization from the background sampler
+      eta_estimator   EtaEstimator, ETA from the step rate across calls
+    fetch_metadata=False skips run.metadata entirely (GPU shows "N/A").
+    projection (projection.Projection) trims the returned records; stored
+    and cached records always stay complete. Without one, only the
+    index-only fields (config) are left out.
+    run_filter (run_filters.RunFilter) is pushed down into the api.runs
+    query of every project. Filtered listings bypass the run store, which
+    only ever holds complete projects.
+    limit/offset select a window of the newest-first list. Each project
+    only has its newest offset + limit runs processed; the per-project
+    lists, already newest first, are merged rather than sorted.
+    per_page is the API page size, batch_size caps the run objects held
+    per project.
+    refresh=False serves stored projects as they are, only syncing ones
+    never synced; for when a refresh_scheduler.WandbRefresher keeps the
+    store fresh. project_paths replaces the api.projects() listing.
+    local_runs (local_runs.LocalRuns) adds the runs of local wandb
+    directories, merged with the cloud runs by id; with api=None only
+    those are listed.
+    deadline bounds get_runs to that many seconds, see RUN_DEADLINE.
+    Runs processed in time are returned as usual; the rest of a late
+    project comes from its last completed fetch, the store or the
+    finished-run cache, each record marked "partial": true (a placeholder
+    record if none of them knows the project). Projects the deadline left
+    unstarted are fetched in the background, and go first next time.
+    Phase timings and counters are recorded in telemetry.TELEMETRY.
+    """
+
+    def __init__(self, api, store=None, cache=None, hardware_cache=None, gpu_samples=None,
+                 eta_estimator=None, fetch_metadata=True, concurrency=PROJECT_CONCURRENCY, project_timeout=PROJECT_TIMEOUT,
+                 projection=None, run_filter=None, limit=None, offset=0, per_page=RUNS_PER_PAGE,
+                 batch_size=RUN_BATCH, refresh=True, project_paths=None, local_runs=None, deadline=RUN_DEADLINE):
+        self.api = api
+        self.store = store
+        self.cache = cache
+        self.hardware_cache = hardware_cache
+        self.gpu_samples = gpu_samples
+        self.eta_estimator = eta_estimator
+        self.fetch_metadata = fetch_metadata
+        self.concurrency = concurrency
+        self.project_timeout = project_timeout
+        self.projection = projection if projection is not None else Projection()
+        self.run_filter = run_filter
+        self.limit = limit
+        self.offset = offset or 0
+        self.per_page = per_page
+        self.batch_size = max(1, batch_size)
+        self.refresh = refresh
+        self.project_paths = project_paths
+        self.local_runs = local_runs
+        self.deadline = deadline
+
+    def open_runs(self, project_path, filters=None):
+        """Newest-first iterator over api.runs, the first page already loaded"""
+        kwargs = {"order": RUN_ORDER}
+        if filters:
+            kwargs["filters"] = filters
+        if self.per_page:
+            kwargs["per_page"] = self.per_page
+        runs = self.api.runs(project_path, **kwargs)
+        iterator = iter_released(runs)
+        with TELEMETRY.timer("api_list"):
+            first = list(itertools.islice(iterator, 1))
+
+        def timed(iterator):
+            while True:
+                with TELEMETRY.timer("api_list"):
+                    run = next(iterator, None)
+                if run is None:
+                    return
+                yield run
+        return itertools.chain(first, timed(iterator))
+
+    def list_runs(self, project_path, filters=None, run_filter=None):
+        """Lazy api.runs of a project; a query rejected with run_filter's
+        filters is retried unfiltered and run_filter is applied here instead"""
+        if not filters:
+            return self.open_runs(project_path)
+        try:
+            return self.open_runs(project_path, filters)
         except Exception as e:
-            print(f"Error filtering project {project_filter}: {e}", file=sys.stderr)
-            pass
-    else:
-        # Get runs from all projects
+            if run_filter is None:
+                raise
+            TELEMETRY.count("filter_fallbacks")
+            log.warning("Filtered query of %s failed (%s: %s), filtering locally",
+                        project_path, type(e).__name__, e)
+            return self.open_runs(project_path)
+
+    def iter_project_runs(self, project_path, filters=None, run_filter=None, limit=None):
+        """Yield (run, record) for the runs of a project, newest first, skipping runs that fail.
+
+        Only runs matching run_filter are kept, and only the first `limit`
+        of those. Runs are listed lazily and handled batch_size at a time:
+        finished runs found in the cache are not processed again, the rest
+        get their hardware info prefetched in one concurrent batch.
+        """
+        runs = self.list_runs(project_path, filters, run_filter)
+        if run_filter is not None:
+            runs = (run for run in runs if run_filter.matches(run))
+        if limit is not None:
+            runs = itertools.islice(runs, limit)
+
+        cached = {}  # (entity, project) -> {run_id: record}
+        listed = 0
+        for batch in batched(runs, self.batch_size):
+            listed += len(batch)
+            TELEMETRY.count("runs_listed", len(batch))
+            yield from self.process_batch(batch, cached)
+            del batch
+        log.info("Found %d runs for project %s", listed, project_path)
+
+    def process_batch(self, project_runs, cached, use_cache=True):
+        """Yield (run, record) for a batch of listed runs, see iter_project_runs"""
+        hits = {}
+        use_cache = use_cache and self.cache is not None
+        # A running-only listing has nothing to look up
+        if use_cache and any(run.state in FINISHED_STATES for run in project_runs):
+            for run in project_runs:
+                key = (run.entity, run.project)
+                if key not in cached:
+                    cached[key] = self.cache.load_project(*key)
+                record = self.cache.lookup(cached[key], run)
+                if record is not None:
+                    hits[run.id] = record
+
+        to_process = [run for run in project_runs if run.id not in hits]
+        hardware = {}
+        if self.fetch_metadata:
+            hardware = prefetch_hardware(to_process, self.hardware_cache)
+        gpu_samples = {}
+        if self.gpu_samples is not None:
+            gpu_samples = self.gpu_samples.latest([run_key(run) for run in to_process if run.state == "running"])
+        rates = {}
+        if self.eta_estimator is not None:
+            rates = self.observe_progress(to_process)
+
+        processed = []
+        debug = log.isEnabledFor(logging.DEBUG)
+        # Unwanted metrics are not even sanitized unless the record is kept
+        keep_metric = None
+        if self.store is None and self.cache is None:
+            keep_metric = self.projection.metrics
+        for i, run in enumerate(project_runs):
+            if run.id in hits:
+                yield run, hits[run.id]
+                continue
+            try:
+                if debug:
+                    log_hardware_keys(run)
+                key = run_key(run)
+                with TELEMETRY.timer("run_transform"):
+                    # Local runs carry the utilization of their own log
+                    gpu_sample = gpu_samples.get(key, getattr(run, "gpu_sample", None))
+                    record = process_run(run, hardware.get(key, {}), gpu_sample, rates.get(key), keep_metric)
+            except Exception as e:
+                TELEMETRY.count("run_errors")
+                log.warning("Error processing run %s: %s: %s", getattr(run, "id", i), type(e).__name__, e)
+                continue
+            processed.append(record)
+            yield run, record
+
+        TELEMETRY.count("runs_processed", len(processed))
+        if use_cache:
+            TELEMETRY.count("finished_cache_hits", len(hits))
+            log.info("Finished-run cache: %d hits, %d processed", len(hits), len(processed))
+            self.cache.update(processed, list(hits.values()))
+
+    def observe_progress(self, runs):
+        """Feed (_runtime, _step) of running runs to the ETA estimator, return its rates"""
+        samples, stopped = {}, []
+        for run in runs:
+            if run.state != "running":
+                stopped.append(run_key(run))
+                continue
+            try:
+                runtime = run.summary.get("_runtime") if run.summary else None
+                step = run.summary.get("_step") if run.summary else None
+            except Exception:
+                continue
+            if isinstance(runtime, (int, float)) and isinstance(step, (int, float)):
+                samples[run_key(run)] = (runtime, step)
         try:
-            for project in api.projects():
-                project_path = f"{project.entity}/{project.name}"
-                for run in api.runs(project_path):
-                    # Safely convert summary to dict with only JSON-serializable values
-                    metrics = {}
-                    if run.summary:
-                        for key, value in run.summary.items():
-                            try:
-                                # Test if value is JSON serializable
-                                json.dumps(value)
-                                metrics[key] = value
-                            except (TypeError, ValueError):
-                                # Convert non-serializable values to string
-                                metrics[key] = str(value)
-                    
-                    # Get total steps from various possible config keys
-                    total_steps = 0
-                    if run.config:
-                        total_steps = (run.config.get("steps") or 
-                                     run.config.get("total_steps") or 
-                                     run.config.get("num_train_epochs") or 
-                                     run.config.get("training_steps") or 0)
-                    
-                    # Extract GPU information from metadata (fast and reliable)
-                    gpu_info = "N/A"
-                    gpu_utilization = "N/A"
-                    try:
-                        # Check metadata for GPU info - WandB stores hardware info here
-                        if hasattr(run, 'metadata') and run.metadata:
-                            # Check for direct GPU field
-                            if 'gpu' in run.metadata and run.metadata['gpu']:
-                                gpu_info = str(run.metadata['gpu'])
-                            # Check for GPU nvidia array (more detailed info)
-                            elif 'gpu_nvidia' in run.metadata and run.metadata['gpu_nvidia']:
-                                gpu_data = run.metadata['gpu_nvidia'][0]  # Get first GPU
-                                gpu_info = str(gpu_data.get('name', 'Unknown GPU'))
-                        
-                        # Try to get GPU utilization from summary (if available)
-                        if run.summary:
-                            # Look for GPU utilization metrics in summary
-                            gpu_util_keys = ['gpu.0.gpu', 'system.gpu.0.gpu', 'gpu_utilization', 'gpu_usage', 'system.gpu.0.utilization']
-                            for key in gpu_util_keys:
-                                if key in run.summary and run.summary[key] is not None:
-                                    util_val = run.summary[key]
-                                    # Convert to percentage if needed
-                                    if isinstance(util_val, (int, float)):
-                                        if util_val <= 1.0:  # Assume decimal format
-                                            gpu_utilization = f"{util_val * 100:.1f}%"
-                                        else:  # Assume percentage format
-                                            gpu_utilization = f"{util_val:.1f}%"
-                                    break
-                        
-                        # For now, skip history lookup to keep API fast
-                        # GPU utilization will show "N/A" until WandB logs it in summary
-                        # Future: Could implement background job to get GPU utilization
-                        
-                        # Clean up GPU info (remove NVIDIA prefix to save space)
-                        if gpu_info != "N/A":
-                            gpu_info = gpu_info.replace("NVIDIA ", "").strip()
-                            # Limit length for display
-                            if len(gpu_info) > 25:
-                                gpu_info = gpu_info[:22] + "..."
-                                
-                    except Exception:
-                        gpu_info = "N/A"
-                        gpu_utilization = "N/A"
-                    
-                    # Calculate ETA using Wandb's runtime value - only for running jobs
-                    eta = run.state.capitalize() if run.state else "N/A"
-                    
-                    if run.state == "running":
-                        current_progress = run.summary.get("_step", 0) if run.summary else 0
-                        
-                        try:
-                            if total_steps > 0 and current_progress > 0 and current_progress < total_steps:
-                                # Get runtime from summary (in seconds)
-                                runtime_seconds = run.summary.get("_runtime", 0) if run.summary else 0
-                                
-                                if runtime_seconds > 0:
-                                    progress_ratio = current_progress / total_steps
-                                    estimated_total_time = runtime_seconds / progress_ratio
-                                    remaining_seconds = estimated_total_time - runtime_seconds
-                                    
-                                    if remaining_seconds > 0:
-                                        # Format ETA
-                                        hours = int(remaining_seconds // 3600)
-                                        minutes = int((remaining_seconds % 3600) // 60)
-                                        if hours > 0:
-                                            eta = f"{hours}h {minutes}m"
-                                        else:
-                                            eta = f"{minutes}m"
-                        except Exception:
-                            eta = "Running"
-                    
-                    runs.append({
-                        "id": run.id,
-                        "name": run.name,
-                        "state": run.state,
-                        "progress": run.summary.get("_step", 0) if run.summary else 0,
-                        "totalSteps": total_steps,
-                        "createdAt": str(run.created_at),
-                        "eta": eta,
-                        "entity": run.entity,
-                        "project": run.project,
-                        "gpu": gpu_info,
-                        "gpuUtilization": gpu_utilization,
-                        "metrics": metrics
-                    })
-        except Exception:
+            return self.eta_estimator.observe_many(samples, forget=stopped)
+        except Exception as e:
+            log.warning("ETA estimator error: %s: %s", type(e).__name__, e)
+            return {}
+
+    def local_records(self, project_filter=""):
+        """{run id: (LocalRun, record)} of the local runs in the project and run filter"""
+        runs = self.local_runs.get_runs(project_filter)
+        if self.run_filter is not None:
+            runs = [run for run in runs if self.run_filter.matches(run)]
+        # Local records change with every write, never cache them as finished
+        return {run.id: (run, record) for run, record in self.process_batch(runs, {}, use_cache=False)}
+
+    def get_project_runs(self, project_path):
+        """Process every run of a single project"""
+        return [record for _, record in self.iter_project_runs(project_path)]
+
+    def sync_project_runs(self, project_path, limit=None):
+        """Incrementally sync one project into the store and return its records, newest first.
+
+        Only runs whose heartbeat reached the stored high-water mark, runs that are
+        running now, and runs the store still thinks are running are fetched.
+        """
+        store = self.store
+        high_water, full_sync_at = store.get_sync_state(project_path)
+        full_sync = high_water is None or time.time() - full_sync_at > FULL_SYNC_INTERVAL
+
+        filters = None
+        if not full_sync:
+            conditions = [{"heartbeatAt": {"$gte": high_water}}, {"state": "running"}]
+            # Catch runs that stopped without a final heartbeat (crashed, killed)
+            running_ids = store.get_running_ids(project_path)
+            if running_ids:
+                conditions.append({"name": {"$in": running_ids}})
+            filters = {"$or": conditions}
+
+        entries = []
+        for run, record in self.iter_project_runs(project_path, filters=filters):
+            heartbeat = get_heartbeat(run)
+            entries.append((record, heartbeat))
+            if heartbeat and (high_water is None or heartbeat > high_water):
+                high_water = heartbeat
+
+        log.info("%s sync of %s: %d runs fetched", "Full" if full_sync else "Incremental", project_path, len(entries))
+        store.save(project_path, entries, high_water, full_sync=full_sync)
+        return store.get_records(project_path, limit=limit)
+
+    def fetch_key(self, project_path, window):
+        """What a project fetch depends on; equal keys share one PROJECT_FETCHES job"""
+        return (project_path, window, self.run_filter.key() if self.run_filter is not None else None,
+                self.store is not None, self.refresh, self.cache is not None, self.fetch_metadata)
+
+    def last_known(self, project_path, key, window=None):
+        """Last known records of a project, newest first, for a fetch that missed the deadline"""
+        records = PROJECT_FETCHES.last(key)
+        # Stored and cached records are unfiltered
+        if records is None and self.run_filter is None:
+            if self.store is not None:
+                records = self.store.get_records(project_path, limit=window)
+            if not records and self.cache is not None:
+                entity, _, project = project_path.partition("/")
+                cached = self.cache.load_project(entity, project).values()
+                records = sorted(cached, key=created_at_key, reverse=True)[:window]
+        return records or []
+
+    def get_runs(self, project_filter="", on_record=None):
+        """Get processed runs for one project, or for all projects if no filter.
+
+        All projects are fetched in parallel, see fan_out for timeout handling.
+        If on_record is given, each record is passed to it as soon as it is
+        ready (from several threads) instead of being collected, and the
+        returned list is empty. With a limit or offset the window has to be
+        known first, so its records are passed to on_record at the end.
+        With a deadline, late projects are filled in as described in the
+        class docstring.
+        """
+        paged = self.limit is not None or self.offset > 0
+        streaming = on_record is not None and not paged
+        window = self.offset + self.limit if self.limit is not None else None
+        deadline = time.monotonic() + self.deadline if self.deadline else None
+        local = self.local_records(project_filter) if self.local_runs else {}
+        project = self.projection.apply
+
+        def with_local(record):
+            match = local.pop(record["id"], None) if local else None
+            return merge_local(record, match) if match is not None else record
+
+        def merged(records):
+            for record in records:
+                yield with_local(record)
+
+        def project_records(project_path):
+            if self.run_filter is not None:
+                return (record for _, record in self.iter_project_runs(
+                    project_path, filters=self.run_filter.query(), run_filter=self.run_filter, limit=window))
+            if (self.store is not None and not self.refresh
+                    and self.store.get_sync_state(project_path)[1] is not None):
+                TELEMETRY.count("store_reads")
+                return self.store.get_records(project_path, limit=window)
+            if self.store is not None:
+                return self.sync_project_runs(project_path, limit=window)
+            return (record for _, record in self.iter_project_runs(project_path, limit=window))
+
+        # Streamed records go out through emit; past the deadline it drops
+        # them, late projects are filled in from their last known records
+        emitted = {}  # project path -> {run id}
+        emit_lock = threading.Lock()
+        closed = threading.Event()
+
+        def emit(record):
+            with emit_lock:
+                if closed.is_set():
+                    return
+                emitted.setdefault(f"{record.get('entity')}/{record.get('project')}", set()).add(record["id"])
+                on_record(project(record))
+
+        def fetch_project(project_path):
+            records = project_records(project_path)
+            if local:
+                records = merged(records)
+            if not streaming:
+                return list(records)
+            for record in records:
+                emit(record)
+            return []
+
+        def shared_fetch(project_path, stream=False):
+            # The shared result holds no local runs, any caller can take it over
+            def fetch(job):
+                records = []
+                for record in project_records(project_path):
+                    records.append(record)
+                    job.progress.append(record)
+                    if stream:
+                        emit(with_local(record))
+                return records
+            records = PROJECT_FETCHES.run(self.fetch_key(project_path, window), fetch)
+            if not stream:
+                return records
+            # Joined another listing's fetch, whose records were not streamed here
+            with emit_lock:
+                sent = set(emitted.get(project_path, ()))
+            for record in records:
+                if record["id"] not in sent:
+                    emit(with_local(record))
+            return []
+
+        def run_leftover(pending):
+            """Fetch the projects the deadline left unstarted in the background, for the next listing"""
+            queued = time.monotonic()
+
+            def background(project_path):
+                finished = PROJECT_FETCHES.finished_at(self.fetch_key(project_path, window))
+                # A later listing got to it first
+                if finished is not None and finished > queued:
+                    return
+                shared_fetch(project_path)
+
+            jobs = {path: (lambda path=path: background(path)) for path, _ in pending}
+            log.info("Fetching %d projects the deadline left unstarted in the background", len(jobs))
+            threading.Thread(target=fan_out, args=(jobs,), daemon=True,
+                             kwargs={"concurrency": self.concurrency, "timeout": self.project_timeout}).start()
+
+        per_project = []
+
+        if self.api is None:
+            # Local runs only
             pass
-    
-    # Sort runs by creation date (newest first)
-    runs.sort(key=lambda x: x["createdAt"], reverse=True)
-    
-    # Always output the runs list, even if empty
-    print(f"About to output {len(runs)} runs", file=sys.stderr)
-    print(json.dumps(runs))
-    
-except ImportError as e:
-    print(f"ImportError: {e}", file=sys.stderr)
-    print("[]")
-except Exception as e:
-    print(f"Global exception: {type(e).__name__}: {e}", file=sys.stderr)
-    print("[]")
\ No newline at end of file
+        elif project_filter and deadline is None:
+            # Get runs from specific project
+            try:
+                log.info("Filtering by project: %s", project_filter)
+                per_project.append(fetch_project(project_filter))
+                log.info("Final runs count: %d", len(per_project[0]))
+            except Exception as e:
+                log.error("Error filtering project %s: %s", project_filter, e)
+        else:
+            # Get runs from all projects, or one project within the deadline
+            try:
+                project_paths = [project_filter] if project_filter else self.project_paths
+                if project_paths is None:
+                    project_paths = [f"{project.entity}/{project.name}" for project in self.api.projects()]
+                if deadline is None:
+                    jobs = {path: (lambda path=path: fetch_project(path)) for path in project_paths}
+                else:
+                    # Projects late (or never fetched) last time go first
+                    jobs = {path: (lambda path=path: shared_fetch(path, stream=streaming))
+                            for path in sorted(project_paths, key=lambda path: fresh_at(self.fetch_key(path, window)))}
+                results = fan_out(jobs, concurrency=self.concurrency, timeout=self.project_timeout,
+                                  deadline=deadline, leftover=run_leftover if deadline is not None else None)
+                if deadline is not None:
+                    closed.set()
+                    mark_fresh(self.fetch_key(path, window) for path in results)
+                    with emit_lock:
+                        for path in project_paths:
+                            if path not in results:
+                                results[path] = self.fill_late(path, window, emitted.get(path, ()))
+                        if streaming:
+                            for path in project_paths:
+                                for record in merged(results[path]):
+                                    on_record(project(record))
+                            results = {}
+                    if local and not streaming:
+                        results = {path: list(merged(records)) for path, records in results.items()}
+                per_project = [results.get(path, []) for path in project_paths]
+            except Exception as e:
+                log.error("Error listing projects: %s: %s", type(e).__name__, e)
+
+        if local:
+            # Local runs the cloud does not know (yet), e.g. offline ones
+            rest = sorted((record for _, record in list(local.values())), key=created_at_key, reverse=True)
+            if streaming:
+                for record in rest:
+                    on_record(project(record))
+            else:
+                per_project.append(rest)
+
+        # Every project's list is newest first already
+        runs = heapq.merge(*per_project, key=created_at_key, reverse=True)
+        if paged:
+            runs = itertools.islice(runs, self.offset, window)
+        runs = [project(run) for run in runs]
+        if on_record is not None and paged:
+            for run in runs:
+                on_record(run)
+            return []
+        return runs
+
+    def fill_late(self, project_path, window, emitted=()):
+        """Records of a project whose fetch missed the deadline, newest first.
+
+        Runs the fetch has processed so far are kept; the rest of the
+        project's last known records are copied with "partial": true. A
+        project with neither gets one placeholder record, so it is never
+        silently missing. Runs in `emitted` (already streamed) are left out.
+        """
+        key = self.fetch_key(project_path, window)
+        fresh = PROJECT_FETCHES.progress(key)
+        seen = {record["id"] for record in fresh}
+        stale = [{**record, "partial": True} for record in self.last_known(project_path, key, window)
+                 if record["id"] not in seen]
+        records = sorted(fresh + stale, key=created_at_key, reverse=True) or [placeholder_record(project_path)]
+        TELEMETRY.count("late_projects")
+        TELEMETRY.count("partial_runs", len(stale))
+        log.warning("%s not fetched by the deadline: %d runs fetched, %d from the last known records",
+                    project_path, len(fresh), len(stale))
+        return [record for record in records if record["id"] not in emitted]
+
+
+def get_runs(api, project_filter="", on_record=None, **options):
+    """Shortcut for RunCollector(api, **options).get_runs(...)"""
+    return RunCollector(api, **options).get_runs(project_filter, on_record=on_record)
+
+
+class NdjsonWriter:
+    """Thread-safe on_record callback writing one JSON record per line"""
+
+    def __init__(self, out):
+        self.out = out
+        self.count = 0
+        self.closed = False
+        self.lock = threading.Lock()
+
+    def __call__(self, record):
+        with TELEMETRY.timer("serialize"):
+            line = json.dumps(record)
+        with self.lock:
+            # Projects abandoned after a timeout may still finish late
+            if self.closed:
+                return
+            self.out.write(line + "\n")
+            self.out.flush()
+            self.count += 1
+
+    def close(self):
+        with self.lock:
+            self.closed = True
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Print wandb runs as JSON")
+    parser.add_argument("project", nargs="?", default="", help="entity/project to list, all projects if omitted")
+    parser.add_argument("--incremental", action="store_true",
+                        help="only fetch runs changed since the last call, using the local run store")
+    parser.add_argument("--concurrency", type=int, default=PROJECT_CONCURRENCY,
+                        help="projects fetched in parallel when listing all projects")
+    parser.add_argument("--project-timeout", type=float, default=PROJECT_TIMEOUT,
+                        help="seconds before giving up on a single project")
+    parser.add_argument("--deadline", type=float, default=RUN_DEADLINE,
+                        help="seconds for the whole listing; late projects come from their last known "
+                             "records, marked partial")
+    parser.add_argument("--cache-finished", action="store_true",
+                        help="reuse stored records of finished/crashed/failed runs instead of reprocessing them")
+    parser.add_argument("--cache-metadata", action="store_true",
+                        help="keep each run's GPU metadata in the local store instead of refetching it")
+    parser.add_argument("--no-metadata", action="store_true",
+                        help="skip run.metadata requests entirely, GPU shows N/A")
+    parser.add_argument("--gpu-samples", action="store_true",
+                        help="fill in GPU utilization from the background sampler's buffer")
+    parser.add_argument("--eta-history", action="store_true",
+                        help="estimate ETAs from the step rate over recent calls instead of the average rate")
+    parser.add_argument("--state", help="only runs in these states, e.g. 'running' or 'finished,crashed'")
+    parser.add_argument("--tag", help="only runs with any of these comma-separated tags")
+    parser.add_argument("--user", help="only runs by any of these comma-separated usernames")
+    parser.add_argument("--created-after", help="only runs created at or after this ISO date/time")
+    parser.add_argument("--created-before", help="only runs created before this ISO date/time")
+    parser.add_argument("--name", help="only runs whose name matches this regular expression")
+    parser.add_argument("--limit", type=int, help="at most this many runs, newest first")
+    parser.add_argument("--offset", type=int, default=0, help="skip this many of the newest runs")
+    parser.add_argument("--per-page", type=int, default=RUNS_PER_PAGE, help="runs per API page")
+    parser.add_argument("--local-dir", action="append",
+                        help="also read the wandb run directories under this path (default: WANDB_LOCAL_DIRS)")
+    parser.add_argument("--fields", help="comma-separated globs of record fields to output, e.g. 'id,name,eta*'")
+    parser.add_argument("--metric-keys", help="comma-separated globs of summary keys kept in metrics, e.g. 'loss,train/*'")
+    parser.add_argument("--metrics", action="store_true",
+                        help="print phase timings and counters as a final 'TELEMETRY {json}' line on stderr")
+    parser.add_argument("--stream", action="store_true",
+                        help="write each run as one NDJSON line as soon as it is processed, unsorted")
+    return parser.parse_args(argv)
+
+
+def main():
+    args = parse_args()
+    # A streamed response is simply empty on failure
+    empty_output = "" if args.stream else "[]"
+    try:
+        run_filter = RunFilter.from_params(vars(args))
+    except InvalidFilter as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(2)
+    local_runs = LocalRuns(args.local_dir) if args.local_dir else LocalRuns()
+    # Without an API key only local runs can be listed, skip importing wandb
+    if not os.environ.get("WANDB_API_KEY") and not local_runs:
+        print(empty_output)
+        return
+
+    try:
+        project_filter = args.project
+        api = wandb_api() if os.environ.get("WANDB_API_KEY") else None
+        eta_estimator = None
+        if args.eta_history:
+            from eta_estimator import EtaEstimator
+            eta_estimator = EtaEstimator()
+        collector = RunCollector(
+            api,
+            store=RunStore() if args.incremental else None,
+            cache=FinishedRunCache() if args.cache_finished else None,
+            hardware_cache=HardwareCache() if args.cache_metadata else None,
+            gpu_samples=GpuSampleStore() if args.gpu_samples else None,
+            eta_estimator=eta_estimator,
+            fetch_metadata=not args.no_metadata,
+            concurrency=args.concurrency,
+            project_timeout=args.project_timeout,
+            projection=projection(args.fields, args.metric_keys),
+            run_filter=run_filter,
+            limit=args.limit,
+            offset=args.offset,
+            per_page=args.per_page,
+            local_runs=local_runs if local_runs else None,
+            deadline=args.deadline)
+
+        if args.stream:
+            writer = NdjsonWriter(sys.stdout)
+            collector.get_runs(project_filter, on_record=writer)
+            writer.close()
+            log.info("Streamed %d runs", writer.count)
+        else:
+            runs = collector.get_runs(project_filter)
+
+            # Always output the runs list, even if empty
+            log.info("About to output %d runs", len(runs))
+            with TELEMETRY.timer("serialize"):
+                output = json.dumps(runs)
+            print(output)
+
+    except ImportError as e:
+        log.error("ImportError: %s", e)
+        print(empty_output)
+    except Exception as e:
+        log.error("Global exception: %s: %s", type(e).__name__, e)
+        print(empty_output)
+
+    if args.metrics:
+        print("TELEMETRY " + json.dumps(TELEMETRY.snapshot()), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""Background GPU utilization sampler for running wandb runs.
+
+Every GPU_SAMPLE_INTERVAL seconds, finds the running runs of every project
+and reads their system metrics, where wandb logs GPU utilization (the
+"events" stream, not the training history). Events carry no _step, so a
+sample's step is the run's _runtime.
+
+The events query only takes a sample count spread over the run's whole
+lifetime, no lower bound, so it is read once per run to backfill the
+buffer (BACKFILL_EVENTS). After that each pass appends the run's latest
+system metrics, run.system_metrics, when their _runtime is past the last
+sample: one small read per run that does not grow as the run ages.
+Without a _runtime in the system metrics the sampler keeps reading the
+backfill window instead.
+Samples go into the per-run ring buffer of GpuSampleStore, where
+get_wandb_runs.py picks up the latest value. Runs whose system metrics
+hold no GPU key (CPU-only runs) are skipped for a growing back-off
+instead of being read again on every pass.
+
+Started by the worker; can also run on its own:
+    python scripts/gpu_sampler.py          # loop forever
+    python scripts/gpu_sampler.py --once   # one pass, then exit
+"""
+
+import os
+import sys
+import time
+import argparse
+import threading
+
+from entrypoint import wandb_api
+from parallel import fan_out
+from run_store import GpuSampleStore
+from get_wandb_runs import run_key
+from refresh_scheduler import backoff_delay
+from telemetry import get_logger
+
+log = get_logger("gpu_sampler")
+
+# System metric keys that may hold GPU utilization, tried in order until one has data
+EVENT_GPU_KEYS = ['system.gpu.0.gpu', 'system.gpu.process.0.gpu', 'system.gpu.0.utilization']
+
+GPU_SAMPLE_INTERVAL = float(os.environ.get("GPU_SAMPLE_INTERVAL", "60"))
+GPU_SAMPLE_CONCURRENCY = int(os.environ.get("GPU_SAMPLE_CONCURRENCY", "4"))
+
+# Events read to backfill a run's buffer on its first sample
+BACKFILL_EVENTS = 100
+
+# A run without GPU events is retried after NO_GPU_BACKOFF seconds,
+# doubling per miss up to NO_GPU_BACKOFF_MAX
+NO_GPU_BACKOFF = 300
+NO_GPU_BACKOFF_MAX = 6 * 3600
+
+
+class GpuSampler:
+    def __init__(self, api_factory, store=None, interval=GPU_SAMPLE_INTERVAL,
+                 concurrency=GPU_SAMPLE_CONCURRENCY):
+        self.api_factory = api_factory
+        self.store = store or GpuSampleStore()
+        self.interval = interval
+        self.concurrency = concurrency
+        self.stop_event = threading.Event()
+        self.no_gpu = {}  # run key -> (misses, monotonic time of the next try)
+
+    def running_runs(self, api):
+        """Running runs of every project, filtered server side"""
+        runs = []
+        for project in api.projects():
+            project_path = f"{project.entity}/{project.name}"
+            try:
+                runs.extend(api.runs(project_path, filters={"state": "running"}))
+            except Exception as e:
+                log.warning("Error listing %s: %s", project_path, e)
+        return runs
+
+    def sample_run(self, run):
+        """Append new GPU samples for one run, returns how many were added"""
+        key = run_key(run)
+        miss = self.no_gpu.get(key)
+        if miss is not None and time.monotonic() < miss[1]:
+            return 0
+        metric_key, last_runtime, _ = self.store.get_state(key)
+        if metric_key not in EVENT_GPU_KEYS:
+            # Never sampled, or sampled from the training history by an older version
+            metric_key, last_runtime = None, None
+
+        latest = getattr(run, "system_metrics", None) or {}
+        if last_runtime is not None and isinstance(latest.get("_runtime"), (int, float)):
+            if latest["_runtime"] <= last_runtime:
+                return 0
+            events = [latest]
+        else:
+            events = run.history(stream="events", samples=BACKFILL_EVENTS, pandas=False)
+            events = sorted((row for row in events if isinstance(row.get("_runtime"), (int, float))),
+                            key=lambda row: row["_runtime"])
+        for event_key in [metric_key] if metric_key else EVENT_GPU_KEYS:
+            samples = [(row["_runtime"], row[event_key]) for row in events
+                       if isinstance(row.get(event_key), (int, float))]
+            if not samples:
+                continue
+            self.no_gpu.pop(key, None)
+            if last_runtime is not None:
+                samples = [sample for sample in samples if sample[0] > last_runtime]
+            self.store.append(key, event_key, samples)
+            return len(samples)
+
+        if metric_key is None:
+            misses = (miss[0] if miss else 0) + 1
+            self.no_gpu[key] = (misses, time.monotonic() + backoff_delay(misses, NO_GPU_BACKOFF, NO_GPU_BACKOFF_MAX))
+        return 0
+
+    def sample_once(self):
+        api = self.api_factory()
+        runs = self.running_runs(api)
+        jobs = {run_key(run): (lambda run=run: self.sample_run(run)) for run in runs}
+        # Back-offs of runs that stopped running are not needed any more
+        self.no_gpu = {key: miss for key, miss in self.no_gpu.items() if key in jobs}
+        results = fan_out(jobs, concurrency=self.concurrency, timeout=max(self.interval, 30))
+        return sum(results.values())
+
+    def run_forever(self):
+        while not self.stop_event.is_set():
+            try:
+                added = self.sample_once()
+                if added:
+                    log.debug("%d new samples", added)
+            except Exception as e:
+                log.warning("Sampling failed: %s: %s", type(e).__name__, e)
+            self.stop_event.wait(self.interval)
+
+    def start(self):
+        """Run the sampling loop on a daemon thread"""
+        thread = threading.Thread(target=self.run_forever, name="gpu-sampler", daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self):
+        self.stop_event.set()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sample GPU utilization of running wandb runs")
+    parser.add_argument("--once", action="store_true", help="sample once and exit")
+    parser.add_argument("--interval", type=float, default=GPU_SAMPLE_INTERVAL)
+    args = parser.parse_args()
+
+    if not os.environ.get("WANDB_API_KEY"):
+        print("WANDB_API_KEY is not set", file=sys.stderr)
+        sys.exit(1)
+    sampler = GpuSampler(wandb_api, interval=args.interval)
+    if args.once:
+        print(f"{sampler.sample_once()} new samples", file=sys.stderr)
+    else:
+        sampler.run_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""Scanner for the local HuggingFace hub cache, works offline.
+
+The hub cache keeps one directory per repo:
+
+    models--org--name/
+        blobs/<hash>                 file contents, each stored once
+        refs/main                    commit hash the ref points to
+        snapshots/<commit>/<files>   symlinks into blobs/
+
+Every repo is reported with its revisions, its size on disk (each blob
+counted once, however many revisions share it) and when it was last
+accessed. Repos are scanned on a thread pool with os.scandir. An index
+keyed by directory mtimes is saved under .cache/, so a repeat scan only
+rescans repos whose blobs, refs or snapshots changed.
+
+    python scripts/hf_cache.py            # {"models": [...], "datasets": [...]}
+    python scripts/hf_cache.py --rescan   # ignore the index
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import datetime
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from run_store import default_cache_dir
+
+REPO_TYPES = {"models": "model", "datasets": "dataset"}
+
+# Threads stat-ing repo directories at once
+HF_CACHE_SCAN_THREADS = int(os.environ.get("HF_CACHE_SCAN_THREADS", "8"))
+
+# Unchanged repos still get their blob access times reread after this long
+# (seconds); with relatime the kernel only updates them daily anyway
+ATIME_REFRESH = 3600
+
+
+def default_hub_cache():
+    """Hub cache directory, honouring the same variables as huggingface_hub"""
+    if os.environ.get("HF_HUB_CACHE"):
+        return os.environ["HF_HUB_CACHE"]
+    hf_home = os.environ.get("HF_HOME") or os.path.join(
+        os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"), "huggingface")
+    return os.path.join(hf_home, "hub")
+
+
+def format_size(size):
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1000:
+            return f"{size:.1f} {unit}" if unit != "B" else f"{size} B"
+        size /= 1000
+    return f"{size:.1f} TB"
+
+
+def iso(timestamp):
+    return datetime.datetime.fromtimestamp(timestamp).isoformat() if timestamp else None
+
+
+def dir_mtimes(repo_path):
+    """mtime_ns of the directories and ref files whose change means a rescan.
+
+    A new revision touches snapshots/, a new file adds a blob and a moved
+    ref rewrites its file. Nested snapshot folders are not stat'ed, the
+    periodic ATIME_REFRESH rescan picks up the rare change only they see.
+    """
+    mtimes = {}
+    for name in ("", "blobs", "snapshots"):
+        try:
+            mtimes[name] = os.stat(os.path.join(repo_path, name)).st_mtime_ns
+        except OSError:
+            pass
+    stack = ["refs"]
+    while stack:
+        rel = stack.pop()
+        try:
+            with os.scandir(os.path.join(repo_path, rel)) as entries:
+                for entry in entries:
+                    path = rel + "/" + entry.name
+                    mtimes[path] = entry.stat(follow_symlinks=False).st_mtime_ns
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(path)
+        except OSError:
+            pass
+    return mtimes
+
+
+def scan_blobs(repo_path):
+    """Return {blob name: (size, atime, mtime)}, partial downloads left out"""
+    blobs = {}
+    try:
+        with os.scandir(os.path.join(repo_path, "blobs")) as entries:
+            for entry in entries:
+                if entry.name.endswith(".incomplete") or not entry.is_file(follow_symlinks=False):
+                    continue
+                st = entry.stat(follow_symlinks=False)
+                blobs[entry.name] = (st.st_size, st.st_atime, st.st_mtime)
+    except OSError:
+        pass
+    return blobs
+
+
+def read_refs(repo_path):
+    """Return {commit: [ref names]}, nested refs like pr/1 included"""
+    refs = {}
+    root = os.path.join(repo_path, "refs")
+    for dirpath, _, filenames in os.walk(root):
+        for filename in filenames:
+            path = os.path.join(dirpath, filename)
+            try:
+                with open(path) as f:
+                    commit = f.read().strip()
+            except OSError:
+                continue
+            refs.setdefault(commit, []).append(os.path.relpath(path, root).replace(os.sep, "/"))
+    return refs
+
+
+def snapshot_files(snapshot_path):
+    """Yield a DirEntry for every file of a snapshot, walking subfolders"""
+    stack = [snapshot_path]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    else:
+                        yield entry
+        except OSError:
+            pass
+
+
+def scan_repo(repo_path, repo_type, repo_id):
+    """Full record of one repo directory"""
+    blobs = scan_blobs(repo_path)
+    refs = read_refs(repo_path)
+    revisions = []
+    # Files stored outside blobs/ (no symlink support) are deduplicated by inode
+    loose = {}
+    snapshots = os.path.join(repo_path, "snapshots")
+    try:
+        commits = sorted(entry.name for entry in os.scandir(snapshots) if entry.is_dir())
+    except OSError:
+        commits = []
+
+    for commit in commits:
+        used = set()
+        size = files = 0
+        modified = 0
+        for entry in snapshot_files(os.path.join(snapshots, commit)):
+            files += 1
+            if entry.is_symlink():
+                blob = os.path.basename(os.readlink(entry.path))
+                if blob in blobs and blob not in used:
+                    used.add(blob)
+                    size += blobs[blob][0]
+                    modified = max(modified, blobs[blob][2])
+            else:
+                st = entry.stat(follow_symlinks=False)
+                inode = (st.st_dev, st.st_ino)
+                loose[inode] = (st.st_size, st.st_atime, st.st_mtime)
+                if inode not in used:
+                    used.add(inode)
+                    size += st.st_size
+                    modified = max(modified, st.st_mtime)
+        revisions.append({
+            "commit": commit,
+            "refs": sorted(refs.get(commit, [])),
+            "size": size,
+            "nbFiles": files,
+            "lastModified": iso(modified),
+        })
+
+    stats = list(blobs.values()) + list(loose.values())
+    size_on_disk = sum(size for size, _, _ in stats)
+    return {
+        "name": repo_id,
+        "type": repo_type,
+        "size": format_size(size_on_disk),
+        "sizeOnDisk": size_on_disk,
+        "nbFiles": len(stats),
+        "lastAccessed": iso(max((atime for _, atime, _ in stats), default=0)),
+        "lastModified": iso(max((mtime for _, _, mtime in stats), default=0)),
+        "revisions": sorted(revisions, key=lambda r: r["lastModified"] or "", reverse=True),
+        "path": repo_path,
+    }
+
+
+def parse_repo_dir(name):
+    """("model", "org/name") for "models--org--name", None for other entries"""
+    prefix, _, rest = name.partition("--")
+    if prefix not in REPO_TYPES or not rest:
+        return None
+    return REPO_TYPES[prefix], rest.replace("--", "/")
+
+
+class HfCacheScanner:
+    """Scans a hub cache, reusing records of repos whose directories did not change"""
+
+    def __init__(self, cache_dir=None, index_path=None, threads=HF_CACHE_SCAN_THREADS):
+        self.cache_dir = cache_dir or default_hub_cache()
+        self.index_path = index_path or os.path.join(default_cache_dir(), "hf_cache_index.json")
+        self.threads = threads
+        self.lock = threading.Lock()
+        self.index = None
+
+    def load_index(self):
+        if self.index is None:
+            try:
+                with open(self.index_path) as f:
+                    index = json.load(f)
+            except (OSError, ValueError):
+                index = {}
+            self.index = index if index.get("cacheDir") == self.cache_dir else {"cacheDir": self.cache_dir}
+            self.index.setdefault("repos", {})
+        return self.index
+
+    def save_index(self):
+        os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+        tmp = self.index_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.index, f)
+        os.replace(tmp, self.index_path)
+
+    def scan(self, rescan=False):
+        """Return {"models": [...], "datasets": [...]}, largest repos first"""
+        with self.lock:
+            index = self.load_index()
+            known = {} if rescan else index["repos"]
+            repos = []
+            try:
+                with os.scandir(self.cache_dir) as entries:
+                    for entry in entries:
+                        parsed = parse_repo_dir(entry.name)
+                        if parsed and entry.is_dir():
+                            repos.append((entry.name, entry.path) + parsed)
+            except FileNotFoundError:
+                pass
+
+            now = time.time()
+            rescanned = []
+
+            def visit(repo):
+                name, path, repo_type, repo_id = repo
+                mtimes = dir_mtimes(path)
+                entry = known.get(name)
+                if entry and entry["mtimes"] == mtimes and now - entry["scannedAt"] < ATIME_REFRESH:
+                    return name, entry
+                rescanned.append(name)
+                return name, {"mtimes": mtimes, "scannedAt": now, "record": scan_repo(path, repo_type, repo_id)}
+
+            with ThreadPoolExecutor(max_workers=self.threads) as pool:
+                # Repos that disappeared are dropped from the index here
+                index["repos"] = dict(pool.map(visit, repos))
+            if rescanned or len(index["repos"]) != len(known):
+                self.save_index()
+
+        listing = {kind: [] for kind in REPO_TYPES}
+        for entry in index["repos"].values():
+            record = entry["record"]
+            listing[record["type"] + "s"].append(record)
+        for records in listing.values():
+            records.sort(key=lambda r: r["sizeOnDisk"], reverse=True)
+        return listing
+
+
+def main():
+    parser = argparse.ArgumentParser(description="List locally cached HuggingFace models and datasets as JSON")
+    parser.add_argument("--cache-dir", help="hub cache directory, default ~/.cache/huggingface/hub")
+    parser.add_argument("--rescan", action="store_true", help="rescan every repo, ignoring the index")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    listing = HfCacheScanner(args.cache_dir).scan(rescan=args.rescan)
+    count = sum(len(records) for records in listing.values())
+    print(f"Scanned {count} cached repos in {(time.perf_counter() - start) * 1000:.1f}ms", file=sys.stderr)
+    print(json.dumps(listing))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""Persisted catalog of the user's HuggingFace models and datasets.
+
+Listings are kept in the local SQLite store and served from there right
+away; once they are older than HF_CATALOG_TTL a refresh of both listings
+runs concurrently in the background (stale-while-revalidate). A refresh
+walks the author's repos newest-modified first and stops at the first one
+whose lastModified matches the store, so unchanged entries are neither
+fetched nor rebuilt. Every HF_CATALOG_FULL_SYNC seconds the full listing
+is fetched again to drop deleted repos and pick up download counts.
+
+whoami() is cached per token hash, so it is not called on every listing.
+
+    python scripts/hf_catalog.py             # both listings as JSON
+    python scripts/hf_catalog.py --refresh   # refresh first, whatever their age
+"""
+
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+import threading
+
+from parallel import fan_out
+from run_store import connect, default_store_path
+from entrypoint import load_env, hf_token, hf_api
+from get_hf_models import model_record
+from get_hf_datasets import dataset_record
+from telemetry import get_logger
+
+log = get_logger("hf_catalog")
+
+# Listings older than this are refreshed in the background (seconds)
+HF_CATALOG_TTL = float(os.environ.get("HF_CATALOG_TTL", "300"))
+
+# Full relisting of a user's repos, catches deletions and download counts (seconds)
+HF_CATALOG_FULL_SYNC = float(os.environ.get("HF_CATALOG_FULL_SYNC", "3600"))
+
+# A token's username is looked up again after this long (seconds)
+HF_WHOAMI_TTL = 24 * 3600
+
+# Popular repos listed when there is no token
+PUBLIC_LIMIT = 50
+
+# kind -> (HfApi method name, record builder)
+KINDS = {
+    "models": ("list_models", model_record),
+    "datasets": ("list_datasets", dataset_record),
+}
+
+
+def token_hash(token):
+    """Stable key for a token that does not store the token itself"""
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+class HfCatalogStore:
+    """SQLite tables behind HfCatalog.
+
+    Entries are grouped by scope, "user:<name>" for a token's own repos or
+    "public" for the popular listing, and kind ("models" or "datasets").
+    """
+
+    def __init__(self, path=None):
+        self.path = path or default_store_path()
+        self.lock = threading.Lock()
+        self.conn = connect(self.path)
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS hf_whoami (
+                token_hash TEXT PRIMARY KEY,
+                username TEXT NOT NULL,
+                fetched_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS hf_entries (
+                scope TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                name TEXT NOT NULL,
+                last_modified TEXT,
+                downloads INTEGER,
+                record TEXT NOT NULL,
+                PRIMARY KEY (scope, kind, name)
+            );
+            CREATE TABLE IF NOT EXISTS hf_listings (
+                scope TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                refreshed_at REAL NOT NULL,
+                full_sync_at REAL NOT NULL,
+                PRIMARY KEY (scope, kind)
+            );
+        """)
+        self.conn.commit()
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    def get_username(self, key, max_age=HF_WHOAMI_TTL):
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT username FROM hf_whoami WHERE token_hash = ? AND fetched_at >= ?",
+                (key, time.time() - max_age)).fetchone()
+        return row[0] if row else None
+
+    def put_username(self, key, username):
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO hf_whoami (token_hash, username, fetched_at) VALUES (?, ?, ?)",
+                (key, username, time.time()))
+
+    def get_listing(self, scope, kind):
+        """Return (refreshed_at, full_sync_at) or (None, None) if never listed"""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT refreshed_at, full_sync_at FROM hf_listings WHERE scope = ? AND kind = ?",
+                (scope, kind)).fetchone()
+        return row if row else (None, None)
+
+    def get_versions(self, scope, kind):
+        """Stored {name: lastModified} of a listing"""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT name, last_modified FROM hf_entries WHERE scope = ? AND kind = ?",
+                (scope, kind)).fetchall()
+        return dict(rows)
+
+    def get_records(self, scope, kind):
+        """Stored records, most downloaded first for the public listing, newest first otherwise"""
+        order = "downloads DESC" if scope == "public" else "last_modified DESC"
+        with self.lock:
+            rows = self.conn.execute(
+                f"SELECT record FROM hf_entries WHERE scope = ? AND kind = ? ORDER BY {order}",
+                (scope, kind)).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def save(self, scope, kind, records, full_sync=False):
+        """Upsert records and mark the listing refreshed; a full sync replaces it"""
+        now = time.time()
+        with self.lock, self.conn:
+            if full_sync:
+                self.conn.execute("DELETE FROM hf_entries WHERE scope = ? AND kind = ?", (scope, kind))
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO hf_entries (scope, kind, name, last_modified, downloads, record) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [(scope, kind, r["name"], r["lastModified"], r["downloads"] or 0, json.dumps(r))
+                 for r in records])
+            previous = self.conn.execute(
+                "SELECT full_sync_at FROM hf_listings WHERE scope = ? AND kind = ?",
+                (scope, kind)).fetchone()
+            full_sync_at = now if full_sync or not previous else previous[0]
+            self.conn.execute(
+                "INSERT OR REPLACE INTO hf_listings (scope, kind, refreshed_at, full_sync_at) VALUES (?, ?, ?, ?)",
+                (scope, kind, now, full_sync_at))
+
+
+class HfCatalog:
+    """Serves model and dataset listings for one HfApi/token from an HfCatalogStore.
+
+    With api=None an HfApi is only created, and huggingface_hub imported,
+    once a listing or whoami has to be fetched.
+    """
+
+    def __init__(self, api=None, token=None, store=None, ttl=HF_CATALOG_TTL, full_sync_interval=HF_CATALOG_FULL_SYNC):
+        self._api = api
+        self.token = token
+        self.store = store or HfCatalogStore()
+        self.ttl = ttl
+        self.full_sync_interval = full_sync_interval
+        self.refresh_lock = threading.Lock()
+        self.refreshing = None
+
+    @property
+    def api(self):
+        if self._api is None:
+            self._api = hf_api(self.token)
+        return self._api
+
+    def username(self):
+        """The token's username, from the store while it is fresh"""
+        if not self.token:
+            return None
+        key = token_hash(self.token)
+        username = self.store.get_username(key)
+        if username is None:
+            username = self.api.whoami()["name"]
+            self.store.put_username(key, username)
+        return username
+
+    def scope(self):
+        """Return (scope, author); the popular public listing if the user is unknown"""
+        try:
+            username = self.username()
+        except Exception as e:
+            log.warning("HF whoami failed: %s: %s", type(e).__name__, e)
+            username = None
+        if username:
+            return f"user:{username}", username
+        return "public", None
+
+    def refresh(self, kind, scope=None, author=None):
+        """Fetch what changed in one listing and store it, returns the number of records stored"""
+        if scope is None:
+            scope, author = self.scope()
+        method, build = KINDS[kind]
+        list_repos = getattr(self.api, method)
+
+        if author is None:
+            records = [build(item) for item in list_repos(limit=PUBLIC_LIMIT, sort="downloads", direction=-1)]
+            self.store.save(scope, kind, records, full_sync=True)
+            return len(records)
+
+        _, full_sync_at = self.store.get_listing(scope, kind)
+        full_sync = full_sync_at is None or time.time() - full_sync_at > self.full_sync_interval
+        known = {} if full_sync else self.store.get_versions(scope, kind)
+        records = []
+        for item in list_repos(author=author, sort="lastModified", direction=-1):
+            record = build(item)
+            # Newest modified first, everything from here on is unchanged
+            if record["lastModified"] and known.get(record["name"]) == record["lastModified"]:
+                break
+            records.append(record)
+        self.store.save(scope, kind, records, full_sync=full_sync)
+        return len(records)
+
+    def refresh_all(self):
+        """Refresh every listing concurrently, errors leave the stored listing as is"""
+        scope, author = self.scope()
+        jobs = {kind: (lambda kind=kind: self.refresh(kind, scope, author)) for kind in KINDS}
+        fan_out(jobs, concurrency=len(jobs))
+
+    def revalidate(self):
+        """Start a background refresh_all unless one is already running"""
+        with self.refresh_lock:
+            if self.refreshing is not None and self.refreshing.is_alive():
+                return
+            self.refreshing = threading.Thread(target=self.refresh_all, name="hf-catalog", daemon=True)
+            self.refreshing.start()
+
+    def stored(self, kind):
+        """Records of one listing as stored, without fetching anything"""
+        scope, _ = self.scope()
+        return self.store.get_records(scope, kind)
+
+    def get(self, kind, background=True, revalidate=True):
+        """Records of one listing, served from the store.
+
+        A listing that was never fetched is fetched now. A stale one is
+        returned as is while it refreshes in the background, or refreshed
+        first when background=False (one-shot scripts exit too soon).
+        revalidate=False leaves stale listings alone, for when a
+        refresh_scheduler.HfRefresher keeps them fresh.
+        """
+        scope, _ = self.scope()
+        refreshed_at, _ = self.store.get_listing(scope, kind)
+        if refreshed_at is None:
+            self.refresh_all()
+        elif revalidate and time.time() - refreshed_at > self.ttl:
+            if background:
+                self.revalidate()
+            else:
+                self.refresh_all()
+        return self.store.get_records(scope, kind)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Print the HuggingFace model and dataset catalog as JSON")
+    parser.add_argument("--refresh", action="store_true", help="refresh both listings first")
+    args = parser.parse_args()
+
+    load_env()
+    empty = {kind: [] for kind in KINDS}
+    try:
+        catalog = HfCatalog(None, hf_token())
+        if args.refresh:
+            catalog.refresh_all()
+        print(json.dumps({kind: catalog.get(kind, background=False) for kind in KINDS}))
+    except Exception as e:
+        print(f"Error: {type(e).__name__}: {e}", file=sys.stderr)
+        print(json.dumps(empty))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""Per-repo details for the HuggingFace model and dataset listings.
+
+The listings only carry name, downloads, lastModified and tags. Details
+come from HfApi.model_info / dataset_info with file metadata, one request
+per repo:
+
+    sha               commit the details were read at
+    parameters        parameter count from the safetensors metadata (models)
+    safetensorsBytes  total size of the *.safetensors files
+    sizeBytes / size  total size of all files, raw and human readable
+    fileCount         files in the repo
+    gated, private    access status ("auto"/"manual" when gated)
+
+Details are kept in the local SQLite store keyed by repo id and the
+listing's version of the repo: its commit sha when the listing has one,
+lastModified otherwise, both change with every commit. A repo whose
+version is unchanged is never queried again. Missing ones are fetched
+HF_DETAIL_CONCURRENCY at a time, and each is passed to the on_details
+callback as soon as it is known (cached ones first), so a client can
+fill in its listing progressively.
+
+    python scripts/hf_details.py models              # enriched listing as JSON
+    python scripts/hf_details.py datasets --stream   # NDJSON, one repo's details per line
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+
+from parallel import fan_out
+from run_store import connect, default_store_path
+from entrypoint import load_env, hf_token, hf_api
+from hf_cache import format_size
+from telemetry import TELEMETRY, get_logger
+
+log = get_logger("hf_details")
+
+# info requests in flight at once, and seconds before giving up on one
+HF_DETAIL_CONCURRENCY = int(os.environ.get("HF_DETAIL_CONCURRENCY", "8"))
+HF_DETAIL_TIMEOUT = float(os.environ.get("HF_DETAIL_TIMEOUT", "30"))
+
+# kind -> HfApi method returning the repo's info
+INFO_METHODS = {"models": "model_info", "datasets": "dataset_info"}
+
+
+def record_version(record):
+    """What identifies the listed state of a repo: its commit sha, else lastModified"""
+    return record.get("sha") or record.get("lastModified")
+
+
+def safetensors_parameters(info):
+    """Parameter count from info.safetensors, an object or (older hub versions) a dict"""
+    safetensors = getattr(info, "safetensors", None)
+    if safetensors is None:
+        return None
+    if isinstance(safetensors, dict):
+        return safetensors.get("total")
+    return getattr(safetensors, "total", None)
+
+
+def repo_details(info):
+    """Details record of a ModelInfo/DatasetInfo fetched with files_metadata=True"""
+    siblings = getattr(info, "siblings", None) or []
+    size = safetensors = 0
+    for sibling in siblings:
+        file_size = getattr(sibling, "size", None) or 0
+        size += file_size
+        if sibling.rfilename.endswith(".safetensors"):
+            safetensors += file_size
+    return {
+        "sha": getattr(info, "sha", None),
+        "parameters": safetensors_parameters(info),
+        "safetensorsBytes": safetensors,
+        "sizeBytes": size,
+        "size": format_size(size),
+        "fileCount": len(siblings),
+        "gated": getattr(info, "gated", None) or False,
+        "private": bool(getattr(info, "private", False)),
+    }
+
+
+class HfDetailStore:
+    """SQLite table of repo details, one row per (kind, repo) with the version it was read at"""
+
+    def __init__(self, path=None):
+        self.path = path or default_store_path()
+        self.lock = threading.Lock()
+        self.conn = connect(self.path)
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS hf_details (
+                kind TEXT NOT NULL,
+                name TEXT NOT NULL,
+                version TEXT,
+                details TEXT NOT NULL,
+                fetched_at REAL NOT NULL,
+                PRIMARY KEY (kind, name)
+            );
+        """)
+        self.conn.commit()
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    def get_many(self, kind, names):
+        """Stored {name: (version, details)} for the given repos"""
+        found = {}
+        with self.lock:
+            # Stay below SQLite's bound-parameter limit
+            for i in range(0, len(names), 500):
+                chunk = names[i:i + 500]
+                rows = self.conn.execute(
+                    f"SELECT name, version, details FROM hf_details WHERE kind = ? "
+                    f"AND name IN ({','.join('?' * len(chunk))})", [kind] + chunk).fetchall()
+                found.update((name, (version, json.loads(details))) for name, version, details in rows)
+        return found
+
+    def put(self, kind, name, version, details):
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO hf_details (kind, name, version, details, fetched_at) VALUES (?, ?, ?, ?, ?)",
+                (kind, name, version, json.dumps(details), time.time()))
+
+
+class HfDetails:
+    """Adds details to listing records, from an HfDetailStore or a bounded pool of info requests.
+
+    With api=None an HfApi is only created, and huggingface_hub imported,
+    once a repo has to be fetched.
+    """
+
+    def __init__(self, api=None, token=None, store=None, concurrency=HF_DETAIL_CONCURRENCY,
+                 timeout=HF_DETAIL_TIMEOUT):
+        self._api = api
+        self.token = token
+        self.store = store or HfDetailStore()
+        self.concurrency = concurrency
+        self.timeout = timeout
+
+    @property
+    def api(self):
+        if self._api is None:
+            self._api = hf_api(self.token)
+        return self._api
+
+    def fetch(self, kind, name):
+        info = getattr(self.api, INFO_METHODS[kind])(name, files_metadata=True)
+        return repo_details(info)
+
+    def enrich(self, kind, records, on_details=None):
+        """Copies of `records` with their details merged in.
+
+        on_details, if given, gets {"name": ..., **details} per repo as soon
+        as its details are known, from several threads. Repos whose fetch
+        fails or times out are returned without details and tried again on
+        the next call.
+        """
+        names = [record["name"] for record in records]
+        stored = self.store.get_many(kind, names)
+        known, missing = {}, []
+        for record in records:
+            hit = stored.get(record["name"])
+            version = record_version(record)
+            if hit is not None and version is not None and hit[0] == version:
+                known[record["name"]] = hit[1]
+            else:
+                missing.append(record)
+        TELEMETRY.count("hf_detail_cache_hits", len(known))
+        log.info("%s details: %d cached, %d to fetch", kind, len(known), len(missing))
+        if on_details is not None:
+            for name, details in known.items():
+                on_details({"name": name, **details})
+
+        done = threading.Event()
+
+        def fetch(record):
+            with TELEMETRY.timer("hf_detail_fetch"):
+                details = self.fetch(kind, record["name"])
+            self.store.put(kind, record["name"], record_version(record), details)
+            # A fetch that timed out is still stored, but the caller has moved on
+            if on_details is not None and not done.is_set():
+                on_details({"name": record["name"], **details})
+            return details
+
+        jobs = {record["name"]: (lambda record=record: fetch(record)) for record in missing}
+        fetched = fan_out(jobs, concurrency=self.concurrency, timeout=self.timeout)
+        done.set()
+        TELEMETRY.count("hf_detail_fetches", len(fetched))
+        known.update(fetched)
+        return [{**record, **known[record["name"]]} if record["name"] in known else record
+                for record in records]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Print a HuggingFace listing with per-repo details as JSON")
+    parser.add_argument("kind", choices=sorted(INFO_METHODS), help="which listing to enrich")
+    parser.add_argument("--stream", action="store_true",
+                        help="write each repo's details as one NDJSON line as soon as they are known")
+    args = parser.parse_args()
+
+    load_env()
+    from hf_catalog import HfCatalog
+
+    write_lock = threading.Lock()
+
+    def write(details):
+        line = json.dumps(details)
+        with write_lock:
+            sys.stdout.write(line + "\n")
+            sys.stdout.flush()
+
+    try:
+        token = hf_token()
+        records = HfCatalog(None, token).get(args.kind, background=False)
+        enriched = HfDetails(None, token).enrich(args.kind, records, on_details=write if args.stream else None)
+        if not args.stream:
+            print(json.dumps(enriched))
+    except Exception as e:
+        print(f"Error: {type(e).__name__}: {e}", file=sys.stderr)
+        if not args.stream:
+            print("[]")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,407 @@
+#!/usr/bin/env python3
+"""Runs read from local wandb run directories, without the network.
+
+wandb writes every run to a directory on the training host before (or,
+in offline mode, instead of) syncing it:
+
+    wandb/run-20240501_120000-<id>/            offline-run-... in offline mode
+        run-<id>.wandb                         binary transaction log
+        files/wandb-summary.json               latest summary, rewritten as it changes
+        files/wandb-metadata.json              host, GPU names and count, start time
+        files/config.yaml                      config, {key: {"value": ...}}
+
+LocalRuns discovers these directories under WANDB_LOCAL_DIRS and keeps a
+LocalRun per directory. Each call only reads what changed: the JSON and
+YAML files are re-read when their size or mtime moved, and the .wandb log
+is tailed from the byte offset where the last complete record ended,
+through mmap. The log is a LevelDB-style record log (32 KiB blocks,
+records split FULL/FIRST/MIDDLE/LAST with a 7-byte header) of protobuf
+Records; history rows and summary updates keep the summary current to
+the last write, stats records give the GPU utilization and the exit
+record the final state. Decoding the protobufs needs the wandb package;
+without it only the files are read.
+
+LocalRun objects quack like the API's Run (id, name, state, summary,
+config, metadata, ...), so get_wandb_runs.RunCollector turns them into
+the same records as cloud runs and merges the two by run id. A run with
+no exit record is "running" while any of its files was written in the
+last WANDB_LOCAL_STALE seconds, "crashed" after that (or "finished" when
+the log could not be decoded and there is no way to tell).
+
+    python scripts/local_runs.py ~/train/wandb     # records of the local runs as JSON
+"""
+
+import os
+import re
+import json
+import mmap
+import time
+import zlib
+import struct
+import argparse
+import threading
+
+from run_filters import parse_time
+from telemetry import TELEMETRY, get_logger
+
+log = get_logger("local_runs")
+
+# A run without an exit record counts as running while it wrote a file this recently (seconds)
+LOCAL_STALE = float(os.environ.get("WANDB_LOCAL_STALE", "120"))
+
+# Log framing, see wandb/sdk/internal/datastore.py
+LOG_IDENT = b":W&B"
+LOG_HEADER = struct.Struct("<4sHB")  # ident, magic, version
+RECORD_HEADER = struct.Struct("<IHB")  # crc32, length, type
+BLOCK_SIZE = 32768
+FULL, FIRST, MIDDLE, LAST = 1, 2, 3, 4
+# crc32 of each record type byte, the seed of that record's checksum
+TYPE_CRC = {kind: zlib.crc32(bytes([kind])) & 0xFFFFFFFF for kind in (FULL, FIRST, MIDDLE, LAST)}
+
+RUN_DIR = re.compile(r"^(?:offline-)?run-(\d{8}_\d{6})-([0-9a-zA-Z]+)$")
+
+# protobuf Record class once imported, False if wandb is not installed
+_record_class = None
+
+
+def local_dirs():
+    """Directories from WANDB_LOCAL_DIRS (os.pathsep separated)"""
+    return [path for path in os.environ.get("WANDB_LOCAL_DIRS", "").split(os.pathsep) if path.strip()]
+
+
+def record_class():
+    global _record_class
+    if _record_class is None:
+        try:
+            from wandb.proto.wandb_internal_pb2 import Record
+            _record_class = Record
+        except ImportError:
+            log.warning("wandb is not installed, local .wandb logs are skipped")
+            _record_class = False
+    return _record_class
+
+
+def find_run_dirs(root):
+    """{run id: path} of the run directories in root, root/wandb or root itself"""
+    found = {}
+    candidates = [root, os.path.join(root, "wandb")]
+    for directory in candidates:
+        try:
+            entries = list(os.scandir(directory))
+        except OSError:
+            continue
+        for entry in entries:
+            match = RUN_DIR.match(entry.name)
+            if match and entry.is_dir():
+                found[match.group(2)] = entry.path
+    match = RUN_DIR.match(os.path.basename(os.path.normpath(root)))
+    if match:
+        found[match.group(2)] = root
+    return found
+
+
+def read_log(data, offset, end):
+    """Complete records in data[offset:end] and the offset after the last one.
+
+    offset must be where a record starts. A record cut short, or whose
+    checksum is off with nothing written after it, is left for the next
+    read: the writer is most likely still busy with it. A corrupt chunk
+    with data after it is skipped, along with the record it belongs to.
+    """
+    records, parts = [], []
+    position = committed = offset
+    while True:
+        left = BLOCK_SIZE - position % BLOCK_SIZE
+        if left < RECORD_HEADER.size:
+            # Block trailer, zero padded
+            position += left
+            continue
+        if position + RECORD_HEADER.size > end:
+            break
+        checksum, length, kind = RECORD_HEADER.unpack_from(data, position)
+        start = position + RECORD_HEADER.size
+        if kind not in TYPE_CRC or start + length > end:
+            break
+        chunk = data[start:start + length]
+        if zlib.crc32(chunk, TYPE_CRC[kind]) & 0xFFFFFFFF != checksum:
+            if start + length == end:
+                break
+            TELEMETRY.count("local_log_bad_checksums")
+            # The rest of a fragmented record is then ignored until the next FIRST
+            position = committed = start + length
+            parts = []
+            continue
+        position = start + length
+        if kind == FULL:
+            records.append(chunk)
+            parts = []
+            committed = position
+        elif kind == FIRST:
+            parts = [chunk]
+        elif parts:
+            parts.append(chunk)
+            if kind == LAST:
+                records.append(b"".join(parts))
+                parts = []
+                committed = position
+    return records, committed
+
+
+def item_key(item):
+    return ".".join(item.nested_key) if item.nested_key else item.key
+
+
+def item_value(item):
+    try:
+        return json.loads(item.value_json)
+    except ValueError:
+        return item.value_json
+
+
+def file_signature(path):
+    """(size, mtime_ns) of a file, None if it does not exist"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+
+def load_config_yaml(path):
+    """config.yaml as a flat {key: value} dict, {} without PyYAML"""
+    try:
+        import yaml
+    except ImportError:
+        return {}
+    with open(path) as f:
+        config = yaml.safe_load(f) or {}
+    return {key: value.get("value") if isinstance(value, dict) and "value" in value else value
+            for key, value in config.items() if key != "wandb_version"}
+
+
+class LocalRun:
+    """One run directory, read incrementally; attributes mirror wandb's Run"""
+
+    def __init__(self, path, run_id, default_entity="local", default_project="local"):
+        self.path = path
+        self.id = run_id
+        self.entity = default_entity
+        self.project = default_project
+        self.name = run_id
+        self.tags = []
+        self.user = None
+        self.summary = {}
+        self.config = {}
+        self.metadata = None
+        self.created_at = None
+        self.heartbeat_at = None
+        self.exit_code = None
+        self.gpu_sample = None  # latest GPU utilization from the log's stats records
+        self.decoded = False  # whether the .wandb log could be read
+        self.log_path = None
+        self.log_offset = 0
+        self.file_summary = {}
+        self.log_summary = {}
+        self.signatures = {}  # file name -> (size, mtime_ns) last read
+        self.last_write = 0.0
+        started = RUN_DIR.match(os.path.basename(path))
+        if started:
+            try:
+                stamp = time.mktime(time.strptime(started.group(1), "%Y%m%d_%H%M%S"))
+                self.created_at = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(stamp))
+            except ValueError:
+                pass
+
+    @property
+    def state(self):
+        if self.exit_code is not None:
+            return "finished" if self.exit_code == 0 else "failed"
+        if time.time() - self.last_write < LOCAL_STALE:
+            return "running"
+        return "crashed" if self.decoded else "finished"
+
+    @property
+    def definite(self):
+        """Whether this run's state is known from the files rather than guessed"""
+        return self.exit_code is not None or self.state == "running"
+
+    def changed(self, name):
+        """Signature of files/<name> if it changed since it was last read, else None"""
+        signature = file_signature(os.path.join(self.path, "files", name))
+        if signature is None or signature == self.signatures.get(name):
+            return None
+        return signature
+
+    def refresh(self):
+        """Read whatever changed on disk since the last call"""
+        files = os.path.join(self.path, "files")
+        signature = self.changed("wandb-metadata.json")
+        if signature is not None:
+            try:
+                with open(os.path.join(files, "wandb-metadata.json")) as f:
+                    self.metadata = json.load(f)
+                self.signatures["wandb-metadata.json"] = signature
+                self.user = self.metadata.get("username") or self.user
+                if self.metadata.get("startedAt"):
+                    self.created_at = parse_time(self.metadata["startedAt"])
+            except (OSError, ValueError) as e:
+                # Half written, read again next time
+                log.debug("Skipping %s/wandb-metadata.json: %s", self.path, e)
+        signature = self.changed("config.yaml")
+        if signature is not None:
+            try:
+                self.config = {**self.config, **load_config_yaml(os.path.join(files, "config.yaml"))}
+                self.signatures["config.yaml"] = signature
+            except Exception as e:
+                log.debug("Skipping %s/config.yaml: %s", self.path, e)
+        signature = self.changed("wandb-summary.json")
+        if signature is not None:
+            try:
+                with open(os.path.join(files, "wandb-summary.json")) as f:
+                    self.file_summary = json.load(f)
+                self.signatures["wandb-summary.json"] = signature
+            except (OSError, ValueError) as e:
+                log.debug("Skipping %s/wandb-summary.json: %s", self.path, e)
+        self.tail_log()
+        # The log is written first, the summary file from it
+        self.summary = {**self.file_summary, **self.log_summary}
+        self.last_write = max([signature[1] / 1e9 for signature in self.signatures.values()] + [self.last_write])
+        if self.last_write:
+            self.heartbeat_at = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(self.last_write))
+
+    def tail_log(self):
+        """Apply the .wandb records appended since the last call"""
+        if self.log_path is None:
+            names = [name for name in os.listdir(self.path) if name.endswith(".wandb")]
+            if not names:
+                return
+            self.log_path = os.path.join(self.path, names[0])
+        try:
+            with open(self.log_path, "rb") as f:
+                stat = os.fstat(f.fileno())
+                self.signatures[".wandb"] = (stat.st_size, stat.st_mtime_ns)
+                Record = record_class()
+                if not Record:
+                    return
+                if stat.st_size < self.log_offset or stat.st_size <= LOG_HEADER.size:
+                    # Rewritten, or nothing but a header yet
+                    self.log_offset = 0
+                if stat.st_size <= max(self.log_offset, LOG_HEADER.size):
+                    return
+                with mmap.mmap(f.fileno(), stat.st_size, access=mmap.ACCESS_READ) as data:
+                    if self.log_offset == 0:
+                        if data[:len(LOG_IDENT)] != LOG_IDENT:
+                            log.warning("%s is not a wandb log", self.log_path)
+                            return
+                        self.log_offset = LOG_HEADER.size
+                    chunks, self.log_offset = read_log(data, self.log_offset, stat.st_size)
+        except OSError as e:
+            log.debug("Cannot read %s: %s", self.log_path, e)
+            return
+        self.decoded = True
+        TELEMETRY.count("local_log_records", len(chunks))
+        for chunk in chunks:
+            record = Record()
+            try:
+                record.ParseFromString(chunk)
+            except Exception:
+                TELEMETRY.count("local_log_bad_records")
+                continue
+            self.apply(record)
+
+    def apply(self, record):
+        """Fold one protobuf Record into the run's state"""
+        kind = record.WhichOneof("record_type")
+        if kind == "history":
+            has_step = False
+            for item in record.history.item:
+                key = item_key(item)
+                self.log_summary[key] = item_value(item)
+                has_step = has_step or key == "_step"
+            # Rows whose items carry no _step still advance it through step.num
+            if record.history.HasField("step") and not has_step:
+                self.log_summary["_step"] = record.history.step.num
+        elif kind == "summary":
+            for item in record.summary.update:
+                self.log_summary[item_key(item)] = item_value(item)
+            for item in record.summary.remove:
+                self.log_summary.pop(item_key(item), None)
+                self.file_summary.pop(item_key(item), None)
+        elif kind == "config":
+            for item in record.config.update:
+                self.config[item_key(item)] = item_value(item)
+        elif kind == "stats":
+            for item in record.stats.item:
+                if item.key in ("gpu.0.gpu", "gpu.0.utilization"):
+                    self.gpu_sample = item_value(item)
+        elif kind == "run":
+            run = record.run
+            self.entity = run.entity or self.entity
+            self.project = run.project or self.project
+            self.name = run.display_name or self.name
+            self.tags = list(run.tags) or self.tags
+            if run.HasField("start_time"):
+                self.created_at = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(run.start_time.seconds))
+            for item in run.config.update:
+                self.config[item_key(item)] = item_value(item)
+        elif kind == "exit":
+            self.exit_code = record.exit.exit_code
+
+
+class LocalRuns:
+    """The run directories under some roots, rescanned and re-read incrementally on every call"""
+
+    def __init__(self, roots=None):
+        self.roots = local_dirs() if roots is None else list(roots)
+        self.lock = threading.Lock()
+        self.runs = {}  # path -> LocalRun
+        self.default_entity = os.environ.get("WANDB_ENTITY") or "local"
+        self.default_project = os.environ.get("WANDB_PROJECT") or "local"
+
+    def __bool__(self):
+        return bool(self.roots)
+
+    def get_runs(self, project_filter=""):
+        """Current LocalRun objects, those of one entity/project if given"""
+        with self.lock, TELEMETRY.timer("local_runs"):
+            found = {}
+            for root in self.roots:
+                for run_id, path in find_run_dirs(os.path.expanduser(root)).items():
+                    found[path] = run_id
+            for path in set(self.runs) - set(found):
+                del self.runs[path]
+            for path, run_id in found.items():
+                run = self.runs.get(path)
+                if run is None:
+                    run = self.runs[path] = LocalRun(path, run_id, self.default_entity, self.default_project)
+                try:
+                    run.refresh()
+                except Exception as e:
+                    TELEMETRY.count("local_run_errors")
+                    log.warning("Error reading %s: %s: %s", path, type(e).__name__, e)
+            runs = list(self.runs.values())
+        # A resumed run can have several directories, the newest one wins
+        latest = {}
+        for run in sorted(runs, key=lambda run: run.path):
+            if not project_filter or f"{run.entity}/{run.project}" == project_filter:
+                latest[run.id] = run
+        return list(latest.values())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Print the runs of local wandb directories as JSON")
+    parser.add_argument("dirs", nargs="*", help="directories holding wandb run directories (default: WANDB_LOCAL_DIRS)")
+    parser.add_argument("--project", default="", help="only runs of this entity/project")
+    args = parser.parse_args()
+
+    from entrypoint import load_env
+    import get_wandb_runs
+
+    load_env()
+    local_runs = LocalRuns(args.dirs or None)
+    collector = get_wandb_runs.RunCollector(None, local_runs=local_runs)
+    print(json.dumps(collector.get_runs(args.project)))
+
+
+if __name__ == "__main__":
+    main()
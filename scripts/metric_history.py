@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""Downsampled metric history for sparklines.
+
+Each run's scalar history is pulled once with run.scan_history and then
+extended from the last stored step, so a refresh only transfers new rows.
+Series are kept on disk as flat, append-only NumPy arrays (int64 steps,
+float32 values) per run and metric under .cache/history/, and read back
+through np.memmap. Requests get a downsampled series of at most `points`
+points, chosen with LTTB (largest triangle three buckets) or min/max
+bucketing.
+
+    python scripts/metric_history.py entity/project/run_id loss --points 200
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+from urllib.parse import quote
+
+import numpy as np
+
+from entrypoint import wandb_api
+from run_store import default_cache_dir
+
+# Do not rescan a run's history more often than this (seconds)
+HISTORY_SYNC_INTERVAL = float(os.environ.get("HISTORY_SYNC_INTERVAL", "30"))
+
+# History rows buffered in Python before they are written out
+APPEND_CHUNK = 100000
+
+STEP_DTYPE = np.int64
+VALUE_DTYPE = np.float32
+
+
+def lttb(x, y, n_out):
+    """Indices of the n_out points picked by largest-triangle-three-buckets"""
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    x = x.astype(np.float64, copy=False)
+    y = y.astype(np.float64, copy=False)
+    # n_out - 2 buckets over the points between the fixed first and last
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    counts = np.diff(edges)
+    mean_x = np.add.reduceat(x[:n - 1], edges[:-1]) / counts
+    mean_y = np.add.reduceat(y[:n - 1], edges[:-1]) / counts
+    # The bucket after the last one is just the final point
+    mean_x = np.append(mean_x[1:], x[-1])
+    mean_y = np.append(mean_y[1:], y[-1])
+
+    picked = np.empty(n_out, dtype=np.int64)
+    picked[0], picked[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        bx, by = x[start:end], y[start:end]
+        area = np.abs((x[a] - mean_x[i]) * (by - y[a]) - (x[a] - bx) * (mean_y[i] - y[a]))
+        a = start + int(np.argmax(area))
+        picked[i + 1] = a
+    return picked
+
+
+def minmax(x, y, n_out):
+    """Indices of the min and max point of n_out // 2 equal-size buckets"""
+    n = len(x)
+    if n <= n_out or n < 2:
+        return np.arange(n)
+
+    size = -(-n // max(1, n_out // 2))
+    buckets = -(-n // size)
+    # Pad the tail so every bucket is a full row, padding never wins
+    low = np.full(buckets * size, np.inf)
+    low[:n] = y
+    high = np.full(buckets * size, -np.inf)
+    high[:n] = y
+    offsets = np.arange(buckets) * size
+    mins = offsets + low.reshape(buckets, size).argmin(axis=1)
+    maxs = offsets + high.reshape(buckets, size).argmax(axis=1)
+    return np.unique(np.concatenate([mins, maxs, [0, n - 1]]))
+
+
+DOWNSAMPLERS = {"lttb": lttb, "minmax": minmax}
+
+
+def downsample(x, y, points, method="lttb"):
+    """Downsample a series to about `points` points, dropping NaN/inf values"""
+    finite = np.isfinite(y)
+    if not finite.all():
+        x, y = x[finite], y[finite]
+    if method not in DOWNSAMPLERS:
+        raise ValueError(f"Unknown downsampling method: {method}")
+    picked = DOWNSAMPLERS[method](x, y, points)
+    return x[picked], y[picked]
+
+
+class HistoryStore:
+    """Append-only on-disk arrays of (step, value) per run and metric.
+
+    Layout: <root>/<entity>/<project>/<run_id>/
+        state.json          {"lastStep": ..., "syncedAt": ..., "keys": [...]}
+        <key>.steps         int64 steps, raw
+        <key>.values        float32 values, raw
+    Metric keys are percent-encoded so "train/loss" stays one file name.
+    state.json is rewritten after every chunk; "writing": true in it means
+    a chunk may be on disk past lastStep, and the next append trims it.
+    """
+
+    def __init__(self, root=None):
+        self.root = root or os.path.join(default_cache_dir(), "history")
+
+    def run_dir(self, run_key):
+        return os.path.join(self.root, *(quote(part, safe="") for part in run_key.split("/")))
+
+    def get_state(self, run_key):
+        path = os.path.join(self.run_dir(run_key), "state.json")
+        if not os.path.exists(path):
+            return {"lastStep": None, "syncedAt": 0, "keys": []}
+        with open(path) as f:
+            return json.load(f)
+
+    def save_state(self, run_dir, state):
+        tmp = os.path.join(run_dir, "state.json.tmp")
+        with open(tmp, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp, os.path.join(run_dir, "state.json"))
+
+    def trim(self, run_dir, last_step):
+        """Cut every column back to the rows at or before last_step.
+
+        Undoes a chunk that was being written when the process died,
+        before state.json recorded it.
+        """
+        for name in os.listdir(run_dir):
+            if not name.endswith(".steps"):
+                continue
+            base = os.path.join(run_dir, name[:-len(".steps")])
+            steps = np.fromfile(base + ".steps", dtype=STEP_DTYPE)
+            n = int(np.searchsorted(steps, last_step, side="right")) if last_step is not None else 0
+            for path, dtype in ((base + ".steps", STEP_DTYPE), (base + ".values", VALUE_DTYPE)):
+                if os.path.exists(path) and os.path.getsize(path) > n * np.dtype(dtype).itemsize:
+                    os.truncate(path, n * np.dtype(dtype).itemsize)
+
+    def append(self, run_key, rows, synced_at=None):
+        """Append history rows (dicts with _step) and advance the stored state.
+
+        Rows are written in chunks, so a first pull of millions of steps
+        never holds more than APPEND_CHUNK rows in Python objects. The
+        state is saved after every chunk, so if `rows` fails partway the
+        chunks already written count as stored and are not appended again.
+        Callers serialize appends to the same run (HistoryService.run_lock).
+        """
+        run_dir = self.run_dir(run_key)
+        os.makedirs(run_dir, exist_ok=True)
+        state = self.get_state(run_key)
+        if state.get("writing"):
+            self.trim(run_dir, state["lastStep"])
+        keys = set(state["keys"])
+        columns = {}
+        last_step = state["lastStep"]
+
+        def flush():
+            # "writing" marks the columns as possibly ahead of lastStep until the chunk is recorded
+            self.save_state(run_dir, dict(state, writing=True))
+            for key, (steps, values) in columns.items():
+                name = quote(key, safe="")
+                with open(os.path.join(run_dir, name + ".steps"), "ab") as f:
+                    np.asarray(steps, dtype=STEP_DTYPE).tofile(f)
+                with open(os.path.join(run_dir, name + ".values"), "ab") as f:
+                    np.asarray(values, dtype=VALUE_DTYPE).tofile(f)
+            keys.update(columns)
+            columns.clear()
+            state["lastStep"] = last_step
+            state["keys"] = sorted(keys)
+            state.pop("writing", None)
+            self.save_state(run_dir, state)
+
+        pending = 0
+        # Rows at or before the stored step are already on disk
+        start = state["lastStep"]
+        for row in rows:
+            step = row.get("_step")
+            if step is None or (start is not None and step <= start):
+                continue
+            for key, value in row.items():
+                if key.startswith("_") and key != "_runtime":
+                    continue
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                steps, values = columns.setdefault(key, ([], []))
+                steps.append(step)
+                values.append(value)
+            if last_step is None or step > last_step:
+                last_step = step
+            pending += 1
+            if pending >= APPEND_CHUNK:
+                flush()
+                pending = 0
+        if pending:
+            flush()
+
+        state["syncedAt"] = synced_at if synced_at is not None else time.time()
+        self.save_state(run_dir, state)
+        return state
+
+    def load(self, run_key, key):
+        """Memory-mapped (steps, values) of one metric, empty if unknown"""
+        base = os.path.join(self.run_dir(run_key), quote(key, safe=""))
+        if not os.path.exists(base + ".steps") or os.path.getsize(base + ".steps") == 0:
+            return np.empty(0, STEP_DTYPE), np.empty(0, VALUE_DTYPE)
+        steps = np.memmap(base + ".steps", dtype=STEP_DTYPE, mode="r")
+        values = np.memmap(base + ".values", dtype=VALUE_DTYPE, mode="r")
+        # A crash between the two writes can leave one file longer
+        n = min(len(steps), len(values))
+        return steps[:n], values[:n]
+
+
+class HistoryService:
+    """Keeps run histories in a HistoryStore and serves downsampled series"""
+
+    def __init__(self, api_factory, store=None, sync_interval=HISTORY_SYNC_INTERVAL, page_size=1000):
+        self.api_factory = api_factory
+        self.store = store or HistoryStore()
+        self.sync_interval = sync_interval
+        self.page_size = page_size
+        self.locks = {}  # run key -> lock held while the run syncs
+        self.locks_lock = threading.Lock()
+
+    def run_lock(self, run_key):
+        with self.locks_lock:
+            return self.locks.setdefault(run_key, threading.Lock())
+
+    def sync(self, run_key, force=False):
+        """Fetch history rows logged since the last stored step.
+
+        One sync per run at a time: concurrent callers wait for it and
+        then use its result instead of scanning the same rows again.
+        """
+        state = self.store.get_state(run_key)
+        if not force and time.time() - state["syncedAt"] < self.sync_interval:
+            return state
+        requested = time.time()
+        with self.run_lock(run_key):
+            state = self.store.get_state(run_key)
+            if state["syncedAt"] >= requested:
+                # Synced by another caller while we waited
+                return state
+            if not force and time.time() - state["syncedAt"] < self.sync_interval:
+                return state
+            run = self.api_factory().run(run_key)
+            min_step = state["lastStep"] + 1 if state["lastStep"] is not None else None
+            rows = run.scan_history(min_step=min_step, page_size=self.page_size)
+            return self.store.append(run_key, rows)
+
+    def series(self, run_key, key, points=200, method="lttb", sync=True):
+        """Downsampled {"key", "steps", "values", "total"} for one metric"""
+        if sync:
+            self.sync(run_key)
+        steps, values = self.store.load(run_key, key)
+        x, y = downsample(steps, values, points, method)
+        return {
+            "key": key,
+            "steps": x.tolist(),
+            "values": [round(float(v), 6) for v in y],
+            "total": int(len(steps)),
+        }
+
+    def keys(self, run_key):
+        return self.store.get_state(run_key)["keys"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Print a downsampled metric series as JSON")
+    parser.add_argument("run", help="entity/project/run_id")
+    parser.add_argument("key", help="metric key, e.g. loss")
+    parser.add_argument("--points", type=int, default=200)
+    parser.add_argument("--method", choices=sorted(DOWNSAMPLERS), default="lttb")
+    args = parser.parse_args()
+
+    try:
+        service = HistoryService(wandb_api)
+        print(json.dumps(service.series(args.run, args.key, args.points, args.method)))
+    except Exception as e:
+        print(f"Error: {type(e).__name__}: {e}", file=sys.stderr)
+        print(json.dumps({"key": args.key, "steps": [], "values": [], "total": 0}))
+
+
+if __name__ == "__main__":
+    main()
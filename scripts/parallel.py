@@ -0,0 +1,147 @@
+import time
+import queue
+import threading
+from collections import OrderedDict
+
+from telemetry import get_logger
+
+log = get_logger("parallel")
+
+
+def fan_out(jobs, concurrency=4, timeout=None, deadline=None, leftover=None):
+    """Run {key: callable} on at most `concurrency` threads at a time.
+
+    Returns {key: result} for the jobs that finished. A job that raises or
+    runs longer than `timeout` seconds is logged and left out, so one slow
+    or broken job never holds up or drops the others. Timed-out jobs keep
+    running on a daemon thread and their late result is discarded.
+
+    `deadline` (a time.monotonic() value) bounds the whole call: whatever
+    has not finished by then is left out the same way. Jobs not started
+    yet are passed to `leftover` as [(key, callable)], if given, so the
+    caller can run them in the background; otherwise they are dropped.
+    """
+    results = {}
+    done = queue.Queue()
+    pending = list(jobs.items())
+    running = {}  # key -> start time
+
+    def run(key, fn):
+        try:
+            done.put((key, fn(), None))
+        except Exception as e:
+            done.put((key, None, e))
+
+    while pending or running:
+        if deadline is not None and time.monotonic() >= deadline:
+            log.info("Deadline reached, %d jobs unfinished", len(running) + len(pending))
+            if pending and leftover is not None:
+                leftover(pending)
+            break
+        while pending and len(running) < max(1, concurrency):
+            key, fn = pending.pop(0)
+            running[key] = time.monotonic()
+            threading.Thread(target=run, args=(key, fn), daemon=True).start()
+
+        wait = None
+        if timeout is not None:
+            wait = max(0, min(running.values()) + timeout - time.monotonic())
+        if deadline is not None:
+            left = max(0, deadline - time.monotonic())
+            wait = left if wait is None else min(wait, left)
+        try:
+            key, result, error = done.get(timeout=wait)
+        except queue.Empty:
+            now = time.monotonic()
+            for key, started in list(running.items()):
+                if timeout is not None and now - started >= timeout:
+                    del running[key]
+                    log.warning("Timed out after %ss: %s", timeout, key)
+            continue
+
+        if key not in running:
+            # Finished after we gave up on it
+            continue
+        del running[key]
+        if error is not None:
+            log.warning("Error in %s: %s: %s", key, type(error).__name__, error)
+        else:
+            results[key] = result
+
+    return results
+
+
+class SharedJob:
+    """One run of a SharedJobs job; `progress` takes partial results as the job makes them"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.progress = []
+        self.result = None
+        self.error = None
+
+
+class SharedJobs:
+    """At most one running job per key, shared by everyone asking for it.
+
+    run(key, fn) calls fn(job) in the calling thread, or, while a job for
+    the key is already running, waits for that one and returns its
+    result. So a job abandoned by one caller (e.g. at a fan_out deadline)
+    keeps running, and the next caller picks it up instead of starting it
+    again. The result of the last completed job is kept per key, the
+    `keep` most recently finished keys at most.
+    """
+
+    def __init__(self, keep=256):
+        self.lock = threading.Lock()
+        self.running = {}  # key -> SharedJob
+        self.results = OrderedDict()  # key -> (time.monotonic() it finished, result) of the last job
+        self.keep = keep
+
+    def run(self, key, fn):
+        with self.lock:
+            job = self.running.get(key)
+            owner = job is None
+            if owner:
+                job = self.running[key] = SharedJob()
+        if owner:
+            try:
+                job.result = fn(job)
+                with self.lock:
+                    self.results[key] = (time.monotonic(), job.result)
+                    self.results.move_to_end(key)
+                    while len(self.results) > self.keep:
+                        self.results.popitem(last=False)
+            except Exception as e:
+                job.error = e
+            finally:
+                with self.lock:
+                    del self.running[key]
+                job.done.set()
+        else:
+            job.done.wait()
+        if job.error is not None:
+            raise job.error
+        return job.result
+
+    def progress(self, key):
+        """Partial results of the running job for key so far, [] if none is running"""
+        with self.lock:
+            job = self.running.get(key)
+        return list(job.progress) if job is not None else []
+
+    def last(self, key):
+        """Result of the last completed job for key, None if there is none"""
+        with self.lock:
+            entry = self.results.get(key)
+        return entry[1] if entry is not None else None
+
+    def finished_at(self, key):
+        """time.monotonic() when the last job for key finished, None if none has"""
+        with self.lock:
+            entry = self.results.get(key)
+        return entry[0] if entry is not None else None
+
+    def is_running(self, key):
+        with self.lock:
+            return key in self.running
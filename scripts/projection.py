@@ -0,0 +1,109 @@
+"""Field projection and JSON sanitizing for run records.
+
+A Projection trims records down to the fields a client asked for:
+`fields` picks top-level record keys, `metrics` picks keys of the
+record's metrics (the run summary). Both are comma-separated lists of
+shell-style globs, e.g. fields="id,name,state,eta*" and
+metrics="loss,train/*". The identity fields (id, entity, project) are
+always kept so records can still be told apart. Index-only fields (the
+run config) are stored for the search index but only returned when
+`fields` asks for them.
+
+json_safe() turns a summary value into something json.dumps accepts in a
+single pass over its type, instead of trial-serializing every value.
+"""
+
+import re
+import math
+import fnmatch
+import numbers
+from collections.abc import Mapping
+
+IDENTITY_FIELDS = ("id", "entity", "project")
+
+# Kept in stored records for scripts/search_index.py, left out of listings by default
+INDEX_FIELDS = ("config",)
+
+GLOB_CHARS = re.compile(r"[*?\[]")
+
+# Match results remembered per KeyFilter; summary keys repeat across runs
+MEMO_LIMIT = 100000
+
+
+def parse_patterns(spec):
+    """None stays None (keep everything); "a,b*" or a list gives a tuple of patterns"""
+    if spec is None:
+        return None
+    if isinstance(spec, str):
+        spec = spec.split(",")
+    return tuple(pattern.strip() for pattern in spec if pattern and pattern.strip())
+
+
+class KeyFilter:
+    """Callable telling whether a key matches any of a set of globs"""
+
+    def __init__(self, patterns):
+        self.patterns = tuple(patterns)
+        self.literal = {pattern for pattern in self.patterns if not GLOB_CHARS.search(pattern)}
+        globs = [pattern for pattern in self.patterns if pattern not in self.literal]
+        self.regex = re.compile("|".join(fnmatch.translate(glob) for glob in globs)) if globs else None
+        self.memo = {}
+
+    def __call__(self, key):
+        hit = self.memo.get(key)
+        if hit is None:
+            hit = key in self.literal or (self.regex is not None and self.regex.match(key) is not None)
+            if len(self.memo) < MEMO_LIMIT:
+                self.memo[key] = hit
+        return hit
+
+
+class Projection:
+    """Keeps the requested fields and metric keys of run records"""
+
+    def __init__(self, fields=None, metrics=None):
+        fields, metrics = parse_patterns(fields), parse_patterns(metrics)
+        self.fields = KeyFilter(fields) if fields is not None else None
+        self.metrics = KeyFilter(metrics) if metrics is not None else None
+
+    def apply(self, record):
+        """Projected copy of a record; the record itself is left untouched"""
+        if self.fields is not None:
+            record = {key: value for key, value in record.items()
+                      if key in IDENTITY_FIELDS or self.fields(key)}
+        elif any(key in record for key in INDEX_FIELDS):
+            record = {key: value for key, value in record.items() if key not in INDEX_FIELDS}
+        metrics = record.get("metrics")
+        if self.metrics is not None and isinstance(metrics, dict):
+            record = dict(record)
+            record["metrics"] = {key: value for key, value in metrics.items() if self.metrics(key)}
+        return record
+
+
+def projection(fields=None, metrics=None):
+    """A Projection; without fields or metrics it only drops INDEX_FIELDS"""
+    return Projection(fields, metrics)
+
+
+def json_safe(value):
+    """value as plain JSON types, anything else converted to a string.
+
+    NaN and infinities become strings too: json.dumps would write them as
+    bare NaN/Infinity, which JSON.parse in the browser rejects.
+    """
+    kind = type(value)
+    if kind is str or kind is int or kind is bool or value is None:
+        return value
+    if kind is float:
+        return value if math.isfinite(value) else str(value)
+    if kind is dict or isinstance(value, Mapping):
+        return {key if type(key) is str else str(key): json_safe(item) for key, item in value.items()}
+    if kind is list or kind is tuple:
+        return [json_safe(item) for item in value]
+    # numpy scalars and the like
+    if isinstance(value, numbers.Integral):
+        return int(value)
+    if isinstance(value, numbers.Real):
+        value = float(value)
+        return value if math.isfinite(value) else str(value)
+    return str(value)
@@ -0,0 +1,437 @@
+"""Adaptive refresh scheduler for the worker's wandb and HuggingFace caches.
+
+Rather than every dashboard poll fetching from wandb and the Hub, the
+worker refreshes its stores in the background and serves polls from them.
+Each refresh task (the wandb project list, one project's incremental sync,
+one HF listing) sits in a priority queue ordered by when it is next due.
+How soon that is follows what the previous refresh saw:
+
+    running run whose step moved     REFRESH_ACTIVE seconds
+    running run that did not move    doubling from there up to REFRESH_STALLED_MAX
+    finished / crashed / failed run  REFRESH_FINISHED (hours)
+    project or listing, no changes   REFRESH_IDLE, doubling up to REFRESH_IDLE_MAX
+
+A project is due as soon as its most urgent run is. All tasks draw on one
+request budget of REFRESH_BUDGET requests per minute (a token bucket); a
+task whose estimated cost does not fit waits for the bucket to refill.
+An HTTP 429 or 5xx from a service puts all of that service's tasks on
+hold with exponential backoff, or for as long as Retry-After asks; any
+other error only backs off the task that failed.
+"""
+
+import os
+import re
+import time
+import heapq
+import random
+import itertools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from run_store import FINISHED_STATES
+from telemetry import TELEMETRY, get_logger
+
+log = get_logger("refresh")
+
+# Refresh intervals in seconds, see the module docstring
+REFRESH_ACTIVE = float(os.environ.get("REFRESH_ACTIVE", "10"))
+REFRESH_STALLED_MAX = float(os.environ.get("REFRESH_STALLED_MAX", "300"))
+REFRESH_FINISHED = float(os.environ.get("REFRESH_FINISHED", str(6 * 3600)))
+REFRESH_IDLE = float(os.environ.get("REFRESH_IDLE", "120"))
+REFRESH_IDLE_MAX = float(os.environ.get("REFRESH_IDLE_MAX", "3600"))
+
+# How often the list of wandb projects is fetched again (seconds)
+REFRESH_PROJECTS = float(os.environ.get("REFRESH_PROJECTS", "600"))
+
+# Requests per minute shared by every refresh task
+REFRESH_BUDGET = float(os.environ.get("REFRESH_BUDGET", "120"))
+
+# Tasks refreshing at once
+REFRESH_CONCURRENCY = int(os.environ.get("REFRESH_CONCURRENCY", "2"))
+
+# Backoff after errors: BACKOFF_BASE doubling per consecutive failure, at most BACKOFF_MAX (seconds)
+BACKOFF_BASE = float(os.environ.get("REFRESH_BACKOFF_BASE", "5"))
+BACKOFF_MAX = float(os.environ.get("REFRESH_BACKOFF_MAX", "900"))
+
+# Runs per wandb API page, for estimating what a sync cost
+WANDB_PAGE = 50
+
+# "HTTP 429", "status code 503", ... in messages of errors that carry no response
+STATUS_IN_MESSAGE = re.compile(r"\b(?:HTTP|status(?: code)?)\D{0,3}(429|5\d\d)\b", re.IGNORECASE)
+
+
+def http_status(error):
+    """HTTP status behind an exception from wandb, huggingface_hub or requests, None if unknown"""
+    seen = set()
+    current = error
+    while current is not None and id(current) not in seen:
+        seen.add(id(current))
+        for holder in (current, getattr(current, "response", None)):
+            status = getattr(holder, "status_code", None)
+            if isinstance(status, int):
+                return status
+        # wandb's CommError keeps the underlying requests error in .exc
+        inner = getattr(current, "exc", None)
+        current = inner if isinstance(inner, BaseException) else (current.__cause__ or current.__context__)
+    match = STATUS_IN_MESSAGE.search(str(error))
+    return int(match.group(1)) if match else None
+
+
+def retry_after(error):
+    """Seconds from a Retry-After header on the error's response, None if absent"""
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return None
+
+
+def is_throttled(status):
+    """True for answers that mean "slow down": 429 and server errors"""
+    return status is not None and (status == 429 or 500 <= status < 600)
+
+
+def backoff_delay(failures, base=BACKOFF_BASE, cap=BACKOFF_MAX):
+    """Exponential delay for the n-th consecutive failure, jittered to 50-100%"""
+    delay = min(cap, base * 2 ** max(0, failures - 1))
+    return delay * random.uniform(0.5, 1.0)
+
+
+def run_interval(state, moved, previous=None):
+    """Refresh interval of one run from its state and whether it changed since the last look"""
+    if state in FINISHED_STATES:
+        return REFRESH_FINISHED
+    if state == "running":
+        if moved or previous is None:
+            return REFRESH_ACTIVE
+        return min(REFRESH_STALLED_MAX, max(REFRESH_ACTIVE, previous * 2))
+    return REFRESH_IDLE
+
+
+def idle_interval(changed, previous=None):
+    """Interval of a project or listing: REFRESH_IDLE after a change, doubling while nothing changes"""
+    if changed or previous is None:
+        return REFRESH_IDLE
+    return min(REFRESH_IDLE_MAX, previous * 2)
+
+
+class RequestBudget:
+    """Token bucket of `per_minute` requests, holding at most a minute's worth"""
+
+    def __init__(self, per_minute=REFRESH_BUDGET, clock=time.monotonic):
+        self.capacity = max(1.0, per_minute)
+        self.rate = self.capacity / 60
+        self.clock = clock
+        self.tokens = self.capacity
+        self.updated = clock()
+
+    def refill(self):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, cost):
+        """Seconds until `cost` requests fit, 0 if they do now"""
+        self.refill()
+        # A task costing more than the whole bucket runs once the bucket is full
+        missing = min(cost, self.capacity) - self.tokens
+        return max(0.0, missing / self.rate)
+
+    def spend(self, cost):
+        """Take `cost` tokens; a negative cost gives unused ones back. May go into debt."""
+        self.refill()
+        self.tokens = min(self.capacity, self.tokens - cost)
+
+
+class Task:
+    """A refresh callable returning (requests it made, seconds until it is due again)"""
+
+    def __init__(self, key, service, refresh):
+        self.key = key
+        self.service = service
+        self.refresh = refresh
+        self.due = 0.0
+        self.seq = None  # matches the task's live queue entry
+        self.cost = 1  # estimate for the next run, the last run's actual cost
+        self.interval = None
+        self.failures = 0
+        self.last_error = None
+        self.refreshed_at = None
+
+
+class RefreshScheduler:
+    """Runs Tasks when they are due, within the request budget and service backoff.
+
+    Tasks are kept in a heap of (due, seq, key). Rescheduling pushes a new
+    entry and leaves the old one behind; entries whose seq no longer
+    matches the task are skipped when they come up.
+    """
+
+    def __init__(self, budget=REFRESH_BUDGET, concurrency=REFRESH_CONCURRENCY, clock=time.monotonic):
+        self.clock = clock
+        self.lock = threading.Condition()
+        self.queue = []
+        self.counter = itertools.count()
+        self.tasks = {}
+        self.running = set()
+        self.holds = {}  # service -> [consecutive throttled answers, hold until]
+        self.budget = RequestBudget(budget, clock)
+        self.concurrency = max(1, concurrency)
+        self.pool = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="refresh")
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def schedule(self, task, due):
+        """Queue a task to run at `due`; call with the lock held"""
+        task.due = due
+        task.seq = next(self.counter)
+        heapq.heappush(self.queue, (due, task.seq, task.key))
+        self.lock.notify_all()
+
+    def add(self, key, service, refresh, delay=0.0):
+        """Add a task due in `delay` seconds; a key that is already scheduled is left alone"""
+        with self.lock:
+            if key in self.tasks:
+                return False
+            task = self.tasks[key] = Task(key, service, refresh)
+            self.schedule(task, self.clock() + delay)
+            return True
+
+    def remove(self, key):
+        with self.lock:
+            self.tasks.pop(key, None)
+
+    def due_in(self, prefix="", key=None):
+        """Seconds until the first task whose key starts with prefix is due, None if there is none.
+
+        With `key`, only that task counts.
+        """
+        with self.lock:
+            now = self.clock()
+            if key is not None:
+                dues = [self.tasks[key].due] if key in self.tasks else []
+            else:
+                dues = [task.due for task_key, task in self.tasks.items() if task_key.startswith(prefix)]
+            hold = max((until for _, until in self.holds.values()), default=0)
+        if not dues:
+            return None
+        return max(0.0, min(dues) - now, hold - now)
+
+    def next_ready(self):
+        """Pop the next task that may start now; wait until there is one. Call with the lock held."""
+        while not self.stop_event.is_set():
+            if not self.queue or len(self.running) >= self.concurrency:
+                self.lock.wait(1.0)
+                continue
+            due, seq, key = self.queue[0]
+            task = self.tasks.get(key)
+            if task is None or task.seq != seq:
+                heapq.heappop(self.queue)
+                continue
+            now = self.clock()
+            if due > now:
+                self.lock.wait(min(due - now, 1.0))
+                continue
+            heapq.heappop(self.queue)
+            hold = self.holds.get(task.service)
+            if hold is not None and hold[1] > now:
+                self.schedule(task, hold[1])
+                continue
+            wait = self.budget.wait_time(task.cost)
+            if wait > 0:
+                TELEMETRY.count("refresh_budget_waits")
+                self.schedule(task, now + wait)
+                continue
+            self.budget.spend(task.cost)
+            self.running.add(key)
+            return task
+        return None
+
+    def run_forever(self):
+        with self.lock:
+            while True:
+                task = self.next_ready()
+                if task is None:
+                    return
+                self.pool.submit(self.execute, task)
+
+    def execute(self, task):
+        error = None
+        cost, interval = task.cost, task.interval
+        try:
+            with TELEMETRY.timer(f"refresh_{task.service}"):
+                cost, interval = task.refresh()
+        except Exception as e:
+            error = e
+        with self.lock:
+            self.running.discard(task.key)
+            now = self.clock()
+            if self.tasks.get(task.key) is not task:
+                # Removed while it was running
+                self.lock.notify_all()
+                return
+            if error is None:
+                TELEMETRY.count("refreshes")
+                self.budget.spend(cost - task.cost)
+                task.cost, task.interval = max(1, cost), interval
+                task.failures, task.last_error, task.refreshed_at = 0, None, time.time()
+                self.holds.pop(task.service, None)
+                self.schedule(task, now + interval)
+                return
+            task.last_error = f"{type(error).__name__}: {error}"
+            status = http_status(error)
+            if is_throttled(status):
+                TELEMETRY.count(f"refresh_throttled_{task.service}")
+                hold = self.holds.setdefault(task.service, [0, 0.0])
+                hold[0] += 1
+                hold[1] = max(hold[1], now + max(retry_after(error) or 0, backoff_delay(hold[0])))
+                log.warning("%s answered %d, holding %s refreshes for %.0fs",
+                            task.service, status, task.service, hold[1] - now)
+                self.schedule(task, hold[1])
+            else:
+                TELEMETRY.count("refresh_errors")
+                task.failures += 1
+                delay = backoff_delay(task.failures)
+                log.warning("Refresh of %s failed (%s), retrying in %.0fs", task.key, task.last_error, delay)
+                self.schedule(task, now + delay)
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run_forever, name="refresh-scheduler", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+        with self.lock:
+            self.lock.notify_all()
+        self.pool.shutdown(wait=False)
+
+    def snapshot(self):
+        """Queue state for the worker's "scheduler" method"""
+        with self.lock:
+            now = self.clock()
+            self.budget.refill()
+            return {
+                "tasks": [{
+                    "key": task.key,
+                    "service": task.service,
+                    "dueIn": round(max(0.0, task.due - now), 3),
+                    "running": task.key in self.running,
+                    "interval": task.interval,
+                    "cost": task.cost,
+                    "failures": task.failures,
+                    "lastError": task.last_error,
+                    "refreshedAt": task.refreshed_at,
+                } for task in sorted(self.tasks.values(), key=lambda task: task.due)],
+                "holds": {service: {"throttled": count, "retryIn": round(max(0.0, until - now), 3)}
+                          for service, (count, until) in self.holds.items()},
+                "budget": {"perMinute": self.budget.capacity, "available": round(self.budget.tokens, 3)},
+            }
+
+
+class WandbRefresher:
+    """Keeps the RunStore of every wandb project fresh through a RefreshScheduler.
+
+    collector_factory returns a get_wandb_runs.RunCollector with a store;
+    api_factory returns a wandb.Api for the project listing. on_sync, if
+    given, is called with (project path, records) after every sync and
+    with (project path, []) when a project disappears.
+    """
+
+    def __init__(self, scheduler, collector_factory, api_factory, on_sync=None):
+        self.scheduler = scheduler
+        self.collector_factory = collector_factory
+        self.api_factory = api_factory
+        self.on_sync = on_sync
+        self.lock = threading.Lock()
+        self.projects = None  # [{"name", "entity"}] once listed
+        self.paces = {}  # project path -> {run id: ((state, progress), interval)}
+        self.idle = {}  # project path -> last idle interval
+
+    def start(self):
+        self.scheduler.add("wandb:projects", "wandb", self.refresh_projects)
+        return self
+
+    def task_key(self, project_path):
+        return f"wandb:{project_path}"
+
+    def track(self, project_path, delay=REFRESH_ACTIVE):
+        """Schedule a project that is not in the listing (yet), e.g. one a dashboard asked for"""
+        self.scheduler.add(self.task_key(project_path), "wandb",
+                           lambda: self.refresh_project(project_path), delay=delay)
+
+    def project_paths(self):
+        """Paths of the listed projects, None before the first listing"""
+        with self.lock:
+            if self.projects is None:
+                return None
+            return [f"{project['entity']}/{project['name']}" for project in self.projects]
+
+    def due_in(self, project_path=""):
+        """Seconds until the project (or any project) is refreshed next"""
+        # A prefix would also match sibling projects, e.g. e/proj2 for e/proj
+        if project_path:
+            return self.scheduler.due_in(key=self.task_key(project_path))
+        return self.scheduler.due_in("wandb:")
+
+    def refresh_projects(self):
+        projects = [{"name": project.name, "entity": project.entity} for project in self.api_factory().projects()]
+        paths = {f"{project['entity']}/{project['name']}" for project in projects}
+        previous = set(self.project_paths() or ())
+        with self.lock:
+            self.projects = projects
+        for path in paths - previous:
+            self.track(path, delay=0)
+        for path in previous - paths:
+            self.scheduler.remove(self.task_key(path))
+            with self.lock:
+                self.paces.pop(path, None)
+                self.idle.pop(path, None)
+            if self.on_sync is not None:
+                self.on_sync(path, [])
+        return 1, REFRESH_PROJECTS
+
+    def refresh_project(self, project_path):
+        """Incremental sync of one project; the next one is due when its most urgent run is"""
+        records = self.collector_factory().sync_project_runs(project_path)
+        if self.on_sync is not None:
+            self.on_sync(project_path, records)
+        with self.lock:
+            previous = self.paces.get(project_path, {})
+            paces, changed = {}, 0
+            for record in records:
+                fingerprint = (record.get("state"), record.get("progress"))
+                old = previous.get(record.get("id"))
+                moved = old is None or old[0] != fingerprint
+                changed += moved
+                paces[record.get("id")] = (fingerprint, run_interval(fingerprint[0], moved, old[1] if old else None))
+            changed += len(previous.keys() - paces.keys())
+            idle = idle_interval(changed, self.idle.get(project_path))
+            self.paces[project_path] = paces
+            self.idle[project_path] = idle
+        interval = min([idle] + [interval for _, interval in paces.values()])
+        return 1 + changed // WANDB_PAGE, interval
+
+
+class HfRefresher:
+    """Refreshes each listing of an hf_catalog.HfCatalog through a RefreshScheduler.
+    on_refresh, if given, is called with the kind after every refresh."""
+
+    def __init__(self, scheduler, catalog_factory, kinds, on_refresh=None):
+        self.scheduler = scheduler
+        self.catalog_factory = catalog_factory
+        self.kinds = tuple(kinds)
+        self.on_refresh = on_refresh
+        self.idle = {}  # kind -> last interval
+
+    def start(self):
+        for kind in self.kinds:
+            self.scheduler.add(f"hf:{kind}", "hf", lambda kind=kind: self.refresh(kind))
+        return self
+
+    def refresh(self, kind):
+        changed = self.catalog_factory().refresh(kind)
+        if self.on_refresh is not None:
+            self.on_refresh(kind)
+        self.idle[kind] = idle_interval(changed, self.idle.get(kind))
+        return 1, self.idle[kind]
@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+"""Cross-run aggregates and leaderboards over the processed run records.
+
+The records of every synced project are laid out as columns: a float64
+NumPy array per requested value (a summary metric, or one of the numeric
+record fields in RECORD_FIELDS) with NaN where a run does not have it,
+and per group field (project, entity, state, gpu) an array of integer
+codes into its sorted labels. Columns are built the first time a query
+asks for them and kept until the run set changes.
+
+A query groups the runs by any of GROUP_FIELDS and computes, per group,
+in a handful of vectorized passes over the rows sorted by (group, value):
+
+    count      runs in the group
+    present    runs that have the value
+    min, max, sum, mean, std
+    p<q>       percentile q (0-100) with linear interpolation, e.g. p50, p95
+
+and, with top=k, the k runs with the lowest (order=asc) or highest value
+in each group. Without a metric only the counts are computed, which is
+what "runs per state per GPU type" needs.
+
+Sources are synced like the search index: sync("entity/project",
+records) replaces one project's records. Any change bumps the version,
+which drops the columns and the cached results; an unchanged sync costs
+one comparison. Results carry the version, an opaque string usable as an
+ETag.
+
+    python scripts/run_aggregates.py --metric eval/loss --group project --agg min,p50 --top 3
+    python scripts/run_aggregates.py --group state,gpu                      # runs per state and GPU
+"""
+
+import os
+import re
+import sys
+import json
+import math
+import time
+import uuid
+import argparse
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from run_delta import record_key
+
+# Query results kept per run set version, least recently used dropped
+AGGREGATE_CACHE = int(os.environ.get("AGGREGATE_CACHE", "64"))
+
+GROUP_FIELDS = ("project", "entity", "state", "gpu")
+
+# Numeric record fields that can be aggregated like a summary metric
+RECORD_FIELDS = ("progress", "totalSteps", "throughput", "gpuUtilization")
+
+AGGREGATES = ("count", "present", "min", "max", "sum", "mean", "std")
+PERCENTILE = re.compile(r"p(\d+(?:\.\d+)?)$")
+
+# Label of runs whose group field is missing
+MISSING = "N/A"
+
+TOP_MAX = 100
+
+
+def numeric(value):
+    """float of a number or "87.5%" string, NaN for anything else"""
+    if isinstance(value, bool):
+        return float(value)
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str) and value.endswith("%"):
+        try:
+            return float(value[:-1])
+        except ValueError:
+            pass
+    return math.nan
+
+
+def parse_aggregates(names):
+    """Validated aggregate names, e.g. "min,p50" -> ["min", "p50"]"""
+    parsed = []
+    for name in names:
+        match = PERCENTILE.match(name)
+        if name not in AGGREGATES and not (match and float(match.group(1)) <= 100):
+            raise ValueError(f"unknown aggregate {name!r}, use {', '.join(AGGREGATES)} or p<0-100>")
+        parsed.append(name)
+    return parsed
+
+
+def finite(value):
+    """A JSON-safe float: NaN (empty group) becomes None"""
+    value = float(value)
+    return None if math.isnan(value) else value
+
+
+class RunTable:
+    """Columnar view of a fixed list of run records"""
+
+    def __init__(self, records):
+        self.records = records
+        self.columns = {}  # value name -> float64 array
+        self.groups = {}  # group field -> (labels, int64 codes)
+
+    def __len__(self):
+        return len(self.records)
+
+    def column(self, name):
+        values = self.columns.get(name)
+        if values is None:
+            if name in RECORD_FIELDS:
+                items = (numeric(record.get(name)) for record in self.records)
+            else:
+                items = (numeric((record.get("metrics") or {}).get(name)) for record in self.records)
+            values = self.columns[name] = np.fromiter(items, dtype=np.float64, count=len(self.records))
+        return values
+
+    def codes(self, field):
+        group = self.groups.get(field)
+        if group is None:
+            labels = np.array([str(record.get(field) or MISSING) for record in self.records], dtype=object)
+            if len(labels):
+                group = np.unique(labels, return_inverse=True)
+            else:
+                group = (labels, np.zeros(0, dtype=np.int64))
+            self.groups[field] = group
+        return group
+
+    def mask(self, field, values):
+        """Rows whose group field is one of `values`"""
+        labels, codes = self.codes(field)
+        return np.isin(codes, np.flatnonzero(np.isin(labels, list(values))))
+
+    def aggregate(self, metric=None, group_by=(), aggregates=("count",), top=0, ascending=True, where=None):
+        """Per-group aggregates of one value, see the module docstring.
+
+        `where` is {group field: [allowed labels]}. Groups are sorted by
+        their labels.
+        """
+        rows = np.arange(len(self.records))
+        for field, values in (where or {}).items():
+            rows = rows[self.mask(field, values)[rows]]
+
+        # One code per combination of group labels
+        group_labels = [self.codes(field)[0] for field in group_by]
+        if group_by:
+            combined = np.ravel_multi_index([self.codes(field)[1][rows] for field in group_by],
+                                            [max(len(labels), 1) for labels in group_labels])
+            keys, inverse = np.unique(combined, return_inverse=True)
+            inverse = inverse.reshape(-1)
+        else:
+            keys, inverse = np.zeros(1 if len(rows) else 0, dtype=np.int64), np.zeros(len(rows), dtype=np.int64)
+        counts = np.bincount(inverse, minlength=len(keys))
+
+        if metric is not None:
+            values = self.column(metric)[rows]
+            present = ~np.isnan(values)
+            # Rows by group, then value with NaN last; desc sorts on -value
+            order = np.lexsort((values if ascending else -values, inverse))
+            sorted_values = values[order]
+            starts = np.cumsum(counts) - counts
+            valid = np.bincount(inverse, weights=present, minlength=len(keys)).astype(np.int64)
+            filled = np.where(present, values, 0.0)
+            sums = np.bincount(inverse, weights=filled, minlength=len(keys))
+            squares = np.bincount(inverse, weights=filled * filled, minlength=len(keys))
+            with np.errstate(invalid="ignore", divide="ignore"):
+                means = sums / valid
+                variances = np.maximum(squares / valid - means * means, 0.0)
+            # The group's valid values in ascending order, wherever the sort put them
+            last = starts + np.maximum(valid - 1, 0)
+            lowest, highest = (starts, last) if ascending else (last, starts)
+
+        results = {}
+        for name in aggregates:
+            if name == "count":
+                results[name] = counts.astype(np.float64)
+            elif metric is None:
+                continue
+            elif name == "present":
+                results[name] = valid.astype(np.float64)
+            elif name == "sum":
+                results[name] = np.where(valid > 0, sums, np.nan)
+            elif name == "mean":
+                results[name] = means
+            elif name == "std":
+                results[name] = np.sqrt(variances)
+            else:
+                if name == "min":
+                    positions = lowest.astype(np.float64)
+                elif name == "max":
+                    positions = highest.astype(np.float64)
+                else:
+                    q = float(PERCENTILE.match(name).group(1)) / 100
+                    # Rank within the ascending valid values, mapped into the sort
+                    rank = q * np.maximum(valid - 1, 0)
+                    positions = starts + rank if ascending else last - rank
+                below = np.floor(positions).astype(np.int64)
+                above = np.ceil(positions).astype(np.int64)
+                if len(sorted_values):
+                    low = sorted_values[np.minimum(below, len(sorted_values) - 1)]
+                    high = sorted_values[np.minimum(above, len(sorted_values) - 1)]
+                    result = low + (high - low) * (positions - below)
+                else:
+                    result = np.zeros(len(keys))
+                results[name] = np.where(valid > 0, result, np.nan)
+
+        groups = []
+        unravelled = np.unravel_index(keys, [max(len(labels), 1) for labels in group_labels]) if group_by else ()
+        for i in range(len(keys)):
+            group = {"key": {field: group_labels[j][unravelled[j][i]] for j, field in enumerate(group_by)}}
+            for name, column in results.items():
+                group[name] = int(column[i]) if name in ("count", "present") else finite(column[i])
+            groups.append(group)
+
+        if metric is not None and top:
+            # Rank of each sorted row within its group, valid rows first
+            ranks = np.arange(len(order)) - starts[inverse[order]]
+            picked = order[(ranks < top) & present[order]]
+            for row in picked:
+                record = self.records[rows[row]]
+                groups[inverse[row]].setdefault("top", []).append({
+                    "key": record_key(record), "name": record.get("name"), "project": record.get("project"),
+                    "state": record.get("state"), "gpu": record.get("gpu"), "value": float(values[row])})
+            for group in groups:
+                group.setdefault("top", [])
+        return {"runs": int(len(rows)), "groups": groups}
+
+
+class RunAggregates:
+    """Run records by project with a cached RunTable and query results, see the module docstring"""
+
+    def __init__(self, cache_size=AGGREGATE_CACHE):
+        self.lock = threading.Lock()
+        self.sources = {}  # project path -> [record]
+        # Versions are "<epoch>.<number>" so they never repeat across restarts
+        self.epoch = uuid.uuid4().hex[:8]
+        self.version = 0
+        self.table = None
+        self.results = OrderedDict()
+        self.cache_size = cache_size
+        self.loaded_at = None  # when the owner last loaded every source
+
+    def sync(self, source, records):
+        """Replace the records of one project; True if anything changed"""
+        records = list(records)
+        with self.lock:
+            if self.sources.get(source, []) == records:
+                return False
+            if records:
+                self.sources[source] = records
+            else:
+                del self.sources[source]
+            self.version += 1
+            self.table = None
+            self.results.clear()
+        return True
+
+    def drop(self, source):
+        return self.sync(source, ())
+
+    def source_names(self):
+        with self.lock:
+            return list(self.sources)
+
+    def get_table(self):
+        with self.lock:
+            if self.table is None:
+                self.table = RunTable([record for records in self.sources.values() for record in records])
+            return self.table, self.version
+
+    def query(self, metric=None, group_by=(), aggregates=None, top=0, order="asc", where=None):
+        """{"version", "metric", "groupBy", "runs", "groups", "tookMs", "cached"}"""
+        start = time.perf_counter()
+        for field in list(group_by) + list(where or ()):
+            if field not in GROUP_FIELDS:
+                raise ValueError(f"cannot group or filter by {field!r}, use {', '.join(GROUP_FIELDS)}")
+        if order not in ("asc", "desc"):
+            raise ValueError(f"order must be asc or desc, not {order!r}")
+        default = ("count", "present", "min", "p50", "max") if metric else ("count",)
+        aggregates = parse_aggregates(aggregates or default)
+        top = max(0, min(int(top or 0), TOP_MAX))
+        key = (metric, tuple(group_by), tuple(aggregates), top, order,
+               tuple(sorted((field, tuple(values)) for field, values in (where or {}).items())))
+        table, version = self.get_table()
+        with self.lock:
+            result = self.results.get(key) if version == self.version else None
+            if result is not None:
+                self.results.move_to_end(key)
+        hit = result is not None
+        if not hit:
+            result = {"version": f"{self.epoch}.{version}", "metric": metric, "groupBy": list(group_by),
+                      **table.aggregate(metric, group_by, aggregates, top, order == "asc", where)}
+            with self.lock:
+                if version == self.version:
+                    self.results[key] = result
+                    while len(self.results) > self.cache_size:
+                        self.results.popitem(last=False)
+        return {**result, "tookMs": round((time.perf_counter() - start) * 1000, 3), "cached": hit}
+
+
+def split(value):
+    return [part.strip() for part in str(value or "").split(",") if part.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Aggregate the locally stored run records")
+    parser.add_argument("--metric", help="summary metric or one of: " + ", ".join(RECORD_FIELDS))
+    parser.add_argument("--group", help=f"comma-separated fields to group by, any of {', '.join(GROUP_FIELDS)}")
+    parser.add_argument("--agg", help="comma-separated aggregates, e.g. count,min,p50,p95")
+    parser.add_argument("--top", type=int, default=0, help="also list the best k runs per group")
+    parser.add_argument("--order", choices=("asc", "desc"), default="asc", help="asc: lowest value is best")
+    parser.add_argument("--state", help="only runs in these states")
+    parser.add_argument("--project", help="only these projects")
+    args = parser.parse_args()
+
+    from entrypoint import load_env
+    from run_store import RunStore
+
+    load_env()
+    aggregates = RunAggregates()
+    try:
+        store = RunStore()
+        for path in store.get_project_paths():
+            aggregates.sync(path, store.get_records(path))
+    except Exception as e:
+        print(f"Error loading the run store: {type(e).__name__}: {e}", file=sys.stderr)
+    where = {field: split(value) for field, value in (("state", args.state), ("project", args.project)) if value}
+    try:
+        result = aggregates.query(args.metric, split(args.group), split(args.agg), args.top, args.order, where)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(2)
+    print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    main()
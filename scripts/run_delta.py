@@ -0,0 +1,177 @@
+"""Versioned run snapshots and field-level deltas between them.
+
+A RunSnapshot holds the latest run records of one view (project filter
+plus projection) and a version that changes whenever any record does.
+For a client that already has version `since`, delta() returns what it
+needs to catch up:
+
+    {"version": "3f2a9c1e.42", "since": "3f2a9c1e.40",
+     "added":   [record, ...],
+     "changed": [{"key": "entity/project/id", "set": {field: value},
+                  "unset": [field], "metrics": {"set": {...}, "unset": [...]}}],
+     "removed": ["entity/project/id", ...]}
+
+"metrics" is diffed key by key since a running run usually only moves a
+few summary values. A run that was removed and came back within the
+window is listed in both "removed" and "added"; clients apply removals
+first. If `since` is unknown (worker restarted, another
+view) or older than the DELTA_HISTORY versions kept, the answer is the
+full list instead: {"version": ..., "full": true, "runs": [...]}.
+Versions are opaque strings, usable as an ETag.
+"""
+
+import os
+import uuid
+import threading
+from collections import OrderedDict, deque
+
+# Versions of changes kept per view; older clients get the full list
+DELTA_HISTORY = int(os.environ.get("RUNS_DELTA_HISTORY", "64"))
+
+# Views (project filter x projection) tracked at once, least recently used dropped
+DELTA_VIEWS = int(os.environ.get("RUNS_DELTA_VIEWS", "8"))
+
+
+def record_key(record):
+    return f"{record.get('entity')}/{record.get('project')}/{record.get('id')}"
+
+
+def diff_fields(old, new):
+    """({key: new value} for added or changed keys, [removed keys])"""
+    changed = {key: value for key, value in new.items() if key not in old or old[key] != value}
+    removed = [key for key in old if key not in new]
+    return changed, removed
+
+
+def diff_records(old, new):
+    """Field-level change from one record to the next, None if they are equal"""
+    if old == new:
+        return None
+    changed, removed = diff_fields(old, new)
+    change = {"set": changed, "unset": removed}
+    old_metrics, new_metrics = old.get("metrics"), new.get("metrics")
+    if "metrics" in changed and isinstance(old_metrics, dict) and isinstance(new_metrics, dict):
+        metrics_set, metrics_unset = diff_fields(old_metrics, new_metrics)
+        del changed["metrics"]
+        change["metrics"] = {"set": metrics_set, "unset": metrics_unset}
+    return change
+
+
+def merge_field_change(into, change):
+    """Apply a later {"set", "unset"} on top of an earlier one"""
+    for key, value in change["set"].items():
+        into["set"][key] = value
+        if key in into["unset"]:
+            into["unset"].remove(key)
+    for key in change["unset"]:
+        into["set"].pop(key, None)
+        if key not in into["unset"]:
+            into["unset"].append(key)
+
+
+class RunSnapshot:
+    """Latest records of one view, plus the changes of its last DELTA_HISTORY versions"""
+
+    def __init__(self, history=DELTA_HISTORY):
+        self.lock = threading.Lock()
+        self.epoch = uuid.uuid4().hex[:8]
+        self.number = 0
+        self.records = {}  # key -> record
+        # (number, {"added": {key}, "changed": {key: change}, "removed": {key}})
+        self.history = deque(maxlen=history)
+
+    @property
+    def version(self):
+        return f"{self.epoch}.{self.number}"
+
+    def update(self, records):
+        """Replace the snapshot with `records`, returns the (possibly new) version"""
+        latest = {record_key(record): record for record in records}
+        with self.lock:
+            added = {key for key in latest if key not in self.records}
+            removed = {key for key in self.records if key not in latest}
+            changed = {}
+            for key, record in latest.items():
+                if key not in added:
+                    change = diff_records(self.records[key], record)
+                    if change is not None:
+                        changed[key] = change
+            if added or removed or changed:
+                self.number += 1
+                self.history.append((self.number, {"added": added, "changed": changed, "removed": removed}))
+            self.records = latest
+            return self.version
+
+    def delta(self, since):
+        """Changes since version `since`, or the full list if it is unknown or too old"""
+        with self.lock:
+            epoch, _, number = (since or "").partition(".")
+            try:
+                number = int(number)
+            except ValueError:
+                number = None
+            oldest = self.history[0][0] if self.history else self.number + 1
+            # Versions before the oldest kept change cannot be caught up from
+            if epoch != self.epoch or number is None or number > self.number or number < oldest - 1:
+                return {"version": self.version, "full": True, "runs": list(self.records.values())}
+
+            # Only which fields changed is merged; values come from the current records
+            added, changed, removed = set(), {}, set()
+            for version, entry in self.history:
+                if version <= number:
+                    continue
+                for key in entry["added"]:
+                    added.add(key)
+                for key, change in entry["changed"].items():
+                    if key in added:
+                        continue
+                    merged = changed.setdefault(key, {"set": {}, "unset": []})
+                    merge_field_change(merged, change)
+                    if "metrics" in change:
+                        merged.setdefault("metrics", {"set": {}, "unset": []})
+                        merge_field_change(merged["metrics"], change["metrics"])
+                for key in entry["removed"]:
+                    if key in added:
+                        added.discard(key)
+                    else:
+                        removed.add(key)
+                    changed.pop(key, None)
+
+            changes = []
+            for key, merged in changed.items():
+                record = self.records[key]
+                change = {"key": key, "set": {field: record[field] for field in merged["set"]},
+                          "unset": merged["unset"]}
+                metrics = record.get("metrics")
+                # A wholesale "metrics" change already carries the whole dict
+                if "metrics" in merged and "metrics" not in change["set"] and isinstance(metrics, dict):
+                    change["metrics"] = {"set": {name: metrics[name] for name in merged["metrics"]["set"]},
+                                         "unset": merged["metrics"]["unset"]}
+                changes.append(change)
+            return {
+                "version": self.version,
+                "since": since,
+                "added": [self.records[key] for key in added],
+                "changed": changes,
+                "removed": sorted(removed),
+            }
+
+
+class RunSnapshots:
+    """RunSnapshot per view, at most max_views of them"""
+
+    def __init__(self, max_views=DELTA_VIEWS, history=DELTA_HISTORY):
+        self.lock = threading.Lock()
+        self.max_views = max_views
+        self.history = history
+        self.views = OrderedDict()
+
+    def get(self, view):
+        with self.lock:
+            snapshot = self.views.get(view)
+            if snapshot is None:
+                snapshot = self.views[view] = RunSnapshot(self.history)
+                while len(self.views) > self.max_views:
+                    self.views.popitem(last=False)
+            self.views.move_to_end(view)
+            return snapshot
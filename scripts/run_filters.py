@@ -0,0 +1,146 @@
+"""Run filters pushed down into wandb's api.runs(filters=...) query.
+
+RunFilter takes the filters the endpoint and get_wandb_runs.py accept:
+
+    state           states, e.g. "running" or "finished,crashed"
+    tag             runs with any of these tags
+    user            runs started by any of these usernames
+    created_after   ISO date/time, inclusive
+    created_before  ISO date/time, exclusive
+    name            regular expression searched in the run's display name
+
+query() turns them into a MongoDB-style filter dict for the wandb API, so
+runs that do not match never leave the server. matches() checks a run
+object on our side. It runs on every listed run as well: it is free (no
+extra requests), and it covers a backend that ignores a filter key or a
+query that had to be retried without filters.
+
+An unparsable date or name regex raises InvalidFilter, which callers
+answer as a bad request rather than an empty listing.
+"""
+
+import re
+import datetime
+
+# (RunFilter attribute, wandb filter field) of the value-list filters
+LIST_FIELDS = (("states", "state"), ("tags", "tags"), ("users", "username"))
+
+
+class InvalidFilter(ValueError):
+    """A filter value that cannot be parsed"""
+
+
+def split_values(value):
+    """"a,b" or ["a", "b,c"] -> ["a", "b", "c"], None -> None"""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = [value]
+    values = [part.strip() for item in value for part in str(item).split(",") if part.strip()]
+    return values or None
+
+
+def parse_time(value):
+    """ISO date or date/time as the "YYYY-MM-DDTHH:MM:SS" UTC string wandb uses"""
+    if not value:
+        return None
+    text = str(value).strip()
+    if text.endswith("Z"):
+        text = text[:-1] + "+00:00"
+    try:
+        parsed = datetime.datetime.fromisoformat(text)
+    except ValueError:
+        raise InvalidFilter(f"not an ISO date/time: {value!r}")
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return parsed.strftime("%Y-%m-%dT%H:%M:%S")
+
+
+def run_username(run):
+    """Username of the run's author; run.user is a User object in wandb, a string in fakes"""
+    user = getattr(run, "user", None)
+    if user is None or isinstance(user, str):
+        return user
+    return getattr(user, "username", None) or getattr(user, "name", None)
+
+
+def run_created_at(run):
+    if not run.created_at:
+        return None
+    try:
+        return parse_time(run.created_at)
+    except ValueError:
+        return str(run.created_at)
+
+
+class RunFilter:
+    """Filters for listed runs; falsy arguments mean no filter"""
+
+    def __init__(self, state=None, tag=None, user=None, created_after=None, created_before=None, name=None):
+        self.states = split_values(state)
+        self.tags = split_values(tag)
+        self.users = split_values(user)
+        self.created_after = parse_time(created_after)
+        self.created_before = parse_time(created_before)
+        self.name = name or None
+        try:
+            self.name_regex = re.compile(name) if name else None
+        except re.error as e:
+            raise InvalidFilter(f"invalid name regex {name!r}: {e}")
+
+    @classmethod
+    def from_params(cls, params):
+        """RunFilter from request params, None if they hold no filter"""
+        run_filter = cls(**{key: params.get(key) for key in
+                            ("state", "tag", "user", "created_after", "created_before", "name")})
+        return None if run_filter.is_empty() else run_filter
+
+    def is_empty(self):
+        return not (self.states or self.tags or self.users or self.created_after or self.created_before
+                    or self.name)
+
+    def key(self):
+        """Hashable identity, e.g. for per-view caches"""
+        return (tuple(self.states or ()), tuple(self.tags or ()), tuple(self.users or ()),
+                self.created_after, self.created_before, self.name)
+
+    def query(self):
+        """The filters as a wandb api.runs filters dict"""
+        conditions = []
+        for attr, field in LIST_FIELDS:
+            values = getattr(self, attr)
+            if values:
+                # A single state or user as plain equality, the form wandb's own examples use
+                conditions.append({field: values[0] if len(values) == 1 and field != "tags" else {"$in": values}})
+        created = {}
+        if self.created_after:
+            created["$gte"] = self.created_after
+        if self.created_before:
+            created["$lt"] = self.created_before
+        if created:
+            conditions.append({"createdAt": created})
+        if self.name:
+            conditions.append({"display_name": {"$regex": self.name}})
+        if len(conditions) == 1:
+            return conditions[0]
+        return {"$and": conditions}
+
+    def matches(self, run):
+        """Check a listed run object without any further request"""
+        if self.states and run.state not in self.states:
+            return False
+        if self.tags and not any(tag in self.tags for tag in (getattr(run, "tags", None) or ())):
+            return False
+        if self.users and run_username(run) not in self.users:
+            return False
+        if self.created_after or self.created_before:
+            created = run_created_at(run)
+            if created is None:
+                return False
+            if self.created_after and created < self.created_after:
+                return False
+            if self.created_before and created >= self.created_before:
+                return False
+        if self.name_regex is not None and not self.name_regex.search(run.name or ""):
+            return False
+        return True
@@ -0,0 +1,389 @@
+import os
+import json
+import argparse
+import sqlite3
+import threading
+import time
+
+# Run states that never change again
+FINISHED_STATES = ("finished", "crashed", "failed")
+
+# Finished-run cache size, least recently used runs are evicted beyond it
+FINISHED_CACHE_MAX_RUNS = int(os.environ.get("FINISHED_CACHE_MAX_RUNS", "50000"))
+
+# A run's hardware never changes, cached GPU metadata is kept this long (seconds)
+HARDWARE_TTL = int(os.environ.get("WANDB_METADATA_TTL", str(30 * 24 * 3600)))
+
+# GPU utilization samples kept per run by the background sampler
+GPU_SAMPLE_BUFFER = int(os.environ.get("GPU_SAMPLE_BUFFER", "120"))
+
+# Shape of processed run records; bumped when fields are added (2: tags, config)
+# so records stored by older versions are dropped instead of served
+RECORD_VERSION = 2
+
+
+def default_cache_dir():
+    """Directory for on-disk caches, override with TRAINING_MONITOR_CACHE"""
+    return os.environ.get("TRAINING_MONITOR_CACHE") or os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.cache')
+
+
+def default_store_path():
+    return os.path.join(default_cache_dir(), 'runs.sqlite3')
+
+
+def connect(path):
+    """Open a SQLite connection usable from the worker's threads"""
+    if path != ":memory:":
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    return conn
+
+
+def drop_stale_records(conn, name, tables):
+    """Empty tables holding records written under another RECORD_VERSION"""
+    conn.execute("CREATE TABLE IF NOT EXISTS record_versions (name TEXT PRIMARY KEY, version INTEGER NOT NULL)")
+    row = conn.execute("SELECT version FROM record_versions WHERE name = ?", (name,)).fetchone()
+    if row is None or row[0] != RECORD_VERSION:
+        for table in tables:
+            conn.execute(f"DELETE FROM {table}")
+        conn.execute("INSERT OR REPLACE INTO record_versions (name, version) VALUES (?, ?)",
+                     (name, RECORD_VERSION))
+    conn.commit()
+
+
+class RunStore:
+    """SQLite store of processed run records plus a per-project sync high-water mark"""
+
+    def __init__(self, path=None):
+        self.path = path or default_store_path()
+        self.lock = threading.Lock()
+        self.conn = connect(self.path)
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS runs (
+                project_path TEXT NOT NULL,
+                run_id TEXT NOT NULL,
+                state TEXT,
+                created_at TEXT,
+                heartbeat_at TEXT,
+                record TEXT NOT NULL,
+                PRIMARY KEY (project_path, run_id)
+            );
+            CREATE TABLE IF NOT EXISTS sync_state (
+                project_path TEXT PRIMARY KEY,
+                high_water TEXT,
+                full_sync_at REAL
+            );
+        """)
+        # The sync state goes too, so the next sync relists every run
+        drop_stale_records(self.conn, "runs", ("runs", "sync_state"))
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    def get_sync_state(self, project_path):
+        """Return (high_water, full_sync_at) or (None, None) if never synced"""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT high_water, full_sync_at FROM sync_state WHERE project_path = ?",
+                (project_path,)).fetchone()
+        return row if row else (None, None)
+
+    def get_project_paths(self):
+        """Every project synced into the store"""
+        with self.lock:
+            rows = self.conn.execute("SELECT project_path FROM sync_state ORDER BY project_path").fetchall()
+        return [row[0] for row in rows]
+
+    def get_running_ids(self, project_path):
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT run_id FROM runs WHERE project_path = ? AND state = 'running'",
+                (project_path,)).fetchall()
+        return [row[0] for row in rows]
+
+    def get_records(self, project_path, limit=None):
+        """Stored records for a project, newest first, the first `limit` if given"""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT record FROM runs WHERE project_path = ? ORDER BY created_at DESC LIMIT ?",
+                (project_path, -1 if limit is None else limit)).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def save(self, project_path, entries, high_water, full_sync=False):
+        """Upsert (record, heartbeat_at) pairs and advance the high-water mark.
+
+        A full sync replaces every stored run of the project so deleted runs
+        disappear.
+        """
+        with self.lock, self.conn:
+            if full_sync:
+                self.conn.execute("DELETE FROM runs WHERE project_path = ?", (project_path,))
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO runs (project_path, run_id, state, created_at, heartbeat_at, record) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [(project_path, record["id"], record["state"], record["createdAt"], heartbeat_at,
+                  json.dumps(record)) for record, heartbeat_at in entries])
+            previous = self.conn.execute(
+                "SELECT full_sync_at FROM sync_state WHERE project_path = ?",
+                (project_path,)).fetchone()
+            full_sync_at = time.time() if full_sync or not previous else previous[0]
+            self.conn.execute(
+                "INSERT OR REPLACE INTO sync_state (project_path, high_water, full_sync_at) VALUES (?, ?, ?)",
+                (project_path, high_water, full_sync_at))
+
+
+class FinishedRunCache:
+    """Permanent cache of records for runs in a FINISHED_STATES state.
+
+    Keyed by entity/project/run id. Records are only reused while the listed
+    run still has the cached state and name, so resumed or renamed runs are
+    processed again. Holds at most max_runs records, evicting the least
+    recently used.
+    """
+
+    def __init__(self, path=None, max_runs=FINISHED_CACHE_MAX_RUNS):
+        self.path = path or default_store_path()
+        self.max_runs = max_runs
+        self.lock = threading.Lock()
+        self.conn = connect(self.path)
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS finished_runs (
+                entity TEXT NOT NULL,
+                project TEXT NOT NULL,
+                run_id TEXT NOT NULL,
+                record TEXT NOT NULL,
+                last_access REAL NOT NULL,
+                PRIMARY KEY (entity, project, run_id)
+            );
+            CREATE INDEX IF NOT EXISTS finished_runs_last_access ON finished_runs (last_access);
+        """)
+        drop_stale_records(self.conn, "finished_runs", ("finished_runs",))
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    def load_project(self, entity, project):
+        """All cached records of a project as {run_id: record}"""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT run_id, record FROM finished_runs WHERE entity = ? AND project = ?",
+                (entity, project)).fetchall()
+        return {run_id: json.loads(record) for run_id, record in rows}
+
+    def lookup(self, cached, run):
+        """Cached record for a listed run, or None if it must be processed"""
+        record = cached.get(run.id)
+        if record is None or run.state not in FINISHED_STATES:
+            return None
+        if record["state"] != run.state or record["name"] != run.name:
+            return None
+        return record
+
+    def update(self, stored, hits):
+        """Store newly finished records and mark cache hits as recently used"""
+        stored = [record for record in stored if record["state"] in FINISHED_STATES]
+        if not stored and not hits:
+            return
+        now = time.time()
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO finished_runs (entity, project, run_id, record, last_access) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [(r["entity"], r["project"], r["id"], json.dumps(r), now) for r in stored])
+            self.conn.executemany(
+                "UPDATE finished_runs SET last_access = ? WHERE entity = ? AND project = ? AND run_id = ?",
+                [(now, r["entity"], r["project"], r["id"]) for r in hits])
+            if stored:
+                self._evict()
+
+    def _evict(self):
+        count = self.conn.execute("SELECT COUNT(*) FROM finished_runs").fetchone()[0]
+        if count > self.max_runs:
+            self.conn.execute(
+                "DELETE FROM finished_runs WHERE rowid IN "
+                "(SELECT rowid FROM finished_runs ORDER BY last_access ASC LIMIT ?)",
+                (count - self.max_runs,))
+
+    def invalidate(self, entity=None, project=None, run_id=None):
+        """Drop cached records, optionally limited to an entity, project or run.
+
+        Returns the number of records removed.
+        """
+        conditions, args = [], []
+        for column, value in (("entity", entity), ("project", project), ("run_id", run_id)):
+            if value:
+                conditions.append(f"{column} = ?")
+                args.append(value)
+        where = " WHERE " + " AND ".join(conditions) if conditions else ""
+        with self.lock, self.conn:
+            return self.conn.execute(f"DELETE FROM finished_runs{where}", args).rowcount
+
+    def count(self):
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM finished_runs").fetchone()[0]
+
+
+class HardwareCache:
+    """Per-run hardware info (see get_wandb_runs.get_hardware) with a long TTL.
+
+    Keyed by "entity/project/run_id". Saves the run.metadata download that
+    otherwise costs one request per run on every refresh.
+    """
+
+    def __init__(self, path=None, ttl=HARDWARE_TTL):
+        self.path = path or default_store_path()
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.conn = connect(self.path)
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS run_hardware (
+                run_key TEXT PRIMARY KEY,
+                hardware TEXT NOT NULL,
+                fetched_at REAL NOT NULL
+            );
+        """)
+        self.conn.commit()
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    def get_many(self, keys):
+        """Fresh entries for the given run keys as {run_key: hardware}"""
+        found = {}
+        cutoff = time.time() - self.ttl
+        with self.lock:
+            # Stay below SQLite's bound-parameter limit
+            for i in range(0, len(keys), 500):
+                chunk = keys[i:i + 500]
+                rows = self.conn.execute(
+                    f"SELECT run_key, hardware FROM run_hardware WHERE fetched_at >= ? "
+                    f"AND run_key IN ({','.join('?' * len(chunk))})", [cutoff] + chunk).fetchall()
+                found.update((key, json.loads(hardware)) for key, hardware in rows)
+        return found
+
+    def put_many(self, entries):
+        now = time.time()
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO run_hardware (run_key, hardware, fetched_at) VALUES (?, ?, ?)",
+                [(key, json.dumps(hardware), now) for key, hardware in entries.items()])
+            self.conn.execute("DELETE FROM run_hardware WHERE fetched_at < ?", (now - self.ttl,))
+
+
+class GpuSampleStore:
+    """Fixed-size ring buffer of GPU utilization samples per run.
+
+    Written by the background sampler (gpu_sampler.py) and read by
+    get_wandb_runs.py, so the request path never calls the history API.
+    Each run has `size` slots; the sampler state remembers which system
+    metric key worked for the run, the last sampled step (the _runtime of
+    the event, system metrics have no _step) and the next slot.
+    """
+
+    def __init__(self, path=None, size=GPU_SAMPLE_BUFFER):
+        self.path = path or default_store_path()
+        self.size = size
+        self.lock = threading.Lock()
+        self.conn = connect(self.path)
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS gpu_samples (
+                run_key TEXT NOT NULL,
+                slot INTEGER NOT NULL,
+                step INTEGER,
+                value REAL NOT NULL,
+                sampled_at REAL NOT NULL,
+                PRIMARY KEY (run_key, slot)
+            );
+            CREATE TABLE IF NOT EXISTS gpu_sampler_state (
+                run_key TEXT PRIMARY KEY,
+                metric_key TEXT,
+                last_step INTEGER,
+                next_slot INTEGER NOT NULL
+            );
+        """)
+        self.conn.commit()
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    def get_state(self, run_key):
+        """Return (metric_key, last_step, next_slot) for a run"""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT metric_key, last_step, next_slot FROM gpu_sampler_state WHERE run_key = ?",
+                (run_key,)).fetchone()
+        return row if row else (None, None, 0)
+
+    def append(self, run_key, metric_key, samples):
+        """Add (step, value) samples, overwriting the oldest slots when full"""
+        if not samples:
+            return
+        _, last_step, next_slot = self.get_state(run_key)
+        now = time.time()
+        # Only the newest `size` samples survive anyway
+        samples = samples[-self.size:]
+        rows = []
+        for step, value in samples:
+            rows.append((run_key, next_slot % self.size, step, float(value), now))
+            next_slot += 1
+            if step is not None:
+                last_step = step if last_step is None else max(last_step, step)
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO gpu_samples (run_key, slot, step, value, sampled_at) "
+                "VALUES (?, ?, ?, ?, ?)", rows)
+            self.conn.execute(
+                "INSERT OR REPLACE INTO gpu_sampler_state (run_key, metric_key, last_step, next_slot) "
+                "VALUES (?, ?, ?, ?)", (run_key, metric_key, last_step, next_slot))
+
+    def latest(self, run_keys):
+        """Most recent sample value for each run key that has one"""
+        found = {}
+        with self.lock:
+            for i in range(0, len(run_keys), 500):
+                chunk = run_keys[i:i + 500]
+                rows = self.conn.execute(
+                    f"SELECT s.run_key, g.value FROM gpu_sampler_state s "
+                    f"JOIN gpu_samples g ON g.run_key = s.run_key AND g.slot = (s.next_slot - 1) % ? "
+                    f"WHERE s.run_key IN ({','.join('?' * len(chunk))})", [self.size] + chunk).fetchall()
+                found.update(rows)
+        return found
+
+    def history(self, run_key):
+        """All buffered samples of a run, oldest first, as dicts"""
+        _, _, next_slot = self.get_state(run_key)
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT slot, step, value, sampled_at FROM gpu_samples WHERE run_key = ?",
+                (run_key,)).fetchall()
+        # Slots after the write position hold the oldest samples
+        start = next_slot % self.size
+        rows.sort(key=lambda row: (row[0] - start) % self.size)
+        return [{"step": step, "value": value, "sampledAt": sampled_at} for _, step, value, sampled_at in rows]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or invalidate the finished-run cache")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("stats", help="print the number of cached runs")
+    invalidate = sub.add_parser("invalidate", help="drop cached runs")
+    invalidate.add_argument("path", nargs="?", default="",
+                            help="entity, entity/project or entity/project/run_id, everything if omitted")
+    args = parser.parse_args()
+
+    cache = FinishedRunCache()
+    if args.command == "stats":
+        print(json.dumps({"runs": cache.count(), "maxRuns": cache.max_runs, "path": cache.path}))
+    else:
+        parts = (args.path.split("/") + [None, None, None])[:3] if args.path else [None, None, None]
+        print(json.dumps({"removed": cache.invalidate(*parts)}))
+
+
+if __name__ == "__main__":
+    main()
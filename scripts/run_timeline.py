@@ -0,0 +1,411 @@
+#!/usr/bin/env python3
+"""Append-only timeline of the run listings, for time-travel queries.
+
+Every sync of a project's runs is diffed against the last known state of
+those runs, keeping only TIMELINE_FIELDS (state, progress, eta, ...).
+Changes are buffered and written at most every TIMELINE_INTERVAL seconds
+as one delta row: zlib-compressed JSON of the fields that changed per run
+and the runs that disappeared. Every TIMELINE_CHECKPOINT deltas the full
+state is written as a checkpoint too. A checkpoint and the deltas after
+it form a segment:
+
+    timeline (ts, kind, data)     kind 0 = checkpoint, 1 = delta
+
+The state at any time t is the last checkpoint at or before t plus the
+deltas up to t, so reconstructing it decompresses one checkpoint and at
+most TIMELINE_CHECKPOINT small deltas, whatever the age of the log.
+Rows are only ever appended, except by compact():
+
+    retention     rows older than TIMELINE_RETENTION are dropped, after
+                  a checkpoint is written at the cutoff
+    downsampling  past TIMELINE_DOWNSAMPLE_AFTER, the deltas of each
+                  TIMELINE_DOWNSAMPLE_INTERVAL are merged into one, and
+                  only one checkpoint per TIMELINE_OLD_CHECKPOINT is kept
+
+so the log stays bounded: full resolution for recent days, coarser
+before, nothing past retention.
+
+    python scripts/run_timeline.py at 2024-05-01T03:00:00Z        # runs at that time
+    python scripts/run_timeline.py run entity/project/run_id      # its progress timeline
+    python scripts/run_timeline.py stats
+"""
+
+import os
+import sys
+import json
+import time
+import zlib
+import calendar
+import argparse
+import threading
+
+from run_delta import record_key
+from run_filters import parse_time
+from run_store import connect, default_store_path
+from telemetry import TELEMETRY, get_logger
+
+log = get_logger("run_timeline")
+
+# Seconds between two delta rows; changes in between are merged
+TIMELINE_INTERVAL = float(os.environ.get("TIMELINE_INTERVAL", "30"))
+
+# Deltas between two checkpoints, bounds the work of one reconstruction
+TIMELINE_CHECKPOINT = int(os.environ.get("TIMELINE_CHECKPOINT", "120"))
+
+# Seconds of history kept at all, and at full resolution
+TIMELINE_RETENTION = float(os.environ.get("TIMELINE_RETENTION", str(30 * 24 * 3600)))
+TIMELINE_DOWNSAMPLE_AFTER = float(os.environ.get("TIMELINE_DOWNSAMPLE_AFTER", str(2 * 24 * 3600)))
+
+# Resolution of the history older than that: one delta per interval, one checkpoint per
+# TIMELINE_OLD_CHECKPOINT seconds
+TIMELINE_DOWNSAMPLE_INTERVAL = float(os.environ.get("TIMELINE_DOWNSAMPLE_INTERVAL", "600"))
+TIMELINE_OLD_CHECKPOINT = float(os.environ.get("TIMELINE_OLD_CHECKPOINT", str(6 * 3600)))
+
+# compact() runs at most this often (seconds)
+COMPACT_INTERVAL = 3600
+
+# Record fields kept per run, the ones the dashboard's table shows
+TIMELINE_FIELDS = ("entity", "project", "id", "name", "state", "progress", "totalSteps", "createdAt", "eta",
+                   "throughput", "gpu", "gpuUtilization")
+
+CHECKPOINT, DELTA = 0, 1
+
+
+def compact_record(record):
+    return {field: record[field] for field in TIMELINE_FIELDS if field in record}
+
+
+def encode(value):
+    return zlib.compress(json.dumps(value, separators=(",", ":")).encode(), 6)
+
+
+def decode(data):
+    return json.loads(zlib.decompress(data))
+
+
+def apply_delta(state, delta):
+    """Apply {"s": {key: {field: value}}, "r": [key]} to a {key: record} state in place"""
+    for key in delta.get("r", ()):
+        state.pop(key, None)
+    for key, fields in delta.get("s", {}).items():
+        record = state.get(key)
+        if record is None:
+            state[key] = dict(fields)
+        else:
+            record.update(fields)
+
+
+def merge_deltas(first, second):
+    """One delta with the effect of `first` followed by `second`"""
+    changed = {key: dict(fields) for key, fields in first.get("s", {}).items()}
+    removed = set(first.get("r", ()))
+    for key in second.get("r", ()):
+        changed.pop(key, None)
+        removed.add(key)
+    for key, fields in second.get("s", {}).items():
+        if key in removed:
+            # Removed, then listed again with all its fields
+            removed.discard(key)
+            changed[key] = dict(fields)
+        else:
+            changed.setdefault(key, {}).update(fields)
+    delta = {}
+    if changed:
+        delta["s"] = changed
+    if removed:
+        delta["r"] = sorted(removed)
+    return delta
+
+
+def parse_timestamp(value):
+    """Epoch seconds of a number or an ISO date/time (UTC unless it says otherwise)"""
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        pass
+    return float(calendar.timegm(time.strptime(parse_time(value), "%Y-%m-%dT%H:%M:%S")))
+
+
+def thin(points, count):
+    """At most `count` points, evenly spread, keeping the first and last"""
+    if count <= 0 or len(points) <= count:
+        return points
+    if count == 1:
+        return points[-1:]
+    step = (len(points) - 1) / (count - 1)
+    return [points[round(i * step)] for i in range(count)]
+
+
+class RunTimeline:
+    """The timeline log in the local SQLite store, see the module docstring"""
+
+    def __init__(self, path=None, interval=TIMELINE_INTERVAL, checkpoint_every=TIMELINE_CHECKPOINT):
+        self.path = path or default_store_path()
+        self.interval = interval
+        self.checkpoint_every = checkpoint_every
+        self.lock = threading.Lock()
+        self.conn = connect(self.path)
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS timeline (
+                ts REAL NOT NULL,
+                kind INTEGER NOT NULL,
+                data BLOB NOT NULL,
+                PRIMARY KEY (kind, ts)
+            );
+        """)
+        self.conn.commit()
+        self.sources = {}  # source -> {key}
+        self.pending = {}  # unwritten delta
+        self.pending_at = None  # time of the last unwritten change
+        self.written_at = 0.0
+        self.compacted_at = 0.0
+        self.checkpoint = None  # (ts, state) most recently decoded, reused by queries
+        with self.lock:
+            last = self.conn.execute("SELECT MAX(ts) FROM timeline").fetchone()[0]
+            self.state = self.state_at_locked(last) if last is not None else {}
+            self.checkpoint_at = self.conn.execute(
+                "SELECT MAX(ts) FROM timeline WHERE kind = ?", (CHECKPOINT,)).fetchone()[0]
+            self.has_checkpoint = self.checkpoint_at is not None
+            self.deltas_since_checkpoint = self.conn.execute(
+                "SELECT COUNT(*) FROM timeline WHERE kind = ? AND ts > "
+                "COALESCE((SELECT MAX(ts) FROM timeline WHERE kind = ?), -1)", (DELTA, CHECKPOINT)).fetchone()[0]
+        # Which source a run belongs to is its project
+        for key, record in self.state.items():
+            self.sources.setdefault(f"{record.get('entity')}/{record.get('project')}", set()).add(key)
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    def record(self, source, records, now=None):
+        """Note the current runs of one project ("entity/project"); [] when it is gone"""
+        now = time.time() if now is None else now
+        latest = {}
+        for record in records:
+            latest[record_key(record)] = compact_record(record)
+        with self.lock:
+            # Changes that waited long enough are written under their own time first
+            if self.pending and now - self.written_at >= self.interval:
+                self.write_locked()
+            change = {}
+            for key, record in latest.items():
+                old = self.state.get(key)
+                if old is None:
+                    change.setdefault("s", {})[key] = record
+                else:
+                    fields = {field: value for field, value in record.items() if old.get(field) != value}
+                    if fields:
+                        change.setdefault("s", {})[key] = fields
+            gone = self.sources.get(source, set()) - set(latest)
+            if gone:
+                change["r"] = sorted(gone)
+            if latest:
+                self.sources[source] = set(latest)
+            else:
+                self.sources.pop(source, None)
+            if change:
+                apply_delta(self.state, change)
+                self.pending = merge_deltas(self.pending, change)
+                self.pending_at = now
+        if now - self.compacted_at >= COMPACT_INTERVAL:
+            self.compact(now)
+
+    def flush(self):
+        """Write buffered changes now"""
+        with self.lock:
+            if self.pending:
+                self.write_locked()
+
+    def write_locked(self):
+        ts = self.pending_at
+        delta = self.pending
+        with self.conn:
+            row = self.conn.execute("SELECT data FROM timeline WHERE kind = ? AND ts = ?", (DELTA, ts)).fetchone()
+            if row is not None:
+                # A flush in the middle of one poll's syncs, same timestamp
+                delta = merge_deltas(decode(row[0]), delta)
+            self.conn.execute("INSERT OR REPLACE INTO timeline (ts, kind, data) VALUES (?, ?, ?)",
+                              (ts, DELTA, encode(delta)))
+            self.deltas_since_checkpoint += 1
+            # The delta is written as well, so a checkpoint can be dropped later.
+            # A checkpoint at this very timestamp must take the merged changes too.
+            if (not self.has_checkpoint or self.deltas_since_checkpoint >= self.checkpoint_every
+                    or ts == self.checkpoint_at):
+                self.conn.execute("INSERT OR REPLACE INTO timeline (ts, kind, data) VALUES (?, ?, ?)",
+                                  (ts, CHECKPOINT, encode(self.state)))
+                self.deltas_since_checkpoint = 0
+                self.has_checkpoint = True
+                self.checkpoint_at = ts
+        TELEMETRY.count("timeline_writes")
+        self.pending = {}
+        self.written_at = ts
+
+    def state_at_locked(self, ts):
+        """{key: record} as of time ts"""
+        row = self.conn.execute("SELECT ts, data FROM timeline WHERE kind = ? AND ts <= ? ORDER BY ts DESC LIMIT 1",
+                                (CHECKPOINT, ts)).fetchone()
+        start = -1.0
+        state = {}
+        if row is not None:
+            start = row[0]
+            if self.checkpoint is None or self.checkpoint[0] != start:
+                self.checkpoint = (start, decode(row[1]))
+            state = {key: dict(record) for key, record in self.checkpoint[1].items()}
+        for (data,) in self.conn.execute("SELECT data FROM timeline WHERE kind = ? AND ts > ? AND ts <= ? ORDER BY ts",
+                                         (DELTA, start, ts)):
+            apply_delta(state, decode(data))
+        return state
+
+    def runs_at(self, at, project=None):
+        """{"at", "runs", "tookMs"}: the runs as they were listed at time `at`"""
+        start = time.perf_counter()
+        ts = parse_timestamp(at)
+        self.flush()
+        with self.lock, TELEMETRY.timer("timeline_reconstruct"):
+            state = self.state_at_locked(ts)
+        runs = [record for record in state.values()
+                if not project or f"{record.get('entity')}/{record.get('project')}" == project]
+        runs.sort(key=lambda record: record.get("createdAt") or "", reverse=True)
+        return {"at": ts, "runs": runs, "tookMs": round((time.perf_counter() - start) * 1000, 3)}
+
+    def run_timeline(self, key, since=None, until=None, points=200):
+        """{"key", "points": [{"ts", "state", "progress", "totalSteps", "eta"}]} of one run
+        ("entity/project/id") between since and until (default: the last day up to now)"""
+        start = time.perf_counter()
+        until = parse_timestamp(until) if until is not None else time.time()
+        since = parse_timestamp(since) if since is not None else until - 24 * 3600
+        self.flush()
+        series = []
+
+        def point(ts, record):
+            series.append({"ts": ts, **{field: record.get(field)
+                                        for field in ("state", "progress", "totalSteps", "eta")}})
+
+        needle = json.dumps(key).encode()
+        with self.lock, TELEMETRY.timer("timeline_run"):
+            record = self.state_at_locked(since).get(key)
+            if record is not None:
+                record = dict(record)
+                point(since, record)
+            for ts, kind, data in self.conn.execute(
+                    "SELECT ts, kind, data FROM timeline WHERE ts > ? AND ts <= ? ORDER BY ts, kind DESC",
+                    (since, until)):
+                if kind == CHECKPOINT:
+                    continue
+                raw = zlib.decompress(data)
+                # Most deltas do not mention a given run, skip parsing those
+                if needle not in raw:
+                    continue
+                delta = json.loads(raw)
+                if key in delta.get("r", ()):
+                    record = None
+                    series.append({"ts": ts, "state": None, "progress": None, "totalSteps": None, "eta": None})
+                fields = delta.get("s", {}).get(key)
+                if fields is not None:
+                    record = {**(record or {}), **fields}
+                    point(ts, record)
+        return {"key": key, "since": since, "until": until, "points": thin(series, points),
+                "tookMs": round((time.perf_counter() - start) * 1000, 3)}
+
+    def compact(self, now=None):
+        """Apply retention and downsampling, see the module docstring"""
+        now = time.time() if now is None else now
+        self.flush()
+        with self.lock, TELEMETRY.timer("timeline_compact"):
+            self.compacted_at = now
+            cutoff = now - TIMELINE_RETENTION
+            with self.conn:
+                older = self.conn.execute("SELECT MAX(ts) FROM timeline WHERE ts < ?", (cutoff,)).fetchone()[0]
+                if older is not None:
+                    # Keep what was true at the cutoff as its first checkpoint
+                    self.conn.execute("INSERT OR REPLACE INTO timeline (ts, kind, data) VALUES (?, ?, ?)",
+                                      (cutoff, CHECKPOINT, encode(self.state_at_locked(cutoff))))
+                    self.conn.execute("DELETE FROM timeline WHERE ts < ?", (cutoff,))
+                    self.has_checkpoint = True
+                merged = self.downsample_locked(now - TIMELINE_DOWNSAMPLE_AFTER)
+            self.checkpoint = None
+        if older is not None or merged:
+            log.info("Timeline compacted: cut before %s, %d deltas merged", older is not None, merged)
+        return merged
+
+    def downsample_locked(self, before):
+        """Merge the deltas before `before` per TIMELINE_DOWNSAMPLE_INTERVAL and thin the checkpoints"""
+        interval = TIMELINE_DOWNSAMPLE_INTERVAL
+        buckets = self.conn.execute(
+            "SELECT CAST(ts / ? AS INTEGER) AS bucket FROM timeline WHERE kind = ? AND ts < ? "
+            "GROUP BY bucket HAVING COUNT(*) > 1", (interval, DELTA, before)).fetchall()
+        merged = 0
+        for (bucket,) in buckets:
+            low, high = bucket * interval, min((bucket + 1) * interval, before)
+            rows = self.conn.execute("SELECT ts, data FROM timeline WHERE kind = ? AND ts >= ? AND ts < ? ORDER BY ts",
+                                     (DELTA, low, high)).fetchall()
+            if len(rows) < 2:
+                continue
+            delta = {}
+            for _, data in rows:
+                delta = merge_deltas(delta, decode(data))
+            self.conn.execute("DELETE FROM timeline WHERE kind = ? AND ts >= ? AND ts < ?", (DELTA, low, high))
+            self.conn.execute("INSERT INTO timeline (ts, kind, data) VALUES (?, ?, ?)",
+                              (rows[-1][0], DELTA, encode(delta)))
+            merged += len(rows) - 1
+        # Merged deltas hold latest values, so replaying them from an earlier
+        # checkpoint is still exact; keep the first checkpoint of each window
+        checkpoints = [ts for (ts,) in self.conn.execute(
+            "SELECT ts FROM timeline WHERE kind = ? AND ts < ? ORDER BY ts", (CHECKPOINT, before))]
+        kept = None
+        for ts in checkpoints:
+            if kept is not None and ts - kept < TIMELINE_OLD_CHECKPOINT:
+                self.conn.execute("DELETE FROM timeline WHERE kind = ? AND ts = ?", (CHECKPOINT, ts))
+            else:
+                kept = ts
+        return merged
+
+    def stats(self):
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT kind, COUNT(*), COALESCE(SUM(LENGTH(data)), 0), MIN(ts), MAX(ts) FROM timeline GROUP BY kind"
+            ).fetchall()
+        stats = {"checkpoints": 0, "deltas": 0, "bytes": 0, "oldest": None, "newest": None, "runs": len(self.state)}
+        for kind, count, size, oldest, newest in rows:
+            stats["checkpoints" if kind == CHECKPOINT else "deltas"] = count
+            stats["bytes"] += size
+            stats["oldest"] = oldest if stats["oldest"] is None else min(stats["oldest"], oldest)
+            stats["newest"] = newest if stats["newest"] is None else max(stats["newest"], newest)
+        return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query the run timeline in the local store")
+    sub = parser.add_subparsers(dest="command", required=True)
+    at = sub.add_parser("at", help="the runs as they were at a time")
+    at.add_argument("time", help="ISO date/time (UTC unless given) or epoch seconds")
+    at.add_argument("--project", help="only runs of this entity/project")
+    run = sub.add_parser("run", help="progress timeline of one run")
+    run.add_argument("key", help="entity/project/run_id")
+    run.add_argument("--since", help="start, default a day before --until")
+    run.add_argument("--until", help="end, default now")
+    run.add_argument("--points", type=int, default=200)
+    sub.add_parser("stats", help="size of the log")
+    sub.add_parser("compact", help="apply retention and downsampling now")
+    args = parser.parse_args()
+
+    timeline = RunTimeline()
+    try:
+        if args.command == "at":
+            result = timeline.runs_at(args.time, args.project)
+        elif args.command == "run":
+            result = timeline.run_timeline(args.key, args.since, args.until, args.points)
+        elif args.command == "compact":
+            result = {"merged": timeline.compact()}
+        else:
+            result = timeline.stats()
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(2)
+    print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,437 @@
+#!/usr/bin/env python3
+"""In-memory search index over run records and the HuggingFace listings.
+
+Documents are runs (name, id, project, entity, state, tags, config keys
+and values) and models/datasets (name, tags). Their text is lowercased
+and split into terms, each kept with the weight of the best field it
+appears in (FIELD_WEIGHTS). Three tables answer queries:
+
+    postings      term -> {doc: weight}, the inverted index
+    sorted terms  for prefix lookups with bisect, re-sorted once per batch
+                  of changes rather than on every new term
+    trigrams      trigram -> {term}, for typo-tolerant matching
+
+Every query term must match a document: exactly, as a prefix of an
+indexed term (scored lower the shorter the prefix), or, when neither finds
+anything, through a term that shares enough trigrams. A document's score
+is the sum over query terms, boosted when the whole query equals or
+starts its name. Results are ranked by score and paginated. Scoring is
+vectorized: each term's posting is cached as NumPy arrays of doc ids and
+weights, and a query adds them up over an array of all doc ids, so a term
+matching every run costs about as much as a rare one.
+
+Documents are grouped by source, e.g. "runs:entity/project" or
+"hf:models". sync(source, documents) replaces a source incrementally:
+unchanged documents are left alone, changed ones reindexed, missing ones
+removed, so keeping the index fresh costs as much as what changed.
+
+    python scripts/search_index.py "bert base"   # search the local stores, JSON
+"""
+
+import re
+import sys
+import json
+import time
+import bisect
+import heapq
+import argparse
+import threading
+
+import numpy as np
+
+# Weight of a term by the field it was found in
+FIELD_WEIGHTS = {
+    "name": 4.0,
+    "id": 3.0,
+    "project": 2.0,
+    "tags": 2.0,
+    "entity": 1.5,
+    "state": 1.0,
+    "config_key": 1.0,
+    "config_value": 0.5,
+}
+
+# Shortest query term matched as a prefix, and how many indexed terms one
+# prefix may expand to (shortest first)
+PREFIX_MIN = 2
+PREFIX_EXPANSIONS = 64
+# Indexed terms looked at per prefix before picking the shortest
+PREFIX_SCAN = 4096
+
+# Fuzzy matching: shortest query term, least trigram similarity (Dice
+# coefficient) and how many similar terms are tried
+FUZZY_MIN_LENGTH = 3
+FUZZY_MIN_SIMILARITY = 0.4
+FUZZY_EXPANSIONS = 8
+# Candidate terms counted per fuzzy lookup, over the rarest trigrams first
+FUZZY_SCAN = 20000
+
+# Config values indexed: nesting depth, list items, string length
+CONFIG_DEPTH = 3
+CONFIG_LIST_ITEMS = 16
+CONFIG_VALUE_LENGTH = 200
+
+# Words, keeping decimals like "0.001" or "v1.2" in one term
+TERM = re.compile(r"[0-9a-z]+(?:\.[0-9]+)*")
+
+TYPES = ("run", "model", "dataset")
+
+
+def tokenize(text):
+    return TERM.findall(str(text).lower())
+
+
+def trigrams(term):
+    padded = f"${term}$"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def config_terms(config, depth=0, prefix=""):
+    """Yield (field, text) for the keys and scalar values of a (nested) config"""
+    for key, value in config.items():
+        key = str(key)
+        if key.startswith("_"):
+            continue
+        yield "config_key", f"{prefix}{key}"
+        if isinstance(value, dict):
+            if depth < CONFIG_DEPTH:
+                yield from config_terms(value, depth + 1, f"{prefix}{key}.")
+        elif isinstance(value, (list, tuple)):
+            for item in value[:CONFIG_LIST_ITEMS]:
+                if isinstance(item, (str, int, float, bool)):
+                    yield "config_value", item
+        elif isinstance(value, str):
+            yield "config_value", value[:CONFIG_VALUE_LENGTH]
+        elif value is not None:
+            yield "config_value", value
+
+
+def run_document(record):
+    """(key, type, fields, summary) of a run record"""
+    key = f"run:{record.get('entity')}/{record.get('project')}/{record.get('id')}"
+    fields = {field: record.get(field) for field in ("name", "id", "project", "entity", "state")}
+    fields["tags"] = list(record.get("tags") or ())
+    fields["config"] = record.get("config") or {}
+    summary = {"type": "run", "key": key, "name": record.get("name"), "id": record.get("id"),
+               "entity": record.get("entity"), "project": record.get("project"), "state": record.get("state")}
+    return key, "run", fields, summary
+
+
+def repo_document(kind, record):
+    """(key, type, fields, summary) of an hf_catalog model or dataset record"""
+    doc_type = kind[:-1]
+    key = f"{doc_type}:{record['name']}"
+    fields = {"name": record["name"], "tags": list(record.get("tags") or ())}
+    summary = {"type": doc_type, "key": key, "name": record["name"], "downloads": record.get("downloads"),
+               "lastModified": record.get("lastModified")}
+    return key, doc_type, fields, summary
+
+
+def document_terms(fields):
+    """{term: weight} of a document's fields"""
+    terms = {}
+
+    def add(field, text):
+        weight = FIELD_WEIGHTS[field]
+        for term in tokenize(text):
+            if terms.get(term, 0) < weight:
+                terms[term] = weight
+
+    for field, value in fields.items():
+        if value is None:
+            continue
+        if field == "config":
+            for config_field, text in config_terms(value):
+                add(config_field, text)
+        elif field == "tags":
+            for tag in value:
+                add("tags", tag)
+        else:
+            add(field, value)
+    return terms
+
+
+class Document:
+    __slots__ = ("key", "type", "fields", "summary", "name", "terms")
+
+    def __init__(self, key, doc_type, fields, summary):
+        self.key = key
+        self.type = doc_type
+        self.fields = fields
+        self.summary = summary
+        # The name's terms, for boosting queries that spell out the name
+        self.name = " ".join(tokenize(fields.get("name") or ""))
+        self.terms = document_terms(fields)
+
+
+class SearchIndex:
+    """Thread-safe inverted index with prefix and trigram tables, see the module docstring"""
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.docs = {}  # doc id -> Document
+        self.ids = {}  # key -> doc id
+        self.sources = {}  # source -> {key}
+        self.postings = {}  # term -> {doc id: weight}
+        self.trigrams = {}  # trigram -> {term}
+        self.free = []  # doc ids of deleted documents, reused first
+        self.next_id = 0
+        # Built lazily after changes, see terms_sorted, posting_array, name_table
+        self.terms = []  # sorted indexed terms
+        self.terms_dirty = False
+        self.arrays = {}  # term -> (doc ids, weights) as NumPy arrays
+        self.stale_terms = set()  # cached arrays dropped since the last warm()
+        self.names = None  # ([(name, doc id)] sorted, doc ids in the same order)
+        self.doc_types = np.full(1024, -1, dtype=np.int8)  # doc id -> index into TYPES, -1 if free
+        self.loaded_at = None  # when the owner last loaded every source
+
+    def __len__(self):
+        return len(self.docs)
+
+    def add_term(self, term):
+        self.terms_dirty = True
+        for trigram in trigrams(term):
+            self.trigrams.setdefault(trigram, set()).add(term)
+
+    def drop_term(self, term):
+        self.terms_dirty = True
+        for trigram in trigrams(term):
+            terms = self.trigrams.get(trigram)
+            if terms is not None:
+                terms.discard(term)
+                if not terms:
+                    del self.trigrams[trigram]
+
+    def terms_sorted(self):
+        """The sorted term list, re-sorted once after a batch of changes"""
+        if self.terms_dirty:
+            self.terms = sorted(self.postings)
+            self.terms_dirty = False
+        return self.terms
+
+    def insert(self, document):
+        if self.free:
+            doc_id = self.free.pop()
+        else:
+            doc_id = self.next_id
+            self.next_id += 1
+            if doc_id >= len(self.doc_types):
+                grown = np.full(len(self.doc_types) * 2, -1, dtype=np.int8)
+                grown[:len(self.doc_types)] = self.doc_types
+                self.doc_types = grown
+        self.docs[doc_id] = document
+        self.ids[document.key] = doc_id
+        self.doc_types[doc_id] = TYPES.index(document.type)
+        self.names = None
+        for term, weight in document.terms.items():
+            posting = self.postings.get(term)
+            if posting is None:
+                posting = self.postings[term] = {}
+                self.add_term(term)
+            posting[doc_id] = weight
+            if self.arrays.pop(term, None) is not None:
+                self.stale_terms.add(term)
+
+    def delete(self, key):
+        doc_id = self.ids.pop(key, None)
+        if doc_id is None:
+            return
+        document = self.docs.pop(doc_id)
+        self.doc_types[doc_id] = -1
+        self.free.append(doc_id)
+        self.names = None
+        for term in document.terms:
+            posting = self.postings[term]
+            del posting[doc_id]
+            if self.arrays.pop(term, None) is not None:
+                self.stale_terms.add(term)
+            if not posting:
+                del self.postings[term]
+                self.drop_term(term)
+
+    def sync(self, source, documents):
+        """Make `source` hold exactly these (key, type, fields, summary) documents.
+
+        Returns (added, changed, removed) counts.
+        """
+        added = changed = 0
+        with self.lock:
+            previous = self.sources.get(source, set())
+            current = set()
+            for key, doc_type, fields, summary in documents:
+                current.add(key)
+                doc_id = self.ids.get(key)
+                if doc_id is not None:
+                    document = self.docs[doc_id]
+                    if document.fields == fields:
+                        document.summary = summary
+                        continue
+                    self.delete(key)
+                    changed += 1
+                else:
+                    added += 1
+                self.insert(Document(key, doc_type, fields, summary))
+            removed = previous - current
+            for key in removed:
+                self.delete(key)
+            if current:
+                self.sources[source] = current
+            else:
+                self.sources.pop(source, None)
+            if added or changed or removed:
+                self.warm()
+        return added, changed, len(removed)
+
+    def warm(self):
+        """Rebuild what the last changes invalidated now, so queries do not pay for it"""
+        self.terms_sorted()
+        self.name_table()
+        for term in self.stale_terms:
+            if term in self.postings:
+                self.posting_array(term)
+        self.stale_terms.clear()
+
+    def drop(self, source):
+        """Remove every document of a source"""
+        return self.sync(source, ())
+
+    def source_names(self):
+        with self.lock:
+            return list(self.sources)
+
+    def expand(self, token):
+        """[(indexed term, match quality)] for one query term"""
+        matches = []
+        if token in self.postings:
+            matches.append((token, 1.0))
+        if len(token) >= PREFIX_MIN:
+            terms = self.terms_sorted()
+            start = bisect.bisect_right(terms, token)
+            # Terms with the prefix are contiguous; look at no more than PREFIX_SCAN of them
+            end = min(bisect.bisect_left(terms, token + "\uffff", start), start + PREFIX_SCAN)
+            prefixed = heapq.nsmallest(PREFIX_EXPANSIONS, terms[start:end], key=len)
+            matches += [(term, 0.5 + 0.4 * len(token) / len(term)) for term in prefixed]
+        if matches or len(token) < FUZZY_MIN_LENGTH:
+            return matches
+        wanted = trigrams(token)
+        shared = {}
+        # Rarest trigrams first, stopping once FUZZY_SCAN candidate terms were counted
+        scanned = 0
+        for trigram in sorted(wanted, key=lambda trigram: len(self.trigrams.get(trigram, ()))):
+            terms = self.trigrams.get(trigram, ())
+            if scanned + len(terms) > FUZZY_SCAN and shared:
+                break
+            scanned += len(terms)
+            for term in terms:
+                shared[term] = shared.get(term, 0) + 1
+        similar = []
+        for term, count in shared.items():
+            similarity = 2 * count / (len(wanted) + len(trigrams(term)))
+            if similarity >= FUZZY_MIN_SIMILARITY:
+                similar.append((similarity, term))
+        return [(term, 0.4 * similarity) for similarity, term in heapq.nlargest(FUZZY_EXPANSIONS, similar)]
+
+    def posting_array(self, term):
+        """(doc ids, weights) of a term as NumPy arrays, cached until the posting changes"""
+        arrays = self.arrays.get(term)
+        if arrays is None:
+            posting = self.postings[term]
+            arrays = self.arrays[term] = (np.fromiter(posting.keys(), dtype=np.int64, count=len(posting)),
+                                          np.fromiter(posting.values(), dtype=np.float64, count=len(posting)))
+        return arrays
+
+    def name_table(self):
+        """Documents sorted by name, for finding the names a query starts"""
+        if self.names is None:
+            names = sorted((document.name, doc_id) for doc_id, document in self.docs.items())
+            self.names = (names, np.fromiter((doc_id for _, doc_id in names), dtype=np.int64, count=len(names)))
+        return self.names
+
+    def search(self, query, types=None, limit=20, offset=0):
+        """Ranked page of documents matching every term of `query`.
+
+        Returns {"query", "total", "offset", "limit", "results": [summary
+        with "score"], "tookMs"}; types limits the document types.
+        """
+        start = time.perf_counter()
+        tokens = list(dict.fromkeys(tokenize(query)))
+        phrase = " ".join(tokens)
+        page, total = [], 0
+        with self.lock:
+            # Scores over all doc ids; a document is a candidate while its score is > 0
+            scores = None
+            for token in tokens:
+                matches = self.expand(token)
+                if not matches:
+                    scores = None
+                    break
+                term_scores = np.zeros(self.next_id)
+                for term, quality in matches:
+                    ids, weights = self.posting_array(term)
+                    term_scores[ids] = np.maximum(term_scores[ids], weights * quality)
+                if scores is None:
+                    scores = term_scores
+                else:
+                    scores = np.where((scores > 0) & (term_scores > 0), scores + term_scores, 0.0)
+
+            if scores is not None:
+                # Boost documents whose name is the query, or starts with it
+                names, name_ids = self.name_table()
+                low = bisect.bisect_left(names, (phrase,))
+                exact = bisect.bisect_left(names, (phrase + "\0",), low)
+                high = bisect.bisect_left(names, (phrase + "\uffff",), exact)
+                scores[name_ids[low:exact]] *= 2.0
+                scores[name_ids[exact:high]] *= 1.5
+                if types:
+                    codes = [TYPES.index(doc_type) for doc_type in types if doc_type in TYPES]
+                    scores[~np.isin(self.doc_types[:self.next_id], codes)] = 0.0
+
+                candidates = np.flatnonzero(scores)
+                total = len(candidates)
+                wanted = min(offset + limit, total)
+                if wanted:
+                    if wanted < total:
+                        candidates = candidates[np.argpartition(-scores[candidates], wanted - 1)[:wanted]]
+                    # Best first, ties by doc id
+                    best = candidates[np.lexsort((candidates, -scores[candidates]))]
+                    page = [{**self.docs[doc_id].summary, "score": round(float(scores[doc_id]), 4)}
+                            for doc_id in best[offset:].tolist()]
+        return {
+            "query": query,
+            "total": total,
+            "offset": offset,
+            "limit": limit,
+            "results": page,
+            "tookMs": round((time.perf_counter() - start) * 1000, 3),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Search the locally stored runs, models and datasets")
+    parser.add_argument("query")
+    parser.add_argument("--types", help=f"comma-separated document types, any of {', '.join(TYPES)}")
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--offset", type=int, default=0)
+    args = parser.parse_args()
+
+    from entrypoint import load_env, hf_token
+    from run_store import RunStore
+    from hf_catalog import HfCatalog, KINDS
+
+    load_env()
+    index = SearchIndex()
+    try:
+        store = RunStore()
+        for path in store.get_project_paths():
+            index.sync(f"runs:{path}", map(run_document, store.get_records(path)))
+        catalog = HfCatalog(None, hf_token())
+        for kind in KINDS:
+            index.sync(f"hf:{kind}", (repo_document(kind, record) for record in catalog.stored(kind)))
+    except Exception as e:
+        print(f"Error loading the stores: {type(e).__name__}: {e}", file=sys.stderr)
+    types = [part.strip() for part in args.types.split(",")] if args.types else None
+    print(json.dumps(index.search(args.query, types=types, limit=args.limit, offset=args.offset)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""Per-phase timers, counters and leveled logging for the data scripts.
+
+Timers accumulate call count, total and max seconds per phase (API list,
+run transform, metadata fetch, JSON safety, serialization); counters
+count events such as cache hits. Both live in one process-wide Telemetry
+object. The worker serves it in Prometheus text format, the one-shot
+scripts can print it as a JSON trailer on stderr.
+
+Logging goes through the standard logging module under the
+"training_monitor" logger. Only warnings and errors are shown unless
+TRAINING_MONITOR_LOG_LEVEL is set (e.g. to INFO or DEBUG).
+"""
+
+import os
+import sys
+import time
+import logging
+import threading
+from contextlib import contextmanager
+
+LOG_LEVEL = os.environ.get("TRAINING_MONITOR_LOG_LEVEL", "WARNING").upper()
+
+_logging_ready = False
+
+
+def get_logger(name):
+    """Logger for a script or module, writing to stderr at LOG_LEVEL"""
+    global _logging_ready
+    if not _logging_ready:
+        root = logging.getLogger("training_monitor")
+        handler = logging.StreamHandler(sys.stderr)
+        handler.setFormatter(logging.Formatter("%(levelname)s %(name)s: %(message)s"))
+        root.addHandler(handler)
+        root.setLevel(getattr(logging, LOG_LEVEL, logging.WARNING))
+        root.propagate = False
+        _logging_ready = True
+    return logging.getLogger(f"training_monitor.{name}")
+
+
+class Telemetry:
+    """Thread-safe phase timers and event counters"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started_at = time.time()
+        self.timers = {}  # phase -> [calls, total seconds, max seconds]
+        self.counters = {}
+
+    @contextmanager
+    def timer(self, phase):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(phase, time.perf_counter() - start)
+
+    def observe(self, phase, seconds):
+        with self.lock:
+            entry = self.timers.get(phase)
+            if entry is None:
+                self.timers[phase] = [1, seconds, seconds]
+            else:
+                entry[0] += 1
+                entry[1] += seconds
+                if seconds > entry[2]:
+                    entry[2] = seconds
+
+    def count(self, name, n=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def reset(self):
+        with self.lock:
+            self.timers.clear()
+            self.counters.clear()
+            self.started_at = time.time()
+
+    def snapshot(self):
+        """{"phases": {phase: {"calls", "seconds", "maxSeconds"}}, "counters": {...}}"""
+        with self.lock:
+            return {
+                "phases": {phase: {"calls": calls, "seconds": round(total, 6), "maxSeconds": round(peak, 6)}
+                           for phase, (calls, total, peak) in sorted(self.timers.items())},
+                "counters": dict(sorted(self.counters.items())),
+                "uptimeSeconds": round(time.time() - self.started_at, 3),
+            }
+
+    def prometheus(self, prefix="training_monitor"):
+        """Prometheus text exposition of every timer and counter"""
+        snapshot = self.snapshot()
+        lines = [
+            f"# HELP {prefix}_phase_seconds_total Time spent per pipeline phase.",
+            f"# TYPE {prefix}_phase_seconds_total counter",
+        ]
+        lines += [f'{prefix}_phase_seconds_total{{phase="{phase}"}} {entry["seconds"]}'
+                  for phase, entry in snapshot["phases"].items()]
+        lines += [
+            f"# HELP {prefix}_phase_calls_total Timed calls per pipeline phase.",
+            f"# TYPE {prefix}_phase_calls_total counter",
+        ]
+        lines += [f'{prefix}_phase_calls_total{{phase="{phase}"}} {entry["calls"]}'
+                  for phase, entry in snapshot["phases"].items()]
+        lines += [
+            f"# HELP {prefix}_phase_max_seconds Slowest single call per pipeline phase.",
+            f"# TYPE {prefix}_phase_max_seconds gauge",
+        ]
+        lines += [f'{prefix}_phase_max_seconds{{phase="{phase}"}} {entry["maxSeconds"]}'
+                  for phase, entry in snapshot["phases"].items()]
+        for name, value in snapshot["counters"].items():
+            lines.append(f"# TYPE {prefix}_{name}_total counter")
+            lines.append(f"{prefix}_{name}_total {value}")
+        lines.append(f"# TYPE {prefix}_uptime_seconds gauge")
+        lines.append(f"{prefix}_uptime_seconds {snapshot['uptimeSeconds']}")
+        return "\n".join(lines) + "\n"
+
+
+# Shared by everything in the process
+TELEMETRY = Telemetry()
@@ -0,0 +1,638 @@
+#!/usr/bin/env python3
+"""Long-lived data worker for the backend.
+
+Keeps wandb / huggingface_hub imported and their API clients alive so the
+dashboard does not pay the import and client setup cost on every refresh.
+
+Protocol is JSON lines over stdin/stdout:
+    request:  {"id": 1, "method": "wandb_runs", "params": {"project": "entity/name"}}
+    response: {"id": 1, "result": [...]}  or  {"id": 1, "error": "message"}
+
+An error caused by the request itself (an invalid run filter) also carries
+"invalid": true, so the backend answers it as a bad request instead of
+retrying with the one-shot script.
+
+Requests with "stream": true get zero or more {"id": 1, "stream": item}
+lines before the final response.
+
+The "metrics" method returns the phase timers and counters of
+telemetry.TELEMETRY, as Prometheus text by default.
+
+Unless REFRESH_SCHEDULER=0, a refresh_scheduler.RefreshScheduler keeps the
+run store and the HF catalog fresh in the background, and wandb_runs,
+wandb_projects and the HF listings are answered from those caches
+instead of fetching on every request. "scheduler" shows its queue.
+
+"search" queries a search_index.SearchIndex over the stored runs and HF
+listings. The refreshers update it as they sync; without them it is
+reloaded from the stores at most every SEARCH_RELOAD seconds.
+
+Synced and polled run listings are also appended to a
+run_timeline.RunTimeline (unless RUN_TIMELINE=0); "runs_at" and
+"run_timeline" answer what the runs looked like at any past time.
+
+"run_aggregates" groups, ranks and takes percentiles of the stored runs
+with run_aggregates.RunAggregates, kept current the same way
+(AGGREGATE_RELOAD) and caching results until the run set changes.
+"""
+
+import os
+import sys
+import json
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from entrypoint import load_env, hf_token, hf_api, wandb_api
+import get_wandb_runs
+import get_wandb_projects
+from run_store import RunStore, FinishedRunCache, HardwareCache, GpuSampleStore
+from gpu_sampler import GpuSampler
+from hf_catalog import HfCatalog, KINDS as HF_KINDS
+from hf_cache import HfCacheScanner
+from hf_details import HfDetails
+from local_runs import LocalRuns
+from projection import projection
+from refresh_scheduler import RefreshScheduler, WandbRefresher, HfRefresher
+from run_delta import RunSnapshots
+from run_filters import InvalidFilter, RunFilter
+from run_timeline import RunTimeline
+from search_index import SearchIndex, run_document, repo_document
+from telemetry import TELEMETRY, get_logger
+
+log = get_logger("worker")
+
+MAX_WORKERS = int(os.environ.get("WORKER_THREADS", "4"))
+
+# Set GPU_SAMPLER=0 to not run the background GPU utilization sampler
+GPU_SAMPLER = os.environ.get("GPU_SAMPLER") != "0"
+
+# Set REFRESH_SCHEDULER=0 to fetch on every request instead of refreshing in the background
+REFRESH_SCHEDULER = os.environ.get("REFRESH_SCHEDULER") != "0"
+
+# Without the refresh scheduler, the search index is reloaded from the stores this often (seconds)
+SEARCH_RELOAD = float(os.environ.get("SEARCH_RELOAD", "30"))
+
+# Same for the run aggregates
+AGGREGATE_RELOAD = float(os.environ.get("AGGREGATE_RELOAD", "30"))
+
+# Set RUN_TIMELINE=0 to not keep the time-travel log of the run listings
+RUN_TIMELINE = os.environ.get("RUN_TIMELINE") != "0"
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_wandb_api():
+    """Return a shared wandb.Api, or None if no API key is configured"""
+    api_key = os.environ.get("WANDB_API_KEY")
+    if not api_key:
+        return None
+    with _clients_lock:
+        api = _clients.get(("wandb", api_key))
+        if api is None:
+            api = wandb_api()
+            _clients[("wandb", api_key)] = api
+    # wandb.Api memoizes runs and projects per query, drop them so every
+    # request sees fresh data
+    api.flush()
+    if isinstance(getattr(api, "_projects", None), dict):
+        api._projects = {}
+    return api
+
+
+def get_run_store():
+    """Return the shared RunStore used for incremental syncs"""
+    with _clients_lock:
+        store = _clients.get("run_store")
+        if store is None:
+            store = RunStore()
+            _clients["run_store"] = store
+    return store
+
+
+def get_finished_cache():
+    """Return the shared FinishedRunCache"""
+    with _clients_lock:
+        cache = _clients.get("finished_cache")
+        if cache is None:
+            cache = FinishedRunCache()
+            _clients["finished_cache"] = cache
+    return cache
+
+
+def get_hardware_cache():
+    """Return the shared HardwareCache"""
+    with _clients_lock:
+        cache = _clients.get("hardware_cache")
+        if cache is None:
+            cache = HardwareCache()
+            _clients["hardware_cache"] = cache
+    return cache
+
+
+def get_gpu_sample_store():
+    """Return the shared GpuSampleStore"""
+    with _clients_lock:
+        store = _clients.get("gpu_samples")
+        if store is None:
+            store = GpuSampleStore()
+            _clients["gpu_samples"] = store
+    return store
+
+
+def get_eta_estimator():
+    """Return the shared EtaEstimator, numpy is only imported on first use"""
+    with _clients_lock:
+        estimator = _clients.get("eta")
+        if estimator is None:
+            from eta_estimator import EtaEstimator
+            estimator = EtaEstimator()
+            _clients["eta"] = estimator
+    return estimator
+
+
+def get_hf_api():
+    """Return a shared HfApi and the token it was built with"""
+    token = hf_token()
+    with _clients_lock:
+        api = _clients.get(("hf", token))
+        if api is None:
+            api = hf_api(token)
+            _clients[("hf", token)] = api
+    return api, token
+
+
+def get_hf_catalog():
+    """Return the shared HfCatalog for the configured token"""
+    api, token = get_hf_api()
+    with _clients_lock:
+        catalog = _clients.get(("hf_catalog", token))
+        if catalog is None:
+            catalog = HfCatalog(api, token)
+            _clients[("hf_catalog", token)] = catalog
+    return catalog
+
+
+def new_run_collector(**options):
+    """RunCollector on the shared API client and stores"""
+    return get_wandb_runs.RunCollector(
+        get_wandb_api(), hardware_cache=get_hardware_cache(), gpu_samples=get_gpu_sample_store(),
+        eta_estimator=get_eta_estimator(), **options)
+
+
+def get_search_index():
+    """Return the shared SearchIndex, loaded from the stores on first use"""
+    with _clients_lock:
+        index = _clients.get("search")
+        if index is None:
+            index = _clients["search"] = SearchIndex()
+    return index
+
+
+def index_runs(project_path, records):
+    get_search_index().sync(f"runs:{project_path}", map(run_document, records))
+
+
+def sync_project(project_path, records):
+    """WandbRefresher hook: update the search index, the timeline and, once in use, the run aggregates"""
+    index_runs(project_path, records)
+    timeline = get_run_timeline()
+    if timeline is not None:
+        timeline.record(project_path, records)
+    aggregates = _clients.get("aggregates")
+    if aggregates is not None:
+        aggregates.sync(project_path, records)
+
+
+def get_run_timeline():
+    """Return the shared RunTimeline, None if RUN_TIMELINE=0"""
+    if not RUN_TIMELINE:
+        return None
+    with _clients_lock:
+        timeline = _clients.get("timeline")
+        if timeline is None:
+            timeline = _clients["timeline"] = RunTimeline()
+    return timeline
+
+
+def index_hf_listing(kind):
+    get_search_index().sync(f"hf:{kind}", (repo_document(kind, record) for record in get_hf_catalog().stored(kind)))
+
+
+def load_search_index(index):
+    """Sync the whole index with the run store and the HF catalog"""
+    with TELEMETRY.timer("search_load"):
+        store = get_run_store()
+        paths = store.get_project_paths()
+        for path in paths:
+            index_runs(path, store.get_records(path))
+        for source in index.source_names():
+            if source.startswith("runs:") and source[len("runs:"):] not in paths:
+                index.drop(source)
+        for kind in HF_KINDS:
+            try:
+                index_hf_listing(kind)
+            except Exception as e:
+                log.warning("Could not index HF %s: %s: %s", kind, type(e).__name__, e)
+        index.loaded_at = time.time()
+
+
+def start_refresh_scheduler():
+    """Start the background RefreshScheduler with the wandb and HF refreshers"""
+    scheduler = RefreshScheduler()
+    with _clients_lock:
+        _clients["scheduler"] = scheduler
+        if os.environ.get("WANDB_API_KEY"):
+            _clients["wandb_refresher"] = WandbRefresher(
+                scheduler, lambda: new_run_collector(store=get_run_store(), cache=get_finished_cache()),
+                get_wandb_api, on_sync=sync_project).start()
+        _clients["hf_refresher"] = HfRefresher(scheduler, get_hf_catalog, HF_KINDS,
+                                               on_refresh=index_hf_listing).start()
+    return scheduler.start()
+
+
+def get_local_runs():
+    """Return the shared LocalRuns, None unless WANDB_LOCAL_DIRS is set"""
+    with _clients_lock:
+        if "local_runs" not in _clients:
+            local_runs = LocalRuns()
+            _clients["local_runs"] = local_runs if local_runs else None
+    return _clients["local_runs"]
+
+
+def run_deadline(params):
+    """Listing deadline in seconds from params, None for no deadline"""
+    if params.get("deadline") is None:
+        return get_wandb_runs.RUN_DEADLINE
+    return float(params["deadline"]) or None
+
+
+def handle_wandb_runs(params, emit=None):
+    """Run records, params: project, incremental, cache_finished, metadata,
+    concurrency, project_timeout, fields and metrics (comma-separated globs),
+    the run_filters.RunFilter filters (state, tag, user, created_after,
+    created_before, name), and limit, offset and per_page for paging.
+    Incremental unfiltered listings come from the refresher's store.
+    Runs in WANDB_LOCAL_DIRS are merged in, and listed even without an API key.
+    deadline (seconds; 0 for none, WANDB_DEADLINE if absent) bounds the
+    listing: projects still fetching then are answered from their last
+    known records, marked "partial", and go on fetching in the background
+    for the next request."""
+    run_filter = RunFilter.from_params(params)
+    api = get_wandb_api()
+    local_runs = get_local_runs()
+    if api is None and local_runs is None:
+        return []
+    store = get_run_store() if params.get("incremental") and api is not None else None
+    cache = get_finished_cache() if params.get("cache_finished") else None
+    refresher = _clients.get("wandb_refresher")
+    cached = {}
+    if refresher is not None and store is not None and run_filter is None:
+        if params.get("project"):
+            refresher.track(params["project"])
+        cached = {"refresh": False, "project_paths": refresher.project_paths()}
+    return get_wandb_runs.get_runs(
+        api, params.get("project") or "", store=store, cache=cache,
+        hardware_cache=get_hardware_cache(),
+        gpu_samples=get_gpu_sample_store(),
+        eta_estimator=get_eta_estimator(),
+        fetch_metadata=params.get("metadata", True),
+        concurrency=params.get("concurrency") or get_wandb_runs.PROJECT_CONCURRENCY,
+        project_timeout=params.get("project_timeout") or get_wandb_runs.PROJECT_TIMEOUT,
+        projection=projection(params.get("fields"), params.get("metrics")),
+        run_filter=run_filter,
+        limit=int(params["limit"]) if params.get("limit") is not None else None,
+        offset=int(params.get("offset") or 0),
+        per_page=int(params.get("per_page") or 0) or get_wandb_runs.RUNS_PER_PAGE,
+        local_runs=local_runs, deadline=run_deadline(params),
+        on_record=emit, **cached)
+
+
+def get_run_snapshots():
+    """Return the shared RunSnapshots behind wandb_runs_delta"""
+    with _clients_lock:
+        snapshots = _clients.get("run_snapshots")
+        if snapshots is None:
+            snapshots = RunSnapshots()
+            _clients["run_snapshots"] = snapshots
+    return snapshots
+
+
+def handle_wandb_runs_delta(params):
+    """Changes to the run records since version params["since"], see run_delta.
+    Takes the same params as wandb_runs; each project/projection/filter is its own view."""
+    run_filter = RunFilter.from_params(params)
+    view = (params.get("project") or "", params.get("fields"), params.get("metrics"),
+            run_filter.key() if run_filter is not None else None, params.get("limit"), params.get("offset"))
+    snapshot = get_run_snapshots().get(view)
+    records = handle_wandb_runs(params)
+    snapshot.update(records)
+    timeline = get_run_timeline()
+    # The refresher records its syncs; otherwise complete polls are the timeline
+    if (timeline is not None and "wandb_refresher" not in _clients and run_filter is None
+            and params.get("limit") is None and not params.get("offset")):
+        by_project = {}
+        for record in records:
+            if record.get("placeholder"):
+                continue
+            by_project.setdefault(f"{record.get('entity')}/{record.get('project')}", []).append(record)
+        for path, project_records in by_project.items():
+            timeline.record(path, project_records)
+    delta = snapshot.delta(params.get("since"))
+    if any(record.get("partial") for record in records):
+        delta["partial"] = True
+    refresher = _clients.get("wandb_refresher")
+    if refresher is not None:
+        # When the data behind this view changes next, a hint for the client's poll
+        delta["refreshIn"] = refresher.due_in(params.get("project") or "")
+    return delta
+
+
+def handle_invalidate_cache(params):
+    removed = get_finished_cache().invalidate(
+        params.get("entity"), params.get("project"), params.get("run_id"))
+    return {"removed": removed}
+
+
+def handle_wandb_projects(params):
+    api = get_wandb_api()
+    if api is None:
+        return []
+    refresher = _clients.get("wandb_refresher")
+    if refresher is not None and refresher.projects is not None:
+        return list(refresher.projects)
+    return get_wandb_projects.get_projects(api)
+
+
+def handle_gpu_history(params):
+    """Buffered GPU samples of one run, params: entity, project, run_id"""
+    key = f"{params.get('entity')}/{params.get('project')}/{params.get('run_id')}"
+    return get_gpu_sample_store().history(key)
+
+
+def get_history_service():
+    """Return the shared HistoryService, numpy is only imported on first use"""
+    with _clients_lock:
+        service = _clients.get("history")
+        if service is None:
+            from metric_history import HistoryService
+            service = HistoryService(get_wandb_api)
+            _clients["history"] = service
+    return service
+
+
+def handle_metric_history(params):
+    """Downsampled series of one metric, params: entity, project, run_id, key, points, method"""
+    if not os.environ.get("WANDB_API_KEY"):
+        return {"key": params.get("key"), "steps": [], "values": [], "total": 0}
+    key = f"{params.get('entity')}/{params.get('project')}/{params.get('run_id')}"
+    return get_history_service().series(
+        key, params.get("key"), points=int(params.get("points") or 200), method=params.get("method") or "lttb")
+
+
+def get_hf_details():
+    """Return the shared HfDetails for the configured token"""
+    api, token = get_hf_api()
+    with _clients_lock:
+        details = _clients.get(("hf_details", token))
+        if details is None:
+            details = HfDetails(api, token)
+            _clients[("hf_details", token)] = details
+    return details
+
+
+def hf_listing(kind, params, emit=None):
+    """A catalog listing; with params["details"] each repo gets its hf_details fields.
+    Streamed, every repo's {"name", ...details} is emitted as soon as it is
+    known and the result is empty."""
+    records = get_hf_catalog().get(kind, revalidate="hf_refresher" not in _clients)
+    if not params.get("details"):
+        return records
+    enriched = get_hf_details().enrich(kind, records, on_details=emit)
+    return [] if emit is not None else enriched
+
+
+def handle_hf_models(params, emit=None):
+    return hf_listing("models", params, emit)
+
+
+def handle_hf_datasets(params, emit=None):
+    return hf_listing("datasets", params, emit)
+
+
+def handle_hf_cache(params):
+    """Locally cached HuggingFace repos, params: rescan"""
+    with _clients_lock:
+        scanner = _clients.get("hf_cache")
+        if scanner is None:
+            scanner = HfCacheScanner()
+            _clients["hf_cache"] = scanner
+    return scanner.scan(rescan=bool(params.get("rescan")))
+
+
+def handle_metrics(params):
+    """Phase timings and counters, params: format ("prometheus" or "json")"""
+    if params.get("format") == "json":
+        return TELEMETRY.snapshot()
+    return TELEMETRY.prometheus()
+
+
+def handle_scheduler(params):
+    """Refresh queue, service backoff and request budget of the RefreshScheduler"""
+    scheduler = _clients.get("scheduler")
+    return scheduler.snapshot() if scheduler is not None else {"tasks": [], "holds": {}, "budget": None}
+
+
+def split_param(value):
+    return [part.strip() for part in str(value or "").split(",") if part.strip()]
+
+
+def handle_search(params):
+    """Ranked runs, models and datasets matching params["q"]; params: types
+    (comma-separated "run", "model", "dataset"), limit, offset"""
+    index = get_search_index()
+    with _clients_lock:
+        stale = index.loaded_at is None or (
+            "scheduler" not in _clients and time.time() - index.loaded_at > SEARCH_RELOAD)
+        if stale:
+            # Claimed here so concurrent searches do not all reload
+            index.loaded_at = time.time()
+    if stale:
+        load_search_index(index)
+    types = split_param(params.get("types"))
+    return index.search(str(params.get("q") or ""), types=types or None,
+                        limit=min(int(params.get("limit") or 20), 200), offset=int(params.get("offset") or 0))
+
+
+def get_run_aggregates():
+    """Return the shared RunAggregates, numpy is only imported on first use"""
+    with _clients_lock:
+        aggregates = _clients.get("aggregates")
+        if aggregates is None:
+            from run_aggregates import RunAggregates
+            aggregates = _clients["aggregates"] = RunAggregates()
+    return aggregates
+
+
+def load_run_aggregates(aggregates):
+    """Sync the aggregates with every project in the run store"""
+    with TELEMETRY.timer("aggregates_load"):
+        store = get_run_store()
+        paths = store.get_project_paths()
+        for path in paths:
+            aggregates.sync(path, store.get_records(path))
+        for path in aggregates.source_names():
+            if path not in paths:
+                aggregates.drop(path)
+        aggregates.loaded_at = time.time()
+
+
+def handle_run_aggregates(params):
+    """Grouped aggregates and top runs of one value across the stored runs, see run_aggregates.
+    params: metric, group, aggs (comma-separated), top, order ("asc"/"desc"), state and project filters"""
+    aggregates = get_run_aggregates()
+    with _clients_lock:
+        stale = aggregates.loaded_at is None or (
+            "scheduler" not in _clients and time.time() - aggregates.loaded_at > AGGREGATE_RELOAD)
+        if stale:
+            aggregates.loaded_at = time.time()
+    if stale:
+        load_run_aggregates(aggregates)
+    where = {field: split_param(params[field]) for field in ("state", "project") if params.get(field)}
+    return aggregates.query(params.get("metric") or None, split_param(params.get("group")),
+                            split_param(params.get("aggs")), int(params.get("top") or 0),
+                            params.get("order") or "asc", where)
+
+
+def handle_runs_at(params):
+    """The runs as they were listed at params["at"] (ISO date/time or epoch seconds), params: project"""
+    timeline = get_run_timeline()
+    if timeline is None:
+        raise ValueError("the run timeline is disabled (RUN_TIMELINE=0)")
+    return timeline.runs_at(params.get("at") or time.time(), params.get("project") or None)
+
+
+def handle_run_timeline(params):
+    """State and progress over time of one run, params: entity, project, run_id, since, until, points"""
+    timeline = get_run_timeline()
+    if timeline is None:
+        raise ValueError("the run timeline is disabled (RUN_TIMELINE=0)")
+    key = f"{params.get('entity')}/{params.get('project')}/{params.get('run_id')}"
+    return timeline.run_timeline(key, params.get("since") or None, params.get("until") or None,
+                                 int(params.get("points") or 200))
+
+
+def handle_ping(params):
+    return "pong"
+
+
+# Methods that accept an emit callback for streamed requests
+STREAMING = {"wandb_runs", "hf_models", "hf_datasets"}
+
+HANDLERS = {
+    "wandb_runs": handle_wandb_runs,
+    "wandb_runs_delta": handle_wandb_runs_delta,
+    "wandb_projects": handle_wandb_projects,
+    "invalidate_cache": handle_invalidate_cache,
+    "gpu_history": handle_gpu_history,
+    "metric_history": handle_metric_history,
+    "hf_models": handle_hf_models,
+    "hf_datasets": handle_hf_datasets,
+    "hf_cache": handle_hf_cache,
+    "metrics": handle_metrics,
+    "scheduler": handle_scheduler,
+    "search": handle_search,
+    "run_aggregates": handle_run_aggregates,
+    "runs_at": handle_runs_at,
+    "run_timeline": handle_run_timeline,
+    "ping": handle_ping,
+}
+
+
+class Worker:
+    """Reads requests from a stream and writes one response line per request"""
+
+    def __init__(self, out):
+        self.out = out
+        self.write_lock = threading.Lock()
+        self.pool = ThreadPoolExecutor(max_workers=MAX_WORKERS)
+
+    def respond(self, message):
+        with TELEMETRY.timer("serialize"):
+            line = json.dumps(message)
+        with self.write_lock:
+            self.out.write(line + "\n")
+            self.out.flush()
+
+    def dispatch(self, request):
+        request_id = request.get("id")
+        handler = HANDLERS.get(request.get("method"))
+        if handler is None:
+            self.respond({"id": request_id, "error": f"Unknown method: {request.get('method')}"})
+            return
+        params = request.get("params") or {}
+        method = request.get("method")
+        TELEMETRY.count(f"requests_{method}")
+        try:
+            with TELEMETRY.timer(f"handle_{method}"):
+                if request.get("stream"):
+                    if method not in STREAMING:
+                        raise ValueError(f"{method} does not support streaming")
+                    result = handler(params, emit=lambda item: self.respond({"id": request_id, "stream": item}))
+                else:
+                    result = handler(params)
+            self.respond({"id": request_id, "result": result})
+        except InvalidFilter as e:
+            TELEMETRY.count("request_invalid")
+            self.respond({"id": request_id, "error": str(e), "invalid": True})
+        except Exception as e:
+            TELEMETRY.count("request_errors")
+            log.warning("Worker error in %s: %s: %s", method, type(e).__name__, e)
+            self.respond({"id": request_id, "error": f"{type(e).__name__}: {e}"})
+
+    def serve(self, stream):
+        for line in stream:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                request = json.loads(line)
+            except ValueError as e:
+                self.respond({"id": None, "error": f"Invalid request: {e}"})
+                continue
+            self.pool.submit(self.dispatch, request)
+        self.pool.shutdown(wait=True)
+
+
+def main():
+    load_env()
+
+    # Protocol messages own the real stdout; anything the handlers or the
+    # SDKs print goes to stderr instead
+    protocol_out = sys.stdout
+    sys.stdout = sys.stderr
+
+    # Warm up the heavy imports before the first request arrives
+    for module in ("wandb", "huggingface_hub"):
+        try:
+            __import__(module)
+        except ImportError as e:
+            print(f"Worker: {module} unavailable: {e}", file=sys.stderr)
+
+    if GPU_SAMPLER and os.environ.get("WANDB_API_KEY"):
+        try:
+            import wandb
+            GpuSampler(wandb.Api, store=get_gpu_sample_store()).start()
+        except ImportError:
+            pass
+
+    if REFRESH_SCHEDULER:
+        start_refresh_scheduler()
+
+    print(f"Worker ready (pid {os.getpid()})", file=sys.stderr)
+    Worker(protocol_out).serve(sys.stdin)
+
+
+if __name__ == "__main__":
+    main()
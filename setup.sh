@@ -4,7 +4,7 @@ echo "Setting up Training Monitor dependencies..."
 
 # Install Python packages
 echo "Installing Python packages..."
-pip3 install wandb huggingface-hub --user
+pip3 install wandb huggingface-hub numpy --user
 
 # Install Node dependencies
 echo "Installing Node packages..."